@@ -0,0 +1,375 @@
+import heapq
+
+import numpy as np
+
+from database import (
+    MAX_MARKS_PER_PART,
+    QUESTION_NUMBERS,
+    QUESTION_PARTS,
+    course_outcome_lookup,
+)
+
+MAX_MARKS_PER_QUESTION = len(QUESTION_PARTS) * MAX_MARKS_PER_PART
+MAX_TOTAL_MARKS = len(QUESTION_NUMBERS) * MAX_MARKS_PER_QUESTION
+SCORE_HISTOGRAM_BINS = 10
+SCORE_PERCENTILES = (10, 25, 50, 75, 90)
+TOP_K = 5
+# Share of the class in each of the upper and lower groups (Kelley's 27%)
+ITEM_GROUP_FRACTION = 0.27
+
+
+class MarksCube:
+    """Marks of many results as one array shaped results x questions x parts.
+
+    Built from ResultsDatabase.get_marks_rows() for one course; questions a
+    result does not have are NaN, so every statistic below is a single NumPy
+    reduction instead of a Python loop over rows.
+    """
+
+    def __init__(self, rows, course_id):
+        self.course_id = course_id
+        self.roll_numbers = np.array([row[0] for row in rows], dtype=object)
+        self.exam_types = np.array([row[1] for row in rows], dtype=object)
+        self.marks = np.array([row[2:] for row in rows], dtype=float).reshape(
+            len(rows), len(QUESTION_NUMBERS), len(QUESTION_PARTS)
+        )
+        self.answered = ~np.isnan(self.marks).all(axis=2)  # results x questions
+
+    def __len__(self):
+        return len(self.marks)
+
+    def question_scores(self):
+        """Marks per result and question, parts summed (0 where unanswered)."""
+        return np.nansum(self.marks, axis=2)
+
+    def totals(self):
+        """Total marks of each result."""
+        return np.nansum(self.marks, axis=(1, 2))
+
+    def co_attainment(self, per_student=False):
+        """Obtained and maximum marks per course outcome.
+
+        Returns (co_labels, obtained, max_marks). The arrays have one entry per
+        CO, or, with per_student, shape students x COs with the students in
+        sorted roll number order. Questions without a CO for their exam type
+        count towards neither.
+        """
+        exam_types, exam_index = np.unique(self.exam_types, return_inverse=True)
+        co_labels, lookup = course_outcome_array(self.course_id, exam_types)
+
+        result_cos = lookup[exam_index]  # results x questions
+        one_hot = result_cos[:, :, None] == np.arange(len(co_labels))
+        obtained = np.einsum("rq,rqc->rc", self.question_scores(), one_hot)
+        max_marks = np.einsum(
+            "rq,rqc->rc", self.answered * MAX_MARKS_PER_QUESTION, one_hot
+        )
+
+        if per_student:
+            _, student_index = np.unique(self.roll_numbers, return_inverse=True)
+            n_students = student_index.max() + 1 if len(self) else 0
+            student_obtained = np.zeros((n_students, len(co_labels)))
+            student_max = np.zeros((n_students, len(co_labels)))
+            np.add.at(student_obtained, student_index, obtained)
+            np.add.at(student_max, student_index, max_marks)
+            return co_labels, student_obtained, student_max
+        return co_labels, obtained.sum(axis=0), max_marks.sum(axis=0)
+
+    def item_analysis(self, group_fraction=ITEM_GROUP_FRACTION):
+        """Classical item statistics of every question part, and Cronbach's alpha.
+
+        Items are the parts of the questions anyone answered, as one results x
+        items matrix (unattempted parts score 0). Per item: facility (mean /
+        max marks), the upper minus lower group discrimination index, the
+        point-biserial (item vs rest-of-test score) correlation, and alpha if
+        the item were dropped. Statistics that are undefined for this data,
+        e.g. a correlation of an item everyone scored the same on, are None.
+        """
+        if not len(self):
+            return {"results": 0, "group_size": 0, "cronbach_alpha": None, "items": []}
+
+        questions = self.answered.any(axis=0)
+        items = np.nan_to_num(self.marks[:, questions, :]).reshape(len(self), -1)
+        labels = [
+            f"Q{q_num}{part}"
+            for q_num, answered in zip(QUESTION_NUMBERS, questions)
+            if answered
+            for part in QUESTION_PARTS
+        ]
+        n_results, n_items = items.shape
+
+        totals = items.sum(axis=1)
+        facility = items.mean(axis=0) / MAX_MARKS_PER_PART
+
+        # A single result has no groups, variance or correlations
+        group_size = 0
+        discrimination = point_biserial = alpha_if_deleted = np.full(n_items, np.nan)
+        alpha = np.nan
+        if n_results >= 2:
+            group_size = max(1, min(round(n_results * group_fraction), n_results // 2))
+            # argpartition finds each group in O(n) without sorting the class
+            lower = np.argpartition(totals, group_size - 1)[:group_size]
+            upper = np.argpartition(totals, n_results - group_size)[-group_size:]
+            discrimination = (
+                items[upper].mean(axis=0) - items[lower].mean(axis=0)
+            ) / MAX_MARKS_PER_PART
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rest = totals[:, None] - items
+                item_dev = items - items.mean(axis=0)
+                rest_dev = rest - rest.mean(axis=0)
+                point_biserial = (item_dev * rest_dev).sum(axis=0) / np.sqrt(
+                    (item_dev**2).sum(axis=0) * (rest_dev**2).sum(axis=0)
+                )
+
+                item_var = items.var(axis=0, ddof=1)
+                alpha = (n_items / (n_items - 1)) * (
+                    1 - item_var.sum() / totals.var(ddof=1)
+                )
+                alpha_if_deleted = ((n_items - 1) / (n_items - 2)) * (
+                    1 - (item_var.sum() - item_var) / rest.var(axis=0, ddof=1)
+                )
+
+        def stat(value):
+            return round(float(value), 3) if np.isfinite(value) else None
+
+        return {
+            "results": n_results,
+            "group_size": group_size,
+            "cronbach_alpha": stat(alpha),
+            "items": [
+                {
+                    "item": label,
+                    "facility": stat(facility[index]),
+                    "discrimination": stat(discrimination[index]),
+                    "point_biserial": stat(point_biserial[index]),
+                    "alpha_if_deleted": stat(alpha_if_deleted[index]),
+                }
+                for index, label in enumerate(labels)
+            ],
+        }
+
+
+def class_summary(cube):
+    """Per-student summaries of one class from a MarksCube of all its exams.
+
+    Every student's result count, average, highest and lowest total, average
+    total per exam type and CO attainment come from grouped array reductions
+    over the cube, so the whole class costs one pass. Returns (exam_types,
+    co_labels, students).
+    """
+    roll_numbers, student_index = np.unique(cube.roll_numbers, return_inverse=True)
+    exam_types, exam_index = np.unique(cube.exam_types, return_inverse=True)
+    n_students = len(roll_numbers)
+    totals = cube.totals()
+
+    counts = np.bincount(student_index, minlength=n_students)
+    sums = np.bincount(student_index, weights=totals, minlength=n_students)
+    highest = np.full(n_students, -np.inf)
+    lowest = np.full(n_students, np.inf)
+    np.maximum.at(highest, student_index, totals)
+    np.minimum.at(lowest, student_index, totals)
+
+    exam_counts = np.zeros((n_students, len(exam_types)))
+    exam_sums = np.zeros((n_students, len(exam_types)))
+    np.add.at(exam_counts, (student_index, exam_index), 1)
+    np.add.at(exam_sums, (student_index, exam_index), totals)
+    exam_averages = np.round(
+        np.divide(
+            exam_sums, exam_counts, out=np.zeros_like(exam_sums), where=exam_counts > 0
+        ),
+        2,
+    )
+
+    # Rows are in np.unique order, the same as roll_numbers above
+    co_labels, obtained, max_marks = cube.co_attainment(per_student=True)
+    co_percent = attainment_percentages(obtained, max_marks)
+
+    exam_types = exam_types.tolist()
+    students = [
+        {
+            "roll_number": roll_number,
+            "results": int(counts[index]),
+            "average": round(float(sums[index] / counts[index]), 2),
+            "highest": round(float(highest[index]), 2),
+            "lowest": round(float(lowest[index]), 2),
+            "exam_totals": {
+                exam_type: float(exam_averages[index, column])
+                for column, exam_type in enumerate(exam_types)
+                if exam_counts[index, column]
+            },
+            "co_performance": dict(zip(co_labels, co_percent[index].tolist())),
+        }
+        for index, roll_number in enumerate(roll_numbers.tolist())
+    ]
+    return exam_types, co_labels, students
+
+
+# --- Course outcome attainment ---
+# Every CO view shares these helpers: the (exam type, question) -> CO lookup
+# comes from database.course_outcome_lookup(), and the obtained/max sums either
+# from the co_attainment table (one pass over its grouped rows) or from a
+# MarksCube (array operations).
+def exam_course_outcomes(course_id, exam_type):
+    """Sorted COs that some question of the course's exam_type maps to."""
+    return sorted(set(course_outcome_lookup(course_id, exam_type)) - {"N/A"})
+
+
+def course_outcome_array(course_id, exam_types):
+    """(co_labels, lookup) where lookup[exam, question] is a CO column or -1."""
+    lookups = [course_outcome_lookup(course_id, exam_type) for exam_type in exam_types]
+    co_labels = sorted({co for cos in lookups for co in cos} - {"N/A"})
+    co_index = {co: index for index, co in enumerate(co_labels)}
+    lookup = np.array(
+        [[co_index.get(co, -1) for co in cos] for cos in lookups], dtype=int
+    ).reshape(len(lookups), len(QUESTION_NUMBERS))
+    return co_labels, lookup
+
+
+def co_percentages(co_rows):
+    """{co: attainment %} from (co, obtained, max_marks) rows."""
+    return {
+        co: round((obtained / max_marks) * 100, 2) if max_marks > 0 else 0.0
+        for co, obtained, max_marks in co_rows
+    }
+
+
+def attainment_level(attained_percent, levels):
+    """Attainment level 0-3 reached by a share of students, levels ascending."""
+    return sum(attained_percent >= threshold for threshold in levels)
+
+
+def course_attainment(co_rows, exam_rows, levels):
+    """Course-level CO report from ResultsDatabase.get_course_co_attainment()."""
+    by_exam = {}
+    for exam_type, co, percent in exam_rows:
+        by_exam.setdefault(co, {})[exam_type] = round(percent, 2)
+
+    report = []
+    for co, class_percent, students, attained in co_rows:
+        attained_percent = attained * 100 / students if students else 0.0
+        report.append(
+            {
+                "co": co,
+                "attainment": round(class_percent or 0.0, 2),
+                "students": students,
+                "students_attained": attained,
+                "attained_percent": round(attained_percent, 2),
+                "level": attainment_level(attained_percent, levels),
+                "by_exam": by_exam.get(co, {}),
+            }
+        )
+    return report
+
+
+def student_co_percentages(student_co_rows, co_labels):
+    """Per-student attainment rows from (roll_number, co, obtained, max) rows.
+
+    Single pass over rows grouped by roll number; every CO in co_labels is
+    present in each row (0 when the student has no marks for it), COs outside
+    co_labels are ignored.
+    """
+    students = {}
+    for roll_number, co, obtained, max_marks in student_co_rows:
+        student_row = students.get(roll_number)
+        if student_row is None:
+            student_row = students[roll_number] = {"roll_number": roll_number}
+            student_row.update((label, 0) for label in co_labels)
+        if co in student_row and max_marks > 0:
+            student_row[co] = round((obtained / max_marks) * 100, 2)
+    return list(students.values())
+
+
+def attainment_percentages(obtained, max_marks):
+    """obtained / max as percentages rounded to 2 places, 0 where max is 0."""
+    obtained = np.asarray(obtained, dtype=float)
+    max_marks = np.asarray(max_marks, dtype=float)
+    percentages = np.divide(
+        obtained * 100,
+        max_marks,
+        out=np.zeros_like(obtained),
+        where=max_marks > 0,
+    )
+    return np.round(percentages, 2)
+
+
+def score_histogram(scores, bins=SCORE_HISTOGRAM_BINS, max_score=MAX_TOTAL_MARKS):
+    """Counts of scores in equal-width bins from 0 to max_score."""
+    counts, edges = np.histogram(scores, bins=bins, range=(0, max_score))
+    return {
+        "bin_edges": np.round(edges, 2).tolist(),
+        "counts": counts.tolist(),
+    }
+
+
+def score_percentiles(scores, percentiles=SCORE_PERCENTILES):
+    """Summary of scores: min, max, mean, the given percentiles ("p25", ...) and IQR."""
+    scores = np.asarray(scores, dtype=float)
+    if not len(scores):
+        return {}
+    # np.percentile partitions instead of fully sorting the scores
+    values = np.percentile(scores, percentiles)
+    summary = {
+        "min": round(float(scores.min()), 2),
+        "max": round(float(scores.max()), 2),
+        "mean": round(float(scores.mean()), 2),
+    }
+    summary.update(
+        (f"p{percentile}", round(float(value), 2))
+        for percentile, value in zip(percentiles, values)
+    )
+    if 25 in percentiles and 75 in percentiles:
+        summary["iqr"] = round(summary["p75"] - summary["p25"], 2)
+    return summary
+
+
+def top_and_bottom(score_rows, k=TOP_K, max_score=MAX_TOTAL_MARKS):
+    """Highest and lowest k of (roll_number, score) rows, marks as percentages.
+
+    Uses heaps, O(n log k), rather than sorting the class. Ties keep the
+    order of score_rows; students in the top k are left out of the bottom k,
+    so small classes are not listed twice.
+    """
+
+    def score(index):
+        return score_rows[index][1]
+
+    top = heapq.nlargest(k, range(len(score_rows)), key=score)
+    in_top = set(top)
+    bottom = heapq.nsmallest(
+        k, (i for i in range(len(score_rows)) if i not in in_top), key=score
+    )
+
+    def as_percent(indexes):
+        return [
+            {
+                "roll_number": score_rows[i][0],
+                "marks": round(score_rows[i][1] * 100 / max_score, 2),
+            }
+            for i in indexes
+        ]
+
+    return as_percent(top), as_percent(bottom)
+
+
+def question_analysis(question_statistics):
+    """Average part marks per question from (question, answered, sum_a..d) rows.
+
+    Returns (question_analysis, average_question_score), the latter being the
+    mean of the per-question sums over every answered question.
+    """
+    analysis = []
+    answered_total = 0
+    marks_total = 0.0
+    for q_num, answered, *part_sums in question_statistics:
+        analysis.append(
+            {
+                "question": f"Q{q_num}",
+                "average_marks": {
+                    part: round(part_sum / answered, 2)
+                    for part, part_sum in zip(QUESTION_PARTS, part_sums)
+                },
+            }
+        )
+        answered_total += answered
+        marks_total += sum(part_sums)
+    average = marks_total / answered_total if answered_total else 0.0
+    return analysis, average
@@ -8,18 +8,47 @@ from flask import (
     session,
     jsonify,
     send_file,
+    Response,
+    stream_with_context,
 )
 from database import (
-    init_db,
     Database,  # Keep Database class for auth methods
     ResultsDatabase,
+    QUESTION_NUMBERS,
+    QUESTION_PARTS,
+    get_course_outcome,
+    on_results_changed,
 )
 from functools import wraps
 import os
 from werkzeug.utils import secure_filename
 from image_to_text import extract_text_from_image
 from text_to_json import process_text_with_image
-import pandas as pd
+from exports import (
+    EXPORT_FORMATS,
+    ExportCache,
+    export_cache_key,
+    export_rows,
+    gradebook_header,
+    write_xlsx,
+    iter_csv,
+    iter_gzip,
+)
+from roster_import import ROSTER_EXTENSIONS, read_roster
+from response_cache import ResponseCache
+from analytics import (
+    MAX_TOTAL_MARKS,
+    MarksCube,
+    class_summary,
+    co_percentages,
+    course_attainment,
+    exam_course_outcomes,
+    question_analysis,
+    score_histogram,
+    score_percentiles,
+    student_co_percentages,
+    top_and_bottom,
+)
 import json
 from PIL import Image
 from datetime import datetime
@@ -31,14 +60,14 @@ import openpyxl
 import time
 import threading
 import sqlite3
+import uuid
+import hashlib
+from itertools import chain
 
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key_here"  # Change this to a secure secret key
 
-# Initialize the database
-init_db()
-
 db = Database()  # For user authentication and course management
 db_results = ResultsDatabase()  # For student results and analysis
 
@@ -54,32 +83,42 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 TEMP_FOLDER = "temp"
 os.makedirs(TEMP_FOLDER, exist_ok=True)
 
+# Finished exports, reused until the results data version changes
+EXPORT_CACHE_FOLDER = os.path.join(TEMP_FOLDER, "exports")
+export_cache = ExportCache(EXPORT_CACHE_FOLDER)
+
+# Most results one /api/update-marks-batch request may edit
+MAX_BATCH_UPDATES = 1000
+# Results partitioned into a term file are shown but never written
+CLOSED_TERM_MESSAGE = "Results of closed academic years are read-only."
+
+# Rendered analytics responses, dropped by the results write paths as soon as
+# the marks they were built from change
+response_cache = ResponseCache(max_entries=1024, ttl_seconds=300)
+
+
+@on_results_changed
+def invalidate_cached_responses(changes):
+    for roll_number, class_year, subject, exam_type in changes:
+        if subject is None:
+            response_cache.clear()  # Default CO mapping, used by every course
+        elif roll_number is None:
+            # CO mapping of one course
+            response_cache.invalidate(("subject", subject))
+            response_cache.invalidate(("student_analytics",))
+        else:
+            response_cache.invalidate(("exam", subject, class_year, exam_type))
+            response_cache.invalidate(("student", roll_number))
+            response_cache.invalidate(("course", subject))
+            response_cache.invalidate(("class", subject, class_year))
+            response_cache.invalidate(("gradebook", class_year))
+
 
 # Helper function to check allowed file extensions
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-# --- New Helper Function for Course Outcomes ---
-def get_course_outcome(exam_type, question_number):
-    if exam_type == "Mid 1":
-        if question_number in [1, 2]:
-            return "CO1"
-        elif question_number in [3, 4]:
-            return "CO2"
-        elif question_number in [5, 6]:
-            return "CO3"
-    elif exam_type == "Mid 2":
-        if question_number in [1, 2]:
-            return "CO3"
-        elif question_number in [3, 4]:
-            return "CO4"
-        elif question_number in [5, 6]:
-            return "CO5"
-    # Default for unmapped questions or other exam types
-    return "N/A"
-
-
 # Login required decorator
 def login_required(user_type):
     def decorator(f):
@@ -98,6 +137,125 @@ def login_required(user_type):
     return decorator
 
 
+# Response cache decorator for JSON views; goes below login_required.
+# tags(view_args, response) names the data the response depends on, see
+# invalidate_cached_responses.
+def cached_response(tags):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = (
+                f.__name__,
+                session.get("user_id"),
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+            )
+            cached = response_cache.get(key)
+            if cached is not None:
+                body, status = cached
+                response = app.response_class(
+                    body, status=status, mimetype="application/json"
+                )
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            generation = response_cache.generation
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code in (200, 404):
+                response_cache.set(
+                    key,
+                    (response.get_data(), response.status_code),
+                    tags(kwargs, response),
+                    generation,
+                )
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return decorated_function
+
+    return decorator
+
+
+def exam_cache_tags(subject_arg):
+    def tags(view_args, response):
+        subject = request.args.get(subject_arg)
+        return [
+            (
+                "exam",
+                subject,
+                request.args.get("class_year"),
+                request.args.get("exam_type"),
+            ),
+            ("subject", subject),
+        ]
+
+    return tags
+
+
+def course_cache_tags(view_args, response):
+    course_id = request.args.get("course_id")
+    return [("course", course_id), ("subject", course_id)]
+
+
+def class_cache_tags(view_args, response):
+    subject = request.args.get("subject")
+    return [("class", subject, request.args.get("class_year")), ("subject", subject)]
+
+
+def gradebook_cache_tags(view_args, response):
+    return [("gradebook", request.args.get("class_year"))]
+
+
+def student_cache_tags(view_args, response):
+    # Class ranks also move when a classmate's marks change
+    tags = [("student", view_args["student_id"]), ("student_analytics",)]
+    for rank in (response.get_json(silent=True) or {}).get("exam_ranks", []):
+        tags.append(("exam", rank["subject"], rank["class_year"], rank["exam_type"]))
+    return tags
+
+
+# Strong ETags for JSON views of one exam, goes between login_required and
+# cached_response. The tag is the exam's data version plus a hash of the view,
+# user and query string, so a matching If-None-Match is answered with a 304
+# after one primary key lookup, before the view runs any query.
+def conditional_response(subject_arg):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            subject = request.args.get(subject_arg)
+            class_year = request.args.get("class_year")
+            exam_type = request.args.get("exam_type")
+            if not all([subject, class_year, exam_type]):
+                return f(*args, **kwargs)
+            version = db_results.get_exam_data_version(subject, class_year, exam_type)
+            if version is None:
+                return f(*args, **kwargs)
+
+            view = json.dumps(
+                [
+                    f.__name__,
+                    session.get("user_id"),
+                    sorted(request.args.items(multi=True)),
+                ]
+            )
+            etag = f"{version}-{hashlib.sha1(view.encode()).hexdigest()[:16]}"
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                # A streamed body is only complete once it has been sent, so it
+                # gets no validator the browser could reuse a truncated copy with
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        return decorated_function
+
+    return decorator
+
+
 @app.route("/")
 def index():
     return render_template("portal.html")
@@ -179,6 +337,44 @@ def teacher_register():
     return render_template("teacher_register.html")
 
 
+@app.route("/teacher/import_students", methods=["POST"])
+@login_required("teacher")
+def import_students():
+    roster = request.files.get("roster")
+    if not roster or not roster.filename:
+        return jsonify({"success": False, "message": "No roster file uploaded"}), 400
+    extension = roster.filename.rsplit(".", 1)[-1].lower()
+    if extension not in ROSTER_EXTENSIONS:
+        return (
+            jsonify({"success": False, "message": "Roster must be .csv or .xlsx"}),
+            400,
+        )
+
+    try:
+        students, errors = read_roster(roster.read(), roster.filename)
+    except Exception as e:
+        print(f"Error reading roster: {e}")
+        return jsonify({"success": False, "message": "Could not read roster"}), 400
+    if not students:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": "No valid students in roster",
+                    "errors": errors,
+                }
+            ),
+            400,
+        )
+
+    success, message, summary = db.register_students_bulk(students)
+    status = 201 if success else 500
+    return (
+        jsonify({"success": success, "message": message, "errors": errors, **summary}),
+        status,
+    )
+
+
 @app.route("/student/login", methods=["GET", "POST"])
 def student_login():
     if request.method == "POST":
@@ -484,8 +680,18 @@ def view_marks():
     )
 
 
+def annotate_course_outcomes(student_result):
+    course_id = student_result["subject"]
+    current_exam_type = student_result["exam_type"]
+    for q_key, q_data in student_result["questions"].items():
+        question_number = int(q_key.replace("Q", ""))
+        q_data["co"] = get_course_outcome(course_id, current_exam_type, question_number)
+    return student_result
+
+
 @app.route("/api/get_marks", methods=["GET"])
 @login_required("teacher")
+@conditional_response("subject")
 def get_marks():
     class_year = request.args.get("class_year")
     subject = request.args.get("subject")
@@ -494,14 +700,61 @@ def get_marks():
     if not all([class_year, subject, exam_type]):
         return jsonify({"error": "Missing filter parameters"}), 400
 
-    results = db_results.get_filtered_results(class_year, subject, exam_type)
+    # Optional academic year; a closed year is read from its term file only
+    academic_year = request.args.get("academic_year", type=int)
+
+    # Optional keyset cursor: the (roll_number, id) of the last row already shown
+    after = None
+    after_roll_number = request.args.get("after_roll_number")
+    after_id = request.args.get("after_id", type=int)
+    if after_roll_number is not None and after_id is not None:
+        after = (after_roll_number, after_id)
+
+    if request.args.get("stream") == "1":
+        # Newline-delimited JSON, one result per line as it is read from the cursor;
+        # a read that fails part-way ends with an {"error": ...} line
+        def generate():
+            for student_result in db_results.stream_filtered_results(
+                class_year, subject, exam_type, after, academic_year
+            ):
+                if "error" not in student_result:
+                    annotate_course_outcomes(student_result)
+                yield json.dumps(student_result) + "\n"
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
+        )
+
+    page_size = request.args.get("page_size", type=int)
+    if page_size:
+        page_size = max(1, min(page_size, 1000))
+        results, next_cursor = db_results.get_filtered_results_page(
+            class_year, subject, exam_type, after, page_size, academic_year
+        )
+        for student_result in results:
+            annotate_course_outcomes(student_result)
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "results": results,
+                    "next_cursor": (
+                        {"roll_number": next_cursor[0], "id": next_cursor[1]}
+                        if next_cursor
+                        else None
+                    ),
+                }
+            ),
+            200,
+        )
+
+    results = db_results.get_filtered_results(
+        class_year, subject, exam_type, academic_year
+    )
 
     if results:
         for student_result in results:
-            current_exam_type = student_result["exam_type"]
-            for q_key, q_data in student_result["questions"].items():
-                question_number = int(q_key.replace("Q", ""))
-                q_data["co"] = get_course_outcome(current_exam_type, question_number)
+            annotate_course_outcomes(student_result)
 
         return jsonify({"success": True, "results": results}), 200
     else:
@@ -533,6 +786,8 @@ def delete_marks():
             jsonify({"success": True, "message": "Result deleted successfully!"}),
             200,
         )
+    elif db_results.has_closed_term_result(roll_number, class_year, subject, exam_type):
+        return jsonify({"success": False, "message": CLOSED_TERM_MESSAGE}), 409
     else:
         return jsonify({"success": False, "message": "Failed to delete result."}), 500
 
@@ -546,6 +801,8 @@ def update_marks():
 
     if not all([result_id, question_data]):
         return jsonify({"success": False, "message": "Missing parameters"}), 400
+    if db_results.get_closed_term_result_ids([result_id]):
+        return jsonify({"success": False, "message": CLOSED_TERM_MESSAGE}), 409
 
     if db_results.update_question_marks(result_id, question_data):
         return jsonify({"success": True, "message": "Marks updated successfully!"}), 200
@@ -553,63 +810,357 @@ def update_marks():
         return jsonify({"success": False, "message": "Failed to update marks."}), 500
 
 
+def parse_question_data(question_data):
+    # {"Q1": {"a": 1, "b": 2, ...}, ...} with every part a number
+    parsed = {}
+    for q_key, parts in question_data.items():
+        if not re.fullmatch(r"Q\d+", q_key):
+            raise ValueError(f"Invalid question {q_key}")
+        parsed[q_key] = {part: float(parts[part]) for part in QUESTION_PARTS}
+    return parsed
+
+
+@app.route("/api/update-marks-batch", methods=["POST"])
+@login_required("teacher")
+def update_marks_batch():
+    data = request.get_json(silent=True) or {}
+    updates = data.get("updates")
+
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"success": False, "message": "Missing parameters"}), 400
+    if len(updates) > MAX_BATCH_UPDATES:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": f"At most {MAX_BATCH_UPDATES} results per request.",
+                }
+            ),
+            400,
+        )
+    try:
+        edits = [
+            (int(update["result_id"]), parse_question_data(update["question_data"]))
+            for update in updates
+        ]
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": "Each update needs a result_id and question_data "
+                    "with numeric parts a-d.",
+                }
+            ),
+            400,
+        )
+
+    closed_term_ids = db_results.get_closed_term_result_ids(
+        list(dict.fromkeys(result_id for result_id, _ in edits))
+    )
+    if closed_term_ids:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": CLOSED_TERM_MESSAGE,
+                    "closed_term_ids": closed_term_ids,
+                }
+            ),
+            409,
+        )
+
+    # Results of other teachers' courses are left alone and reported back
+    results, rejected_ids = db_results.update_question_marks_batch(
+        edits, session.get("user_id")
+    )
+    if results is None:
+        return jsonify({"success": False, "message": "Failed to update marks."}), 500
+    # Only the results whose marks changed, for the page to patch in place
+    for student_result in results:
+        annotate_course_outcomes(student_result)
+    message = f"Updated {len(results)} result(s)."
+    if rejected_ids:
+        message += f" Skipped {len(rejected_ids)} result(s) not in your courses."
+    return (
+        jsonify(
+            {
+                "success": True,
+                "message": message,
+                "results": results,
+                "rejected_ids": rejected_ids,
+            }
+        ),
+        200,
+    )
+
+
+def bulk_criteria(data):
+    # Result ids and/or view_marks filters choosing the results of a bulk
+    # operation; raises TypeError/ValueError on malformed ids or year
+    result_ids = data.get("result_ids")
+    if result_ids is not None:
+        result_ids = [int(result_id) for result_id in result_ids]
+    academic_year = data.get("academic_year")
+    return {
+        "result_ids": result_ids,
+        "class_year": data.get("class_year") or None,
+        "subject": data.get("subject") or None,
+        "exam_type": data.get("exam_type") or None,
+        "year": int(academic_year) if academic_year else None,
+    }
+
+
+def bulk_criteria_error(data, teacher_id):
+    # (criteria, None), or (None, error response) when bad ones are given or
+    # they are not limited to one of the teacher's own courses
+    try:
+        criteria = bulk_criteria(data)
+    except (TypeError, ValueError):
+        message = "result_ids must be a list of result ids and academic_year a year."
+    else:
+        if not criteria["subject"]:
+            message = "Select the subject of the results."
+        elif criteria["subject"] not in {
+            c["course_id"] for c in db.get_teacher_courses(teacher_id)
+        }:
+            message = "You can only change results of your own courses."
+            return None, (jsonify({"success": False, "message": message}), 403)
+        else:
+            return criteria, None
+    return None, (jsonify({"success": False, "message": message}), 400)
+
+
+@app.route("/api/delete-marks-bulk", methods=["POST"])
+@login_required("teacher")
+def delete_marks_bulk():
+    data = request.get_json(silent=True) or {}
+    criteria, error = bulk_criteria_error(data, session.get("user_id"))
+    if error:
+        return error
+
+    counts = db_results.delete_results(**criteria)
+    if counts is None:
+        return jsonify({"success": False, "message": "Failed to delete results."}), 500
+    return (
+        jsonify(
+            {
+                "success": True,
+                "message": f"Deleted {counts['results']} result(s).",
+                "deleted": counts,
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/api/regrade-marks", methods=["POST"])
+@login_required("teacher")
+def regrade_marks():
+    data = request.get_json(silent=True) or {}
+    teacher_id = session.get("user_id")
+    criteria, error = bulk_criteria_error(data, teacher_id)
+    if error:
+        return error
+    new_subject = data.get("new_subject") or None
+    new_exam_type = data.get("new_exam_type") or None
+
+    if not (new_subject or new_exam_type):
+        return (
+            jsonify(
+                {"success": False, "message": "Give a new subject and/or exam type."}
+            ),
+            400,
+        )
+    if new_subject and new_subject not in {
+        c["course_id"] for c in db.get_teacher_courses(teacher_id)
+    }:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": "Results can only be moved to one of your own courses.",
+                }
+            ),
+            400,
+        )
+
+    counts = db_results.move_results(new_subject, new_exam_type, **criteria)
+    if counts is None:
+        return jsonify({"success": False, "message": "Failed to move results."}), 500
+    if counts["conflicts"]:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": f"{counts['conflicts']} result(s) would duplicate an "
+                    "existing result for the same exam; nothing was moved.",
+                    "conflicts": counts["conflicts"],
+                }
+            ),
+            409,
+        )
+    return (
+        jsonify(
+            {
+                "success": True,
+                "message": f"Moved {counts['results']} result(s).",
+                "moved": counts["results"],
+            }
+        ),
+        200,
+    )
+
+
 @app.route("/download_excel")
 @login_required("teacher")
 def download_excel():
-    all_results = db_results.get_all_results()
-    if not all_results:
+    export_format = request.args.get("format", "xlsx")
+    if export_format not in EXPORT_FORMATS:
+        flash("Unsupported export format", "error")
+        return redirect(url_for("view_marks"))
+    mimetype, extension = EXPORT_FORMATS[export_format]
+
+    # Same optional filters as the view_marks page
+    filters = {
+        "class_year": request.args.get("class_year") or None,
+        "subject": request.args.get("subject") or None,
+        "exam_type": request.args.get("exam_type") or None,
+        "year": request.args.get("academic_year", type=int),
+    }
+    download_name = f"results.{extension}"
+
+    data_version = db_results.get_data_version()
+    if data_version is not None:
+        cache_key = export_cache_key(filters, data_version, export_format)
+        cached_path = export_cache.get(cache_key, extension)
+        if cached_path:
+            return send_file(
+                cached_path,
+                mimetype=mimetype,
+                as_attachment=True,
+                download_name=download_name,
+            )
+    else:
+        cache_key = uuid.uuid4().hex  # Unknown version, never reused
+
+    results = db_results.stream_results(**filters)
+    first_result = next(results, None)
+    if first_result is None:
         flash("No data available to download", "error")
         return redirect(url_for("view_marks"))
+    rows = export_rows(chain([first_result], results))
 
-    question_part_columns = []
-    if all_results:
-        if all_results[0] and "questions" in all_results[0]:
-            first_result_questions_keys = sorted(
-                all_results[0]["questions"].keys(), key=lambda x: int(x[1:])
-            )
-            for q_num_str in first_result_questions_keys:
-                question_part_columns.extend(
-                    [f"{q_num_str}a", f"{q_num_str}b", f"{q_num_str}c", f"{q_num_str}d"]
-                )
+    if export_format == "xlsx":
+        # xlsx is a zip archive, so it has to be finished on disk before sending
+        excel_file_path = export_cache.build_file(
+            cache_key, extension, lambda path: write_xlsx(rows, path)
+        )
+        return send_file(
+            excel_file_path,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name,
+        )
 
-    columns = (
-        [
-            "Roll Number",
-            "Class Year",
-            "Subject",
-            "Exam Type",
-            "Academic Year",
-        ]
-        + question_part_columns
-        + ["Total Marks"]
+    # CSV streams straight from the database cursor to the client, and is
+    # kept in the cache once the whole file has been sent
+    chunks = iter_csv(rows)
+    if export_format == "csv.gz":
+        chunks = iter_gzip(chunks)
+    return Response(
+        stream_with_context(
+            export_cache.stream_and_store(cache_key, extension, chunks)
+        ),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={download_name}"},
     )
 
-    data_for_df = []
-    for result in all_results:
-        row = [
-            result["roll_number"],
-            result["class_year"],
-            result["subject"],
-            result["exam_type"],
-            result["year"],
-        ]
 
-        for q_col in question_part_columns:
-            q_num_str = q_col[:-1]
-            part = q_col[-1]
-            marks = result["questions"].get(q_num_str, {})
-            row.append(marks.get(part, 0.0))
+@app.route("/api/gradebook", methods=["GET"])
+@login_required("teacher")
+@cached_response(gradebook_cache_tags)
+def get_gradebook():
+    class_year = request.args.get("class_year")
+    academic_year = request.args.get("academic_year", type=int)
+    after = request.args.get("after")
+    page_size = max(1, min(request.args.get("page_size", 100, type=int), 1000))
 
-        row.append(result["total_marks"])
-        data_for_df.append(row)
+    if not class_year:
+        return jsonify({"success": False, "message": "Missing class year"}), 400
 
-    df = pd.DataFrame(data_for_df, columns=columns)
+    columns, rows, next_cursor = db_results.get_gradebook_page(
+        class_year, after, page_size, academic_year
+    )
+    if not columns:
+        return (
+            jsonify(
+                {"success": False, "message": "No marks found for this class year."}
+            ),
+            404,
+        )
+    return (
+        jsonify(
+            {
+                "success": True,
+                "class_year": class_year,
+                "columns": [
+                    {"subject": subject, "exam_type": exam_type}
+                    for subject, exam_type in columns
+                ],
+                "students": [
+                    {"roll_number": row[0], "marks": list(row[1:])} for row in rows
+                ],
+                "next_cursor": next_cursor,
+            }
+        ),
+        200,
+    )
 
-    os.makedirs(TEMP_FOLDER, exist_ok=True)
-    excel_file_path = os.path.join(TEMP_FOLDER, "results.xlsx")
-    df.to_excel(excel_file_path, index=False)
 
-    return send_file(excel_file_path, as_attachment=True, download_name="results.xlsx")
+@app.route("/download_gradebook")
+@login_required("teacher")
+def download_gradebook():
+    class_year = request.args.get("class_year")
+    academic_year = request.args.get("academic_year", type=int)
+    if not class_year:
+        flash("Select a class year to download its gradebook", "error")
+        return redirect(url_for("view_marks"))
+    mimetype, extension = EXPORT_FORMATS["xlsx"]
+    download_name = f"gradebook.{extension}"
+
+    data_version = db_results.get_data_version()
+    if data_version is not None:
+        cache_key = export_cache_key(
+            {"gradebook": class_year, "year": academic_year}, data_version, "xlsx"
+        )
+        cached_path = export_cache.get(cache_key, extension)
+        if cached_path:
+            return send_file(
+                cached_path,
+                mimetype=mimetype,
+                as_attachment=True,
+                download_name=download_name,
+            )
+    else:
+        cache_key = uuid.uuid4().hex  # Unknown version, never reused
+
+    columns = db_results.get_gradebook_columns(class_year, academic_year)
+    if not columns:
+        flash("No data available to download", "error")
+        return redirect(url_for("view_marks"))
+    rows = db_results.stream_gradebook(class_year, columns, academic_year)
+    excel_file_path = export_cache.build_file(
+        cache_key,
+        extension,
+        lambda path: write_xlsx(rows, path, gradebook_header(columns), "Gradebook"),
+    )
+    return send_file(
+        excel_file_path,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=download_name,
+    )
 
 
 @app.route("/marks_analysis")
@@ -630,6 +1181,8 @@ def marks_analysis():
 
 @app.route("/get_analysis", methods=["GET"])
 @login_required("teacher")
+@conditional_response("subject")
+@cached_response(exam_cache_tags("subject"))
 def get_analysis():
     class_year = request.args.get("class_year")
     subject = request.args.get("subject")
@@ -639,80 +1192,76 @@ def get_analysis():
         return jsonify({"error": "Missing filter parameters"}), 400
 
     teacher_id = session.get("user_id")
-    raw_marks_data = db_results.get_raw_question_marks_for_co_analysis(
+    # Per-question counts and sums are grouped in SQL; Python sees six rows
+    question_statistics = db_results.get_question_statistics(
         teacher_id, subject, exam_type, class_year
     )
 
-    if not raw_marks_data:
+    if not question_statistics:
         return (
             jsonify({"success": False, "message": "No data found for analysis."}),
             404,
         )
 
-    total_scores = [sum(row[3:]) for row in raw_marks_data]
-    average_overall = sum(total_scores) / len(total_scores) if total_scores else 0
-
-    question_sums = {}
-    question_counts = {}
-    for _, _, q_num, pa, pb, pc, pd in raw_marks_data:
-        if q_num not in question_sums:
-            question_sums[q_num] = {"a": 0.0, "b": 0.0, "c": 0.0, "d": 0.0}
-            question_counts[q_num] = 0
-        question_sums[q_num]["a"] += pa
-        question_sums[q_num]["b"] += pb
-        question_sums[q_num]["c"] += pc
-        question_sums[q_num]["d"] += pd
-        question_counts[q_num] += 1
-
-    question_analysis = []
-    for q_num in sorted(question_sums.keys()):
-        count = question_counts[q_num]
-        if count > 0:
-            question_analysis.append(
-                {
-                    "question": f"Q{q_num}",
-                    "average_marks": {
-                        "a": round(question_sums[q_num]["a"] / count, 2),
-                        "b": round(question_sums[q_num]["b"] / count, 2),
-                        "c": round(question_sums[q_num]["c"] / count, 2),
-                        "d": round(question_sums[q_num]["d"] / count, 2),
-                    },
-                }
-            )
+    # Class-wide CO sums are maintained incrementally in co_attainment
+    co_performance = co_percentages(
+        row[1:]
+        for row in db_results.get_co_attainment(
+            teacher_id, subject, exam_type, class_year
+        )
+    )
 
-    co_scores_sum = {}
-    co_max_sum = {}
-    max_marks_per_part = 5.0
-
-    for roll_number, exam_type_db, q_num, pa, pb, pc, pd in raw_marks_data:
-        co = get_course_outcome(exam_type_db, q_num)
-        if co != "N/A":
-            if co not in co_scores_sum:
-                co_scores_sum[co] = 0.0
-                co_max_sum[co] = 0.0
-
-            co_scores_sum[co] += pa + pb + pc + pd
-            co_max_sum[co] += 4 * max_marks_per_part
-
-    co_performance = {}
-    for co, total_obtained in co_scores_sum.items():
-        total_max = co_max_sum[co]
-        if total_max > 0:
-            co_performance[co] = round((total_obtained / total_max) * 100, 2)
-        else:
-            co_performance[co] = 0
+    questions, average_overall = question_analysis(question_statistics)
+
+    # One row per result; histogram, percentiles and top/bottom k all come
+    # from this single read
+    score_rows = db_results.get_result_scores(
+        teacher_id, subject, exam_type, class_year
+    )
+    scores = [score for _, score in score_rows]
+    top_performers, needs_improvement = top_and_bottom(score_rows)
 
     analysis_data = {
         "average_overall": round(average_overall, 2),
-        "question_analysis": question_analysis,
+        "question_analysis": questions,
         "co_performance": co_performance,
-        "top_performers": [],
-        "needs_improvement": [],
+        "score_distribution": {
+            **score_histogram(scores),
+            "max_score": MAX_TOTAL_MARKS,
+            "percentiles": score_percentiles(scores),
+        },
+        "top_performers": top_performers,
+        "needs_improvement": needs_improvement,
     }
 
     return jsonify({"success": True, "data": analysis_data}), 200
 
 
+@app.route("/get_item_analysis", methods=["GET"])
+@login_required("teacher")
+@conditional_response("subject")
+@cached_response(exam_cache_tags("subject"))
+def get_item_analysis():
+    class_year = request.args.get("class_year")
+    subject = request.args.get("subject")
+    exam_type = request.args.get("exam_type")
+
+    if not all([class_year, subject, exam_type]):
+        return jsonify({"error": "Missing filter parameters"}), 400
+
+    teacher_id = session.get("user_id")
+    rows = db_results.get_marks_rows(teacher_id, subject, exam_type, class_year)
+    if not rows:
+        return (
+            jsonify({"success": False, "message": "No data found for analysis."}),
+            404,
+        )
+
+    # Every statistic is an array operation over the results x parts matrix
+    item_data = MarksCube(rows, subject).item_analysis()
+    return jsonify({"success": True, "data": item_data}), 200
+
+
 @app.route("/teacher/add_course", methods=["GET", "POST"])
 @login_required("teacher")
 def add_course_page():
@@ -734,7 +1283,90 @@ def add_course_page():
 
     teacher_id = session.get("user_id")
     courses = db.get_teacher_courses(teacher_id)
-    return render_template("add_course.html", courses=courses)
+    course_outcomes = db.get_course_outcome_maps([c["course_id"] for c in courses])
+    attainment_settings = db.get_course_attainment_settings(
+        [c["course_id"] for c in courses]
+    )
+    return render_template(
+        "add_course.html",
+        courses=courses,
+        course_outcomes=course_outcomes,
+        question_numbers=list(QUESTION_NUMBERS),
+        attainment_settings=attainment_settings,
+        exam_types=sorted(db_results.get_all_exam_types()),
+    )
+
+
+@app.route("/teacher/course_outcomes", methods=["POST"])
+@login_required("teacher")
+def save_course_outcomes():
+    course_id = request.form.get("course_id")
+    exam_type = (request.form.get("exam_type") or "").strip()
+    teacher_id = session.get("user_id")
+
+    if not all([course_id, exam_type]):
+        flash("Select a course and enter an exam type.", "error")
+        return redirect(url_for("add_course_page"))
+    if course_id not in {c["course_id"] for c in db.get_teacher_courses(teacher_id)}:
+        flash("You can only edit course outcomes of your own courses.", "error")
+        return redirect(url_for("add_course_page"))
+
+    # Blank questions are left unmapped ("N/A")
+    question_cos = {}
+    for q_num in QUESTION_NUMBERS:
+        co = (request.form.get(f"co_q{q_num}") or "").strip().upper()
+        if co:
+            question_cos[q_num] = co
+
+    success, message = db.set_course_outcomes(course_id, exam_type, question_cos)
+    flash(message, "success" if success else "error")
+    return redirect(url_for("add_course_page"))
+
+
+@app.route("/teacher/course_attainment", methods=["POST"])
+@login_required("teacher")
+def save_course_attainment():
+    course_id = request.form.get("course_id")
+    teacher_id = session.get("user_id")
+
+    if not course_id:
+        flash("Select a course.", "error")
+        return redirect(url_for("add_course_page"))
+    if course_id not in {c["course_id"] for c in db.get_teacher_courses(teacher_id)}:
+        flash("You can only edit attainment settings of your own courses.", "error")
+        return redirect(url_for("add_course_page"))
+
+    try:
+        target_percent = float(request.form.get("target_percent"))
+        levels = [float(request.form.get(f"level_{level}")) for level in (1, 2, 3)]
+        # Blank weights keep the default
+        exam_weights = {
+            key[len("weight_") :]: float(value)
+            for key, value in request.form.items()
+            if key.startswith("weight_") and value.strip()
+        }
+    except (TypeError, ValueError):
+        flash("Targets, levels and weights must be numbers.", "error")
+        return redirect(url_for("add_course_page"))
+    if not (
+        0 <= target_percent <= 100
+        and 0 <= levels[0] <= levels[1] <= levels[2] <= 100
+        and all(weight >= 0 for weight in exam_weights.values())
+    ):
+        flash(
+            "Percentages must be between 0 and 100, levels in increasing order "
+            "and weights not negative.",
+            "error",
+        )
+        return redirect(url_for("add_course_page"))
+
+    success, message = db.set_course_attainment_settings(
+        course_id, exam_weights, target_percent, levels
+    )
+    if success:
+        response_cache.invalidate(("course", course_id))
+    flash(message, "success" if success else "error")
+    return redirect(url_for("add_course_page"))
 
 
 @app.route("/teacher/co-performance")
@@ -755,6 +1387,8 @@ def teacher_co_performance_page():
 
 @app.route("/api/teacher/co-performance-data", methods=["GET"])
 @login_required("teacher")
+@conditional_response("course_id")
+@cached_response(exam_cache_tags("course_id"))
 def get_teacher_co_performance_data():
     teacher_id = session.get("user_id")
     course_id = request.args.get("course_id")
@@ -769,11 +1403,12 @@ def get_teacher_co_performance_data():
             400,
         )
 
-    raw_marks_data = db_results.get_raw_question_marks_for_co_analysis(
-        teacher_id, course_id, exam_type, class_year
+    # Per-student CO sums are maintained incrementally in co_attainment
+    student_co_rows = db_results.get_co_attainment(
+        teacher_id, course_id, exam_type, class_year, per_student=True
     )
 
-    if not raw_marks_data:
+    if not student_co_rows:
         return (
             jsonify(
                 {"success": False, "message": "No data found for the selected filters."}
@@ -781,57 +1416,109 @@ def get_teacher_co_performance_data():
             404,
         )
 
-    student_co_attainment = {}
-    max_marks_per_part = 5.0
+    co_labels = exam_course_outcomes(course_id, exam_type)
+    formatted_student_co_data = student_co_percentages(student_co_rows, co_labels)
 
-    all_possible_cos = set()
-    for q_num in range(1, 7):
-        co = get_course_outcome(exam_type, q_num)
-        if co != "N/A":
-            all_possible_cos.add(co)
-    sorted_possible_cos = sorted(list(all_possible_cos))
+    return (
+        jsonify(
+            {
+                "success": True,
+                "co_data": formatted_student_co_data,
+                "co_labels": co_labels,
+            }
+        ),
+        200,
+    )
 
-    for co in sorted_possible_cos:
-        for roll_number, exam_type_db, q_num, pa, pb, pc, pd in raw_marks_data:
-            if roll_number not in student_co_attainment:
-                student_co_attainment[roll_number] = {
-                    co: {"obtained": 0.0, "max": 0.0} for co in sorted_possible_cos
-                }
 
-            co_for_question = get_course_outcome(exam_type_db, q_num)
-            if (
-                co_for_question != "N/A"
-                and co_for_question in student_co_attainment[roll_number]
-            ):
-                student_co_attainment[roll_number][co_for_question]["obtained"] += (
-                    pa + pb + pc + pd
-                )
-                student_co_attainment[roll_number][co_for_question]["max"] += (
-                    4 * max_marks_per_part
-                )
+@app.route("/api/teacher/course-co-attainment", methods=["GET"])
+@login_required("teacher")
+@cached_response(course_cache_tags)
+def get_course_co_attainment():
+    teacher_id = session.get("user_id")
+    course_id = request.args.get("course_id")
+    class_year = request.args.get("class_year") or None  # Optional
 
-    formatted_student_co_data = []
-    for roll, co_data in student_co_attainment.items():
-        student_row = {"roll_number": roll}
-        for co, marks in co_data.items():
-            attainment_percentage = (
-                (marks["obtained"] / marks["max"]) * 100 if marks["max"] > 0 else 0
-            )
-            student_row[co] = round(attainment_percentage, 2)
-        formatted_student_co_data.append(student_row)
+    if not course_id:
+        return jsonify({"error": "Missing filter parameter (Course)"}), 400
+
+    settings = db.get_course_attainment_settings([course_id])[course_id]
+    # One grouped query over co_attainment combines every exam of the course
+    co_rows, exam_rows = db_results.get_course_co_attainment(
+        teacher_id, course_id, settings["target_percent"], class_year
+    )
+    if not co_rows:
+        return (
+            jsonify(
+                {"success": False, "message": "No data found for the selected course."}
+            ),
+            404,
+        )
 
     return (
         jsonify(
             {
                 "success": True,
-                "co_data": formatted_student_co_data,
-                "co_labels": sorted_possible_cos,
+                "course_id": course_id,
+                "class_year": class_year,
+                "settings": settings,
+                "co_attainment": course_attainment(
+                    co_rows, exam_rows, settings["levels"]
+                ),
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/api/teacher/class-analytics", methods=["GET"])
+@login_required("teacher")
+@cached_response(class_cache_tags)
+def get_class_analytics():
+    teacher_id = session.get("user_id")
+    subject = request.args.get("subject")
+    class_year = request.args.get("class_year")
+
+    if not all([subject, class_year]):
+        return (
+            jsonify({"error": "Missing filter parameters (Subject, Class Year)"}),
+            400,
+        )
+
+    # Every exam of the class in one read, summarised in one array pass
+    rows = db_results.get_marks_rows(teacher_id, subject, class_year=class_year)
+    if not rows:
+        return (
+            jsonify(
+                {"success": False, "message": "No data found for the selected class."}
+            ),
+            404,
+        )
+
+    cube = MarksCube(rows, subject)
+    exam_types, co_labels, students = class_summary(cube)
+    return (
+        jsonify(
+            {
+                "success": True,
+                "subject": subject,
+                "class_year": class_year,
+                "class_average": round(float(cube.totals().mean()), 2),
+                "exam_types": exam_types,
+                "co_labels": co_labels,
+                "students": students,
             }
         ),
         200,
     )
 
 
+@app.route("/api/cache-stats")
+@login_required("teacher")
+def cache_stats():
+    return jsonify({"success": True, "response_cache": response_cache.stats()}), 200
+
+
 @app.route("/logout")
 def logout():
     session.clear()
@@ -842,11 +1529,13 @@ def logout():
 # --- API Endpoint for Student Analytics ---
 @app.route("/api/student-analytics/<student_id>")
 @login_required("student")
+@cached_response(student_cache_tags)
 def get_student_analytics(student_id):
     try:
-        student_detailed_results = db_results.get_student_detailed_results(student_id)
+        # Subject and CO roll-ups are grouped in SQL, not over every result
+        subject_summary = db_results.get_student_subject_summary(student_id)
 
-        if not student_detailed_results:
+        if not subject_summary:
             return (
                 jsonify(
                     {
@@ -856,70 +1545,48 @@ def get_student_analytics(student_id):
                         "performance_by_subject": {},
                         "improvement_trend": [],
                         "co_performance": {},
+                        "exam_ranks": [],
                     }
                 ),
                 200,
             )
 
-        total_scores_list = [r["total_marks"] for r in student_detailed_results]
-
-        average_score = sum(total_scores_list) / len(total_scores_list)
-        highest_score = max(total_scores_list)
-        lowest_score = min(total_scores_list)
-
-        subject_scores = {}
-        subject_counts = {}
-        for result in student_detailed_results:
-            subject = result["subject"]
-            if subject not in subject_scores:
-                subject_scores[subject] = 0.0
-                subject_counts[subject] = 0
-            subject_scores[subject] += result["total_marks"]
-            subject_counts[subject] += 1
+        result_count = sum(row[1] for row in subject_summary)
+        average_score = sum(row[2] for row in subject_summary) / result_count
+        lowest_score = min(row[3] for row in subject_summary)
+        highest_score = max(row[4] for row in subject_summary)
 
         performance_by_subject = {
-            subj: round(subject_scores[subj] / subject_counts[subj], 2)
-            for subj in subject_scores
+            subject: round(score_sum / count, 2)
+            for subject, count, score_sum, _, _ in subject_summary
         }
 
-        improvement_trend = []
-        for result in student_detailed_results:
-            label = f"{result['subject']} ({result['exam_type']} {result['year']})"
-            improvement_trend.append({"label": label, "score": result["total_marks"]})
-
-        student_co_attainment = {}
-        max_marks_per_part = 5.0
-
-        all_possible_student_cos = set()
-        for result in student_detailed_results:
-            exam_type_for_co = result["exam_type"]
-            for q_num_str in result["questions"]:
-                q_num = int(q_num_str.replace("Q", ""))
-                co = get_course_outcome(exam_type_for_co, q_num)
-                if co != "N/A":
-                    all_possible_student_cos.add(co)
-        sorted_student_cos = sorted(list(all_possible_student_cos))
-
-        for co_label in sorted_student_cos:  # Initialize for all possible COs
-            student_co_attainment[co_label] = {"obtained": 0.0, "max": 0.0}
-
-        for result in student_detailed_results:
-            exam_type_for_co = result["exam_type"]
-            for q_key, parts_data in result["questions"].items():
-                question_number = int(q_key.replace("Q", ""))
-                co = get_course_outcome(exam_type_for_co, question_number)
-                if co != "N/A" and co in student_co_attainment:
-                    student_co_attainment[co]["obtained"] += sum(parts_data.values())
-                    student_co_attainment[co]["max"] += 4 * max_marks_per_part
-
-        co_performance_percentages = {}
-        for co, marks_data in student_co_attainment.items():
-            if marks_data["max"] > 0:
-                co_performance_percentages[co] = round(
-                    (marks_data["obtained"] / marks_data["max"]) * 100, 2
-                )
-            else:
-                co_performance_percentages[co] = 0.0
+        improvement_trend = [
+            {"label": f"{subject} ({exam_type} {year})", "score": total_marks}
+            for subject, exam_type, year, total_marks in (
+                db_results.get_student_score_trend(student_id)
+            )
+        ]
+
+        co_performance_percentages = co_percentages(
+            db_results.get_student_co_attainment(student_id)
+        )
+
+        # Precomputed with RANK()/PERCENT_RANK() over each exam's cohort
+        exam_ranks = [
+            {
+                "subject": subject,
+                "class_year": class_year,
+                "exam_type": exam_type,
+                "year": year,
+                "rank": class_rank,
+                "cohort_size": cohort_size,
+                "percentile": round(percent_rank * 100, 1),
+            }
+            for subject, class_year, exam_type, year, class_rank, percent_rank, cohort_size in (
+                db_results.get_student_exam_ranks(student_id)
+            )
+        ]
 
         analytics = {
             "average_score": round(average_score, 1),
@@ -928,6 +1595,7 @@ def get_student_analytics(student_id):
             "performance_by_subject": performance_by_subject,
             "improvement_trend": improvement_trend,
             "co_performance": co_performance_percentages,
+            "exam_ranks": exam_ranks,
         }
 
         return jsonify(analytics), 200
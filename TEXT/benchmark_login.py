@@ -0,0 +1,101 @@
+"""Login throughput at different password-hash settings.
+
+Runs the real /student/login route through Flask's test client against a
+throwaway database, so the figures include the query and session work as well
+as the hash. Example:
+
+    python benchmark_login.py pbkdf2:sha256:600000 pbkdf2:sha256:200000 scrypt
+
+Pick the strongest setting whose per-core rate, times the cores in production,
+still covers the expected login peak; then set PASSWORD_HASH_METHOD to it.
+Existing users are rehashed to the new setting the next time they log in.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+APP_FOLDER = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_STUDENT = "BENCH001"
+BENCHMARK_PASSWORD = "benchmark-password"
+
+
+def run_logins(workdir, method, seconds):
+    """Log in repeatedly for the given time; returns the number of logins."""
+    os.chdir(workdir)  # database.py resolves ./database relative to the cwd
+    os.environ["PASSWORD_HASH_METHOD"] = method
+    sys.path.insert(0, APP_FOLDER)
+    from app import app
+
+    client = app.test_client()
+    credentials = {"studentId": BENCHMARK_STUDENT, "password": BENCHMARK_PASSWORD}
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        response = client.post("/student/login", json=credentials)
+        if response.status_code != 200:
+            raise RuntimeError(f"Login failed: {response.get_json()}")
+        count += 1
+    return count
+
+
+def benchmark(workdir, method, processes, seconds):
+    # Store the password with this method up front so no run pays for a rehash
+    import database
+
+    conn = database.create_connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO students (id, full_name, department, password) VALUES (?, ?, ?, ?)",
+        (
+            BENCHMARK_STUDENT,
+            "Benchmark Student",
+            "Benchmark",
+            database.hash_password(BENCHMARK_PASSWORD, method),
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+    with multiprocessing.Pool(processes) as pool:
+        counts = pool.starmap(run_logins, [(workdir, method, seconds)] * processes)
+    total = sum(counts) / seconds
+    return total, total / processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "methods",
+        nargs="*",
+        default=["pbkdf2:sha256:600000", "pbkdf2:sha256:200000", "scrypt"],
+        help="Werkzeug hash methods to compare",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Concurrent login workers, one per core (default: all cores)",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=5.0, help="Duration of each run"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        sys.path.insert(0, APP_FOLDER)
+        import database  # Creates the throwaway database in workdir
+
+        print(f"{'method':<28}{'logins/s':>12}{'per core':>12}{'ms/login':>12}")
+        for method in args.methods:
+            total, per_core = benchmark(workdir, method, args.processes, args.seconds)
+            print(
+                f"{method:<28}{total:>12.1f}{per_core:>12.1f}{1000 / per_core:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,56 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import os
 import random
+import re
+import gzip
+import json
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
 
 if not os.path.exists("./database"):
     os.makedirs("./database")
 
+DATABASE_PATH = "./database/education.db"
+# Closed academic years live in their own files, one per year (results_2023.db)
+TERMS_FOLDER = "./database/terms"
+# Cold tier: gzipped, VACUUMed term files, unpacked into the cache on first read
+ARCHIVE_FOLDER = "./database/archive"
+ARCHIVE_CACHE_FOLDER = os.path.join(ARCHIVE_FOLDER, "cache")
+
+# Mark sheets have six questions with four parts each (Q1a ... Q6d)
+QUESTION_NUMBERS = range(1, 7)
+QUESTION_PARTS = ("a", "b", "c", "d")
+WIDE_MARK_COLUMNS = [f"q{q}{p}" for q in QUESTION_NUMBERS for p in QUESTION_PARTS]
+MAX_MARKS_PER_PART = 5.0
+
+# Course outcome covered by each question, per exam type. Seeded into
+# course_outcome_map as the defaults (course DEFAULT_CO_COURSE) that apply to
+# every course without its own mapping for an exam type.
+CO_MAP = {
+    "Mid 1": {1: "CO1", 2: "CO1", 3: "CO2", 4: "CO2", 5: "CO3", 6: "CO3"},
+    "Mid 2": {1: "CO3", 2: "CO3", 3: "CO4", 4: "CO4", 5: "CO5", 6: "CO5"},
+}
+DEFAULT_CO_COURSE = "*"
+NO_COURSE_OUTCOMES = ("N/A",) * len(QUESTION_NUMBERS)
+
+# co_attainment rows with this roll number hold the class-wide totals
+CLASS_TOTAL_ROLL = ""
+
+# Course-level CO attainment: a student attains a CO at target_percent, and the
+# course reaches level 1, 2 or 3 when this share (%) of its students does.
+# Exams without a weight of their own count with weight 1.
+DEFAULT_CO_TARGET_PERCENT = 60.0
+DEFAULT_ATTAINMENT_LEVELS = (50.0, 60.0, 70.0)
+DEFAULT_EXAM_WEIGHT = 1.0
+
 
 def create_connection():
     try:
-        conn = sqlite3.connect("./database/education.db")
+        conn = sqlite3.connect(f"file:{DATABASE_PATH}", uri=True)
         # Enable foreign key support (important for cascading deletes)
         conn.execute("PRAGMA foreign_keys = ON;")
         return conn
@@ -19,74 +61,1610 @@ def create_connection():
         return None
 
 
-def init_db():
+def create_results_tables(c, schema="main"):
+    # Create students_results table (exam results summary)
+    c.execute(
+        f"""CREATE TABLE IF NOT EXISTS {schema}.students_results
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 roll_number TEXT NOT NULL,
+                 class_year TEXT NOT NULL,
+                 subject TEXT NOT NULL,
+                 exam_type TEXT NOT NULL,
+                 year INTEGER NOT NULL, -- Academic year (e.g., 2023)
+                 total_marks REAL NOT NULL,
+                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                 -- 1 when the q1a..q6d columns hold this result's marks
+                 wide_marks INTEGER NOT NULL DEFAULT 0,
+                 """
+        + ",\n".join(f"{col} REAL" for col in WIDE_MARK_COLUMNS)
+        + ")"
+    )
+    # Databases created before the wide layout only get the new columns
+    add_missing_columns(
+        c,
+        f"{schema}.students_results",
+        {"wide_marks": "INTEGER NOT NULL DEFAULT 0"}
+        | {col: "REAL" for col in WIDE_MARK_COLUMNS},
+    )
+
+    # Create question_marks table (detailed marks per question part)
+    c.execute(
+        f"""CREATE TABLE IF NOT EXISTS {schema}.question_marks
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 result_id INTEGER NOT NULL,
+                 question_number INTEGER NOT NULL,
+                 part_a REAL NOT NULL,
+                 part_b REAL NOT NULL,
+                 part_c REAL NOT NULL,
+                 part_d REAL NOT NULL,
+                 FOREIGN KEY(result_id) REFERENCES students_results(id) ON DELETE CASCADE)"""
+    )
+
+    # Serves the view_marks filters and their (roll_number, id) keyset pages
+    c.execute(
+        f"""CREATE INDEX IF NOT EXISTS {schema}.idx_results_exam
+        ON students_results(class_year, subject, exam_type, roll_number, id)"""
+    )
+    # A student's own results (dashboard and analytics)
+    c.execute(
+        f"""CREATE INDEX IF NOT EXISTS {schema}.idx_results_student
+        ON students_results(roll_number, subject)"""
+    )
+    # Gradebook pivot: one class year's results grouped in roll number order
+    c.execute(
+        f"""CREATE INDEX IF NOT EXISTS {schema}.idx_results_class_student
+        ON students_results(class_year, roll_number)"""
+    )
+    # Lookups of one result's question rows (sync, legacy reads, cascades)
+    c.execute(
+        f"""CREATE INDEX IF NOT EXISTS {schema}.idx_question_marks_result
+        ON question_marks(result_id)"""
+    )
+
+
+def init_db():
+    conn = create_connection()
+    if conn:
+        try:
+            c = conn.cursor()
+
+            # Create students table
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS students
+                        (id TEXT PRIMARY KEY,
+                         full_name TEXT NOT NULL,
+                         department TEXT NOT NULL,
+                         password TEXT NOT NULL)"""
+            )
+
+            # Create teachers table
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS teachers
+                        (id TEXT PRIMARY KEY,
+                         full_name TEXT NOT NULL,
+                         department TEXT NOT NULL,
+                         specialization TEXT NOT NULL,
+                         password TEXT NOT NULL)"""
+            )
+
+            create_results_tables(c)
+
+            # --- New Tables for COs ---
+            # Create courses table
+            # Assuming a course is taught by one teacher and has a unique ID and name
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS courses
+                        (course_id TEXT PRIMARY KEY,
+                         course_name TEXT NOT NULL,
+                         teacher_id TEXT, -- Can be NULL initially if course created before teacher assignment
+                         UNIQUE(course_id, teacher_id), -- A course can be taught by one teacher at a time
+                         FOREIGN KEY(teacher_id) REFERENCES teachers(id) ON DELETE SET NULL)"""
+            )
+
+            # Change counters; every results write bumps the global ('*') scope
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS data_versions
+                        (scope TEXT PRIMARY KEY,
+                         version INTEGER NOT NULL DEFAULT 0)"""
+            )
+
+            # Course outcome sums per student and per class, kept up to date by the
+            # ResultsDatabase write paths so CO dashboards never rescan the marks
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS co_attainment
+                        (subject TEXT NOT NULL,
+                         class_year TEXT NOT NULL,
+                         exam_type TEXT NOT NULL,
+                         co TEXT NOT NULL,
+                         roll_number TEXT NOT NULL, -- '' for the class-wide totals
+                         obtained REAL NOT NULL DEFAULT 0,
+                         max_marks REAL NOT NULL DEFAULT 0,
+                         PRIMARY KEY(subject, class_year, exam_type, co, roll_number))"""
+            )
+            c.execute(
+                """CREATE INDEX IF NOT EXISTS idx_co_attainment_student
+                ON co_attainment(roll_number, co)"""
+            )
+
+            # Each result's place in its cohort (same subject, class year, exam
+            # type and academic year), refreshed by the write paths that change
+            # a total, so a student's ranks are one indexed read
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS exam_ranks
+                        (result_id INTEGER PRIMARY KEY,
+                         roll_number TEXT NOT NULL,
+                         subject TEXT NOT NULL,
+                         class_year TEXT NOT NULL,
+                         exam_type TEXT NOT NULL,
+                         year INTEGER NOT NULL,
+                         total_marks REAL NOT NULL,
+                         class_rank INTEGER NOT NULL, -- 1 for the highest total
+                         percent_rank REAL NOT NULL, -- Share of the cohort below, 0 to 1
+                         cohort_size INTEGER NOT NULL)"""
+            )
+            c.execute(
+                """CREATE INDEX IF NOT EXISTS idx_exam_ranks_student
+                ON exam_ranks(roll_number, year)"""
+            )
+            c.execute(
+                """CREATE INDEX IF NOT EXISTS idx_exam_ranks_cohort
+                ON exam_ranks(subject, class_year, exam_type, year)"""
+            )
+
+            # Catalogue of the exams that have results, across every term, for
+            # the filter dropdowns; kept current by triggers on the hot table
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS exam_facets
+                        (class_year TEXT NOT NULL,
+                         subject TEXT NOT NULL,
+                         exam_type TEXT NOT NULL,
+                         results INTEGER NOT NULL,
+                         PRIMARY KEY(class_year, subject, exam_type))"""
+            )
+            for trigger in EXAM_FACET_TRIGGERS:
+                c.execute(trigger)
+
+            # The exams and students each closed term holds, so a read without
+            # a year attaches only the terms it can match
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS term_exams
+                        (year INTEGER NOT NULL,
+                         class_year TEXT NOT NULL,
+                         subject TEXT NOT NULL,
+                         exam_type TEXT NOT NULL,
+                         results INTEGER NOT NULL,
+                         PRIMARY KEY(year, class_year, subject, exam_type))"""
+            )
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS term_students
+                        (year INTEGER NOT NULL,
+                         roll_number TEXT NOT NULL,
+                         PRIMARY KEY(roll_number, year))"""
+            )
+
+            # Question -> CO per course and exam type, defaults under course '*'
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS course_outcome_map
+                        (course_id TEXT NOT NULL,
+                         exam_type TEXT NOT NULL,
+                         question_number INTEGER NOT NULL,
+                         co TEXT NOT NULL,
+                         PRIMARY KEY(course_id, exam_type, question_number))"""
+            )
+            # Per-course weights of each exam type and attainment targets
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS course_exam_weights
+                        (course_id TEXT NOT NULL,
+                         exam_type TEXT NOT NULL,
+                         weight REAL NOT NULL,
+                         PRIMARY KEY(course_id, exam_type))"""
+            )
+            c.execute(
+                """CREATE TABLE IF NOT EXISTS course_attainment_targets
+                        (course_id TEXT PRIMARY KEY,
+                         target_percent REAL NOT NULL,
+                         level_1 REAL NOT NULL,
+                         level_2 REAL NOT NULL,
+                         level_3 REAL NOT NULL)"""
+            )
+
+            c.executemany(
+                """INSERT OR IGNORE INTO course_outcome_map
+                (course_id, exam_type, question_number, co) VALUES (?, ?, ?, ?)""",
+                [
+                    (DEFAULT_CO_COURSE, exam_type, q_num, co)
+                    for exam_type, question_cos in CO_MAP.items()
+                    for q_num, co in question_cos.items()
+                ],
+            )
+
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database initialization error: {e}")
+        finally:
+            conn.close()
+    migrate_to_wide_marks()
+    catalogue_terms()
+    rebuild_co_attainment(only_if_empty=True)
+    rebuild_exam_ranks(only_if_empty=True)
+    rebuild_exam_facets(only_if_empty=True)
+
+
+# --- Course outcome mapping ---
+# course_outcome_map is read once into a dict of
+# (course_id, exam_type) -> CO per question, and dropped whenever the table
+# changes, so CO lookups in hot loops never touch the database. Only this
+# process drops it, so the TTL bounds how long a change made by another worker
+# goes unseen; the write paths read the table on their own cursor instead.
+COURSE_OUTCOME_CACHE_TTL = 300
+_course_outcome_cache = None
+
+
+def read_course_outcomes(c):
+    """The whole mapping as {(course_id, exam_type): CO per question}.
+
+    Reads on the caller's cursor, so write transactions never need a second
+    connection (which the write lock can block); raises sqlite3.Error.
+    """
+    c.execute(
+        "SELECT course_id, exam_type, question_number, co FROM course_outcome_map"
+    )
+    cache = {}
+    for course_id, exam_type, q_num, co in c.fetchall():
+        if q_num not in QUESTION_NUMBERS:
+            continue
+        cos = cache.setdefault((course_id, exam_type), list(NO_COURSE_OUTCOMES))
+        cos[q_num - 1] = co
+    return {key: tuple(cos) for key, cos in cache.items()}
+
+
+def load_course_outcomes():
+    global _course_outcome_cache
+    conn = create_connection()
+    if not conn:
+        return {}
+    try:
+        course_outcomes = read_course_outcomes(conn.cursor())
+        _course_outcome_cache = (
+            time.monotonic() + COURSE_OUTCOME_CACHE_TTL,
+            course_outcomes,
+        )
+        return course_outcomes
+    except sqlite3.Error as e:
+        # Not cached, so the next lookup tries again
+        print(f"Error loading course outcome map: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def invalidate_course_outcomes():
+    global _course_outcome_cache
+    _course_outcome_cache = None
+
+
+def course_outcome_lookup(course_id, exam_type, course_outcomes=None):
+    """Each question's CO, indexed by question_number - 1.
+
+    A course's own mapping for the exam type wins over the defaults; questions
+    and exam types mapped by neither get "N/A". course_outcomes, as returned
+    by read_course_outcomes(), replaces the cached mapping.
+    """
+    cache = course_outcomes
+    if cache is None:
+        if _course_outcome_cache and _course_outcome_cache[0] > time.monotonic():
+            cache = _course_outcome_cache[1]
+        else:
+            cache = load_course_outcomes()
+    return (
+        cache.get((course_id, exam_type))
+        or cache.get((DEFAULT_CO_COURSE, exam_type))
+        or NO_COURSE_OUTCOMES
+    )
+
+
+def get_course_outcome(course_id, exam_type, question_number):
+    if question_number not in QUESTION_NUMBERS:
+        return "N/A"
+    return course_outcome_lookup(course_id, exam_type)[question_number - 1]
+
+
+def add_missing_columns(c, table, columns):
+    schema, _, name = table.rpartition(".")
+    c.execute(f"PRAGMA {schema or 'main'}.table_info({name})")
+    existing = {row[1] for row in c.fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+# --- Academic-year partitions ---
+# education.db is the hot partition: every write and the current term's reads
+# go there. partition_term() moves a closed year into TERMS_FOLDER, after which
+# it is only ever ATTACHed read-only. Reads go through connect_results(), whose
+# temporary all_results / all_question_marks views cover exactly the terms the
+# query needs, as listed in the term_exams / term_students catalogue.
+RESULT_COLUMNS = [
+    "id",
+    "roll_number",
+    "class_year",
+    "subject",
+    "exam_type",
+    "year",
+    "total_marks",
+    "timestamp",
+    "wide_marks",
+] + WIDE_MARK_COLUMNS
+QUESTION_MARK_COLUMNS = [
+    "result_id",
+    "question_number",
+    "part_a",
+    "part_b",
+    "part_c",
+    "part_d",
+]
+# SQLite's default SQLITE_MAX_ATTACHED; a read needing more term files than this
+# copies them into temp tables a batch at a time instead
+MAX_ATTACHED_TERMS = 10
+TERM_FILTER_COLUMNS = ("roll_number", "class_year", "subject", "exam_type")
+TERM_EXAMS_UPSERT = """INSERT INTO term_exams
+    (year, class_year, subject, exam_type, results) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(year, class_year, subject, exam_type)
+    DO UPDATE SET results = results + excluded.results"""
+TERM_STUDENTS_INSERT = """INSERT OR IGNORE INTO term_students (year, roll_number)
+    SELECT DISTINCT ?, roll_number FROM {source} WHERE year = ?"""
+
+
+def current_academic_year():
+    # Uploads are stamped with the calendar year (see process_upload)
+    return datetime.now().year
+
+
+def term_path(year):
+    return os.path.join(TERMS_FOLDER, f"results_{int(year)}.db")
+
+
+def archive_path(year):
+    return os.path.join(ARCHIVE_FOLDER, f"results_{int(year)}.db.gz")
+
+
+def _years_in(folder, pattern):
+    if not os.path.isdir(folder):
+        return []
+    years = []
+    for name in os.listdir(folder):
+        match = re.fullmatch(pattern, name)
+        if match:
+            years.append(int(match.group(1)))
+    return years
+
+
+def list_archived_terms():
+    return sorted(_years_in(ARCHIVE_FOLDER, r"results_(\d{4})\.db\.gz"))
+
+
+def list_terms():
+    # Every closed year, whether it sits in a term file or in the cold archive
+    return sorted(
+        set(_years_in(TERMS_FOLDER, r"results_(\d{4})\.db"))
+        | set(list_archived_terms())
+    )
+
+
+def term_sources(year):
+    # Files holding a closed year: its term file and/or its unpacked archive
+    sources = []
+    if os.path.exists(term_path(year)):
+        sources.append(term_path(year))
+    if os.path.exists(archive_path(year)):
+        sources.append(extract_archive(year))
+    return sources
+
+
+def extract_archive(year):
+    """Path of an archived year's database, unpacked once into the cache."""
+    source = archive_path(year)
+    cached = os.path.join(ARCHIVE_CACHE_FOLDER, f"results_{int(year)}.db")
+    if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(source):
+        return cached
+    os.makedirs(ARCHIVE_CACHE_FOLDER, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(suffix=".part", dir=ARCHIVE_CACHE_FOLDER)
+    try:
+        with gzip.open(source, "rb") as src, os.fdopen(fd, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(temp_path, cached)  # Concurrent readers never see a partial file
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return cached
+
+
+def catalogue_term(year, paths):
+    # (Re)count the exams and students of one closed year from its files
+    conn = create_connection()
+    if conn:
+        try:
+            c = conn.cursor()
+            c.execute("DELETE FROM term_exams WHERE year = ?", (year,))
+            c.execute("DELETE FROM term_students WHERE year = ?", (year,))
+            for path in paths:
+                c.execute("ATTACH DATABASE ? AS term", (f"file:{path}?mode=ro",))
+                c.execute(
+                    """SELECT year, class_year, subject, exam_type, COUNT(*)
+                    FROM term.students_results WHERE year = ?
+                    GROUP BY class_year, subject, exam_type""",
+                    (year,),
+                )
+                c.executemany(TERM_EXAMS_UPSERT, c.fetchall())
+                c.execute(
+                    TERM_STUDENTS_INSERT.format(source="term.students_results"),
+                    (year, year),
+                )
+                conn.commit()  # DETACH is refused inside a transaction
+                c.execute("DETACH DATABASE term")
+            return True
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error cataloguing academic year {year}: {e}")
+            return False
+        finally:
+            conn.close()
+
+
+def catalogue_terms(include_archives=False):
+    """Catalogue the closed years partitioned before term_exams existed.
+
+    Archives are only unpacked for this when include_archives is set; until then
+    an uncatalogued archived year is attached by every read without a year.
+    """
+    conn = create_connection()
+    if conn:
+        try:
+            c = conn.cursor()
+            c.execute("SELECT DISTINCT year FROM term_exams")
+            catalogued = {row[0] for row in c.fetchall()}
+        except sqlite3.Error as e:
+            print(f"Error reading the term catalogue: {e}")
+            return
+        finally:
+            conn.close()
+        archived = set(list_archived_terms())
+        for year in list_terms():
+            if year in catalogued or year in archived and not include_archives:
+                continue
+            catalogue_term(year, term_sources(year))
+
+
+def needed_terms(c, filters):
+    """Closed years that can hold results matching filters (column -> value).
+
+    Years missing from the catalogue are always included.
+    """
+    c.execute("SELECT DISTINCT year FROM term_exams")
+    catalogued = {row[0] for row in c.fetchall()}
+    matching = catalogued
+    roll_number = filters.get("roll_number")
+    if roll_number:
+        c.execute(
+            "SELECT year FROM term_students WHERE roll_number = ?", (roll_number,)
+        )
+        matching = matching & {row[0] for row in c.fetchall()}
+    exam_filters = [
+        (column, value) for column, value in filters.items() if column != "roll_number"
+    ]
+    if exam_filters:
+        c.execute(
+            "SELECT DISTINCT year FROM term_exams WHERE "
+            + " AND ".join(f"{column} = ?" for column, _ in exam_filters),
+            [value for _, value in exam_filters],
+        )
+        matching = matching & {row[0] for row in c.fetchall()}
+    return [term for term in list_terms() if term in matching or term not in catalogued]
+
+
+def attach_terms(conn, years, filters=None):
+    """ATTACH term files read-only and define the all_results views over them.
+
+    Past MAX_ATTACHED_TERMS files, each batch of them is attached in turn and
+    its rows matching filters (column -> value) are copied into temp tables,
+    which the views then read in place of the attached files.
+    """
+    result_columns = ", ".join(RESULT_COLUMNS)
+    question_columns = ", ".join(QUESTION_MARK_COLUMNS)
+    # closed_term tells the read-only results of term files from the hot ones
+    result_selects = [
+        f"SELECT {result_columns}, 0 AS closed_term FROM main.students_results"
+    ]
+    question_selects = [f"SELECT {question_columns} FROM main.question_marks"]
+    sources = [
+        (f"term_{int(year)}_{index}", path)
+        for year in years
+        for index, path in enumerate(term_sources(year))
+    ]
+    if len(sources) <= MAX_ATTACHED_TERMS:
+        for alias, path in sources:
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (f"file:{path}?mode=ro",))
+            result_selects.append(
+                f"SELECT {result_columns}, 1 AS closed_term FROM {alias}.students_results"
+            )
+            question_selects.append(
+                f"SELECT {question_columns} FROM {alias}.question_marks"
+            )
+    else:
+        filters = filters or {}
+        where = " AND ".join(f"sr.{column} = ?" for column in filters)
+        where = f"WHERE {where}" if where else ""
+        params = list(filters.values())
+        conn.execute(
+            f"""CREATE TEMP TABLE term_results AS
+            SELECT {result_columns} FROM main.students_results WHERE 0"""
+        )
+        conn.execute(
+            f"""CREATE TEMP TABLE term_question_marks AS
+            SELECT {question_columns} FROM main.question_marks WHERE 0"""
+        )
+        for start in range(0, len(sources), MAX_ATTACHED_TERMS):
+            batch = sources[start : start + MAX_ATTACHED_TERMS]
+            for alias, path in batch:
+                conn.execute(f"ATTACH DATABASE ? AS {alias}", (f"file:{path}?mode=ro",))
+                conn.execute(
+                    f"""INSERT INTO temp.term_results
+                    SELECT {", ".join(f"sr.{col}" for col in RESULT_COLUMNS)}
+                    FROM {alias}.students_results sr {where}""",
+                    params,
+                )
+                conn.execute(
+                    f"""INSERT INTO temp.term_question_marks
+                    SELECT {", ".join(f"qm.{col}" for col in QUESTION_MARK_COLUMNS)}
+                    FROM {alias}.question_marks qm
+                    JOIN {alias}.students_results sr ON sr.id = qm.result_id
+                    {where}""",
+                    params,
+                )
+            conn.commit()  # DETACH is refused inside a transaction
+            for alias, _ in batch:
+                conn.execute(f"DETACH DATABASE {alias}")
+        conn.execute(
+            "CREATE INDEX temp.idx_term_question_marks ON term_question_marks(result_id)"
+        )
+        result_selects.append(
+            f"SELECT {result_columns}, 1 AS closed_term FROM temp.term_results"
+        )
+        question_selects.append(
+            f"SELECT {question_columns} FROM temp.term_question_marks"
+        )
+    conn.execute(
+        "CREATE TEMP VIEW all_results AS " + " UNION ALL ".join(result_selects)
+    )
+    conn.execute(
+        "CREATE TEMP VIEW all_question_marks AS " + " UNION ALL ".join(question_selects)
+    )
+
+
+def connect_results(
+    year=None, roll_number=None, class_year=None, subject=None, exam_type=None
+):
+    """Connection for a results read, routed by academic year.
+
+    A closed year attaches just that term's file and any other year stays on
+    the hot database. year=None fans out over the terms whose catalogued
+    students and exams can match the other filters (every term when none is
+    given); the query itself must still apply those filters.
+    """
+    conn = create_connection()
+    if conn:
+        try:
+            c = conn.cursor()
+            if year is not None:
+                terms = [term for term in list_terms() if term == int(year)]
+                filters = {}
+            else:
+                filters = {
+                    column: value
+                    for column, value in zip(
+                        TERM_FILTER_COLUMNS,
+                        (roll_number, class_year, subject, exam_type),
+                    )
+                    if value
+                }
+                terms = needed_terms(c, filters)
+            attach_terms(conn, terms, filters)
+        except sqlite3.Error as e:
+            conn.close()
+            print(f"Database connection error: {e}")
+            return None
+    return conn
+
+
+def partition_term(year):
+    # Move one closed academic year out of the hot database into its term file
+    year = int(year)
+    if year >= current_academic_year():
+        print(f"Academic year {year} is not closed yet, refusing to partition it.")
+        return 0
+    conn = create_connection()
+    if conn:
+        try:
+            c = conn.cursor()
+            # ATTACH would create the term file, which reads would then attach
+            c.execute(
+                "SELECT EXISTS(SELECT 1 FROM students_results WHERE year = ?)", (year,)
+            )
+            if not c.fetchone()[0]:
+                print(f"No results of {year} to partition.")
+                return 0
+            os.makedirs(TERMS_FOLDER, exist_ok=True)
+            c.execute("ATTACH DATABASE ? AS term", (term_path(year),))
+            create_results_tables(c, "term")
+            c.execute(
+                """SELECT DISTINCT NULL, class_year, subject, exam_type
+                FROM main.students_results WHERE year = ?""",
+                (year,),
+            )
+            changes = c.fetchall()
+            result_columns = ", ".join(RESULT_COLUMNS)
+            question_columns = ", ".join(QUESTION_MARK_COLUMNS)
+            c.execute(
+                f"""INSERT INTO term.students_results ({result_columns})
+                SELECT {result_columns} FROM main.students_results WHERE year = ?""",
+                (year,),
+            )
+            moved = c.rowcount
+            c.execute(
+                f"""INSERT INTO term.question_marks ({question_columns})
+                SELECT {", ".join(f"qm.{col}" for col in QUESTION_MARK_COLUMNS)}
+                FROM main.question_marks qm
+                JOIN main.students_results sr ON sr.id = qm.result_id
+                WHERE sr.year = ?""",
+                (year,),
+            )
+            c.execute(
+                """SELECT class_year, subject, exam_type, COUNT(*)
+                FROM main.students_results WHERE year = ?
+                GROUP BY class_year, subject, exam_type""",
+                (year,),
+            )
+            facets = c.fetchall()
+            c.executemany(TERM_EXAMS_UPSERT, [(year, *facet) for facet in facets])
+            c.execute(
+                TERM_STUDENTS_INSERT.format(source="main.students_results"),
+                (year, year),
+            )
+            # CASCADE removes the moved question_marks rows from the hot database
+            c.execute("DELETE FROM main.students_results WHERE year = ?", (year,))
+            # The delete trigger uncounted them, but they live on in the term file
+            c.executemany(EXAM_FACETS_UPSERT, facets)
+            bump_data_version(c, changes)
+            conn.commit()
+            c.execute("DETACH DATABASE term")
+            print(f"Moved {moved} results of {year} to {term_path(year)}")
+            return moved
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error partitioning academic year {year}: {e}")
+            return 0
+        finally:
+            conn.close()
+
+
+def archive_term(year):
+    """Move a closed year into the cold tier as a VACUUMed, gzipped database.
+
+    Rows still in the hot database are partitioned out first; an earlier
+    archive of the same year is folded back in, so the year always ends up as
+    a single archive file.
+    """
+    year = int(year)
+    if year >= current_academic_year():
+        print(f"Academic year {year} is not closed yet, refusing to archive it.")
+        return False
+    source = term_path(year)
+    if not partition_term(year) and not os.path.exists(source):
+        # Neither hot rows nor a term file: archiving would only write an
+        # empty database, or replace an earlier archive with a copy of itself
+        print(f"No results of {year} to archive.")
+        return False
+
+    os.makedirs(ARCHIVE_FOLDER, exist_ok=True)
+    fd, compact_path = tempfile.mkstemp(suffix=".db", dir=ARCHIVE_FOLDER)
+    os.close(fd)
+    os.remove(compact_path)  # VACUUM INTO needs a path that does not exist yet
+    fd, gzip_path = tempfile.mkstemp(suffix=".part", dir=ARCHIVE_FOLDER)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(source)
+        try:
+            if os.path.exists(archive_path(year)):
+                conn.execute(
+                    "ATTACH DATABASE ? AS archived",
+                    (f"file:{extract_archive(year)}?mode=ro",),
+                )
+                result_columns = ", ".join(RESULT_COLUMNS)
+                question_columns = ", ".join(QUESTION_MARK_COLUMNS)
+                conn.execute(
+                    f"""INSERT INTO main.students_results ({result_columns})
+                    SELECT {result_columns} FROM archived.students_results"""
+                )
+                conn.execute(
+                    f"""INSERT INTO main.question_marks ({question_columns})
+                    SELECT {question_columns} FROM archived.question_marks"""
+                )
+                conn.commit()
+                conn.execute("DETACH DATABASE archived")
+            conn.execute("VACUUM INTO ?", (compact_path,))
+        finally:
+            conn.close()
+        # The folded-in archive may hold exams the catalogue has not seen
+        if not catalogue_term(year, [compact_path]):
+            return False
+
+        with open(compact_path, "rb") as src, gzip.open(gzip_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(gzip_path, archive_path(year))
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error archiving academic year {year}: {e}")
+        return False
+    finally:
+        for path in (compact_path, gzip_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    os.remove(source)
+    stale_cache = os.path.join(ARCHIVE_CACHE_FOLDER, f"results_{year}.db")
+    if os.path.exists(stale_cache):
+        os.remove(stale_cache)
+    print(f"Archived academic year {year} to {archive_path(year)}")
+    return True
+
+
+def vacuum_database():
+    # Give the space freed by partitioning back to the file system
+    conn = create_connection()
+    if conn:
+        try:
+            conn.execute("VACUUM")
+            return True
+        except sqlite3.Error as e:
+            print(f"Error vacuuming database: {e}")
+            return False
+        finally:
+            conn.close()
+
+
+def results_where(class_year=None, subject=None, exam_type=None, year=None):
+    # WHERE clause for whichever of the view_marks filters are given
+    conditions = []
+    params = []
+    for column, value in (
+        ("class_year", class_year),
+        ("subject", subject),
+        ("exam_type", exam_type),
+        ("year", year),
+    ):
+        if value:
+            conditions.append(f"sr.{column} = ?")
+            params.append(value)
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, params
+
+
+# --- Wide marks layout ---
+# Every result row also carries its 24 part marks in q1a..q6d, so listings read
+# one row per student instead of joining six question_marks rows. question_marks
+# stays the write-side source of truth; rows whose wide_marks flag is 0 (not yet
+# migrated, or with question numbers outside Q1-Q6) are read through the join.
+def pack_wide_marks(question_rows):
+    """Turn (question_number, a, b, c, d) rows into 24 column values and a flag."""
+    values = [None] * len(WIDE_MARK_COLUMNS)
+    wide_marks = 1
+    for q_num, part_a, part_b, part_c, part_d in question_rows:
+        if q_num not in QUESTION_NUMBERS:
+            wide_marks = 0  # Cannot be represented, keep reading via the join
+            continue
+        offset = (q_num - 1) * len(QUESTION_PARTS)
+        values[offset : offset + 4] = [part_a, part_b, part_c, part_d]
+    return values, wide_marks
+
+
+def unpack_wide_marks(values):
+    """Turn the 24 wide column values into the nested {"Q1": {"a": ...}} dict."""
+    questions = {}
+    for index, q_num in enumerate(QUESTION_NUMBERS):
+        parts = values[index * 4 : index * 4 + 4]
+        if all(part is None for part in parts):
+            continue  # Question not present on this sheet
+        questions[f"Q{q_num}"] = dict(zip(QUESTION_PARTS, parts))
+    return questions
+
+
+WIDE_MARKS_ASSIGNMENTS = ", ".join(f"{col} = ?" for col in WIDE_MARK_COLUMNS)
+
+
+def sync_wide_marks(c, result_id):
+    # Rebuild the wide copy of one result from its question_marks rows
+    c.execute(
+        """SELECT question_number, part_a, part_b, part_c, part_d
+        FROM question_marks WHERE result_id = ?""",
+        (result_id,),
+    )
+    values, wide_marks = pack_wide_marks(c.fetchall())
+    c.execute(
+        f"UPDATE students_results SET {WIDE_MARKS_ASSIGNMENTS}, wide_marks = ? WHERE id = ?",
+        (*values, wide_marks, result_id),
+    )
+
+
+# Set-based form of sync_wide_marks plus the total, for many results at once;
+# format with the id placeholders
+RESULT_MARKS_REFRESH = (
+    "UPDATE students_results SET total_marks = (SELECT SUM(part_a + part_b + "
+    "part_c + part_d) FROM question_marks qm WHERE qm.result_id = students_results.id), "
+    + ", ".join(
+        f"q{q_num}{part} = (SELECT part_{part} FROM question_marks qm "
+        f"WHERE qm.result_id = students_results.id AND qm.question_number = {q_num})"
+        for q_num in QUESTION_NUMBERS
+        for part in QUESTION_PARTS
+    )
+    + " WHERE id IN ({})"
+)
+
+
+def migrate_to_wide_marks(batch_size=5000):
+    # Backfill the wide columns for results written before the wide layout existed
+    conn = create_connection()
+    if conn:
+        try:
+            c = conn.cursor()
+            migrated = 0
+            last_id = 0
+            while True:
+                c.execute(
+                    """SELECT id FROM students_results
+                    WHERE wide_marks = 0 AND id > ? ORDER BY id LIMIT ?""",
+                    (last_id, batch_size),
+                )
+                result_ids = [row[0] for row in c.fetchall()]
+                if not result_ids:
+                    break
+                last_id = result_ids[-1]
+
+                placeholders = ", ".join("?" for _ in result_ids)
+                c.execute(
+                    f"""SELECT result_id, question_number, part_a, part_b, part_c, part_d
+                    FROM question_marks WHERE result_id IN ({placeholders})""",
+                    result_ids,
+                )
+                question_rows = {}
+                for result_id, *question_row in c.fetchall():
+                    question_rows.setdefault(result_id, []).append(question_row)
+
+                updates = []
+                for result_id in result_ids:
+                    values, wide_marks = pack_wide_marks(
+                        question_rows.get(result_id, [])
+                    )
+                    if wide_marks:
+                        updates.append((*values, result_id))
+                c.executemany(
+                    f"UPDATE students_results SET {WIDE_MARKS_ASSIGNMENTS}, wide_marks = 1 WHERE id = ?",
+                    updates,
+                )
+                conn.commit()
+                migrated += len(updates)
+            if migrated:
+                print(f"Migrated {migrated} results to the wide marks layout")
+            return migrated
+        except sqlite3.Error as e:
+            print(f"Wide marks migration error: {e}")
+            return 0
+        finally:
+            conn.close()
+
+
+RESULT_SELECT = (
+    "sr.id, sr.roll_number, sr.class_year, sr.subject, sr.exam_type, sr.year, "
+    "sr.total_marks, sr.timestamp, sr.wide_marks, "
+    + ", ".join(f"sr.{col}" for col in WIDE_MARK_COLUMNS)
+)
+
+
+def iter_results(
+    c, where="", params=(), order_by="sr.id", batch_size=500, fan_out=False
+):
+    """Yield nested result dicts one row per result (dual-read for legacy rows).
+
+    Rows are pulled from the cursor in batches, so callers that stop early or
+    stream the output never hold more than one batch in memory. fan_out reads
+    the all_results views of a connect_results() connection instead of the hot
+    tables; results read from a term file are flagged closed_term.
+    """
+    if fan_out:
+        select = f"{RESULT_SELECT}, sr.closed_term FROM all_results"
+    else:
+        select = f"{RESULT_SELECT}, 0 FROM students_results"
+    c.execute(f"SELECT {select} sr {where} ORDER BY {order_by}", params)
+    while True:
+        rows = c.fetchmany(batch_size)
+        if not rows:
+            break
+        results = []
+        legacy_results = {}
+        for row in rows:
+            result = {
+                "id": row[0],
+                "roll_number": row[1],
+                "class_year": row[2],
+                "subject": row[3],
+                "exam_type": row[4],
+                "year": row[5],
+                "total_marks": row[6],
+                "timestamp": row[7],
+                "questions": {},
+                "closed_term": bool(row[-1]),
+            }
+            if row[8]:
+                result["questions"] = unpack_wide_marks(row[9:-1])
+            else:
+                legacy_results[result["id"]] = result
+            results.append(result)
+
+        if legacy_results:
+            # Separate cursor, c is still positioned on the outer query
+            load_legacy_questions(
+                c.connection.cursor(),
+                legacy_results,
+                "all_question_marks" if fan_out else "question_marks",
+            )
+        for result in results:
+            # Results without any question marks were never returned by the old join
+            if result["questions"]:
+                yield result
+
+
+def fetch_results(c, where="", params=(), order_by="sr.id", fan_out=False):
+    return list(iter_results(c, where, params, order_by, fan_out=fan_out))
+
+
+def teacher_results_where(
+    teacher_id, subject, exam_type=None, class_year=None, year=None
+):
+    # Results of one of the teacher's courses, narrowed by the analysis filters
+    where = """JOIN courses co ON sr.subject = co.course_id
+        WHERE co.teacher_id = ? AND sr.subject = ?"""
+    params = [teacher_id, subject]
+    for column, value in (
+        ("exam_type", exam_type),
+        ("class_year", class_year),
+        ("year", year),
+    ):
+        if value:
+            where += f" AND sr.{column} = ?"
+            params.append(value)
+    return where, params
+
+
+# --- SQL aggregates over the wide columns ---
+# Rows flagged wide_marks = 1 are aggregated from q1a..q6d, the few legacy rows
+# from question_marks; only the aggregated rows ever reach Python.
+WIDE_HAS_MARKS = "COALESCE({}) IS NOT NULL".format(
+    ", ".join(f"sr.q{q_num}a" for q_num in QUESTION_NUMBERS)
+)
+# Results without any marks were never returned by the old question_marks join
+RESULT_HAS_MARKS = f"""(sr.wide_marks = 1 AND {WIDE_HAS_MARKS}
+    OR sr.wide_marks = 0 AND EXISTS (
+        SELECT 1 FROM all_question_marks qm WHERE qm.result_id = sr.id))"""
+WIDE_SCORE = " + ".join(f"COALESCE(sr.{col}, 0)" for col in WIDE_MARK_COLUMNS)
+
+
+def fetch_question_statistics(c, where, params):
+    """(question_number, answered, sum_a, sum_b, sum_c, sum_d) per question."""
+    # Wide rows: one pass computing every column's SUM and each question's COUNT
+    c.execute(
+        "SELECT "
+        + ", ".join(f"COUNT(sr.q{q_num}a)" for q_num in QUESTION_NUMBERS)
+        + ", "
+        + ", ".join(f"SUM(sr.{col})" for col in WIDE_MARK_COLUMNS)
+        + f" FROM all_results sr {where} AND sr.wide_marks = 1",
+        params,
+    )
+    row = c.fetchone()
+    statistics = {}
+    for index, q_num in enumerate(QUESTION_NUMBERS):
+        offset = len(QUESTION_NUMBERS) + index * len(QUESTION_PARTS)
+        statistics[q_num] = [row[index]] + [
+            part_sum or 0.0 for part_sum in row[offset : offset + 4]
+        ]
+
+    # Legacy rows: grouped by question_number straight from question_marks
+    c.execute(
+        f"""SELECT question_number, COUNT(*), SUM(part_a), SUM(part_b),
+               SUM(part_c), SUM(part_d)
+        FROM all_question_marks
+        WHERE result_id IN (SELECT sr.id FROM all_results sr {where}
+                            AND sr.wide_marks = 0)
+        GROUP BY question_number""",
+        params,
+    )
+    for q_num, *sums in c.fetchall():
+        totals = statistics.setdefault(q_num, [0, 0.0, 0.0, 0.0, 0.0])
+        statistics[q_num] = [total + value for total, value in zip(totals, sums)]
+
+    return [
+        (q_num, *statistics[q_num])
+        for q_num in sorted(statistics)
+        if statistics[q_num][0] > 0
+    ]
+
+
+def fetch_result_scores(c, where, params):
+    """(roll_number, score) of every result with marks, ordered by roll number."""
+    c.execute(
+        f"""SELECT roll_number, score FROM (
+            SELECT sr.roll_number, {WIDE_SCORE} AS score FROM all_results sr {where}
+                AND sr.wide_marks = 1 AND {WIDE_HAS_MARKS}
+            UNION ALL
+            SELECT sr.roll_number, (
+                SELECT SUM(part_a + part_b + part_c + part_d)
+                FROM all_question_marks qm WHERE qm.result_id = sr.id
+            ) AS score FROM all_results sr {where} AND sr.wide_marks = 0
+        ) WHERE score IS NOT NULL
+        ORDER BY roll_number""",
+        list(params) * 2,
+    )
+    return c.fetchall()
+
+
+def fetch_gradebook_columns(c, class_year, year=None):
+    """(subject, exam_type) of every exam a class year has results for."""
+    if year is None:
+        return [
+            (subject, exam_type)
+            for facet_class_year, subject, exam_type, _ in load_exam_facets()
+            if facet_class_year == class_year
+        ]
+    where, params = results_where(class_year=class_year, year=year)
+    c.execute(
+        f"""SELECT DISTINCT sr.subject, sr.exam_type FROM all_results sr {where}
+        ORDER BY sr.subject, sr.exam_type""",
+        params,
+    )
+    return c.fetchall()
+
+
+def execute_gradebook(c, class_year, columns, year=None, after=None, limit=-1):
+    """Run the gradebook pivot: one row per student, one cell per column.
+
+    Each cell is a conditional aggregate over the student's results, so the
+    whole matrix comes from a single GROUP BY. A student who sat the same exam
+    in several academic years gets the average. Rows are ordered by roll
+    number; after is the last roll number of the previous page.
+    """
+    cells = ", ".join(
+        [
+            "ROUND(AVG(CASE WHEN sr.subject = ? AND sr.exam_type = ? "
+            "THEN sr.total_marks END), 2)"
+        ]
+        * len(columns)
+    )
+    where, params = results_where(class_year=class_year, year=year)
+    where += f" AND {RESULT_HAS_MARKS}"
+    if after is not None:
+        where += " AND sr.roll_number > ?"
+        params.append(after)
+    c.execute(
+        f"""SELECT sr.roll_number, {cells} FROM all_results sr {where}
+        GROUP BY sr.roll_number ORDER BY sr.roll_number LIMIT ?""",
+        [value for column in columns for value in column] + params + [limit],
+    )
+    return c
+
+
+def fetch_wide_marks(c, where="", params=(), order_by="sr.id", fan_out=False):
+    """Rows of (roll_number, exam_type, q1a, ..., q6d) for array-based analytics.
+
+    Skips building nested dicts: wide rows come straight from SQLite, and only
+    legacy rows are completed from question_marks. Missing questions are None.
+    """
+    source = "all_results" if fan_out else "students_results"
+    c.execute(
+        "SELECT sr.id, sr.roll_number, sr.exam_type, sr.wide_marks, "
+        + ", ".join(f"sr.{col}" for col in WIDE_MARK_COLUMNS)
+        + f" FROM {source} sr {where} ORDER BY {order_by}",
+        params,
+    )
+    rows = []
+    legacy_results = {}
+    for row in c.fetchall():
+        if row[3]:
+            rows.append(row[1:3] + row[4:])
+        else:
+            legacy_results[row[0]] = {"index": len(rows), "questions": {}}
+            rows.append(row[1:3])
+    if legacy_results:
+        load_legacy_questions(
+            c, legacy_results, "all_question_marks" if fan_out else "question_marks"
+        )
+        for legacy in legacy_results.values():
+            values, _ = pack_wide_marks(
+                [
+                    (int(q_key[1:]), *(parts[p] for p in QUESTION_PARTS))
+                    for q_key, parts in legacy["questions"].items()
+                ]
+            )
+            rows[legacy["index"]] += tuple(values)
+    # As with iter_results, results without any marks are left out
+    return [row for row in rows if any(value is not None for value in row[2:])]
+
+
+def load_legacy_questions(c, results_by_id, source="question_marks", chunk_size=500):
+    result_ids = list(results_by_id)
+    for start in range(0, len(result_ids), chunk_size):
+        chunk = result_ids[start : start + chunk_size]
+        placeholders = ", ".join("?" for _ in chunk)
+        c.execute(
+            f"""SELECT result_id, question_number, part_a, part_b, part_c, part_d
+            FROM {source} WHERE result_id IN ({placeholders})
+            ORDER BY result_id, question_number""",
+            chunk,
+        )
+        for result_id, q_num, part_a, part_b, part_c, part_d in c.fetchall():
+            results_by_id[result_id]["questions"][f"Q{q_num}"] = {
+                "a": part_a,
+                "b": part_b,
+                "c": part_c,
+                "d": part_d,
+            }
+
+
+# --- Data version counters ---
+# Anything derived from the results (cached exports, ETags, ...) is keyed on the
+# version current when it was built, so it goes stale as soon as data changes.
+# Every write bumps the global ('*') scope and that of each exam it touched.
+GLOBAL_DATA_SCOPE = "*"
+
+
+def exam_data_scope(subject, class_year, exam_type):
+    return json.dumps(["exam", subject, class_year, exam_type])
+
+
+def bump_data_version(c, changes=()):
+    """Bump the global version and the version of every exam in changes.
+
+    changes are (roll_number, class_year, subject, exam_type) tuples, as given
+    to notify_results_changed(); a None subject or class_year stands for all of
+    them and is looked up in all_results, so needs a connect_results() cursor.
+    """
+    exams = set()
+    for _, class_year, subject, exam_type in changes:
+        if subject is None or class_year is None:
+            c.execute(
+                """SELECT DISTINCT subject, class_year, exam_type FROM all_results
+                WHERE (? IS NULL OR subject = ?) AND (? IS NULL OR exam_type = ?)""",
+                (subject, subject, exam_type, exam_type),
+            )
+            exams.update(c.fetchall())
+        else:
+            exams.add((subject, class_year, exam_type))
+    c.executemany(
+        """INSERT INTO data_versions (scope, version) VALUES (?, 1)
+        ON CONFLICT(scope) DO UPDATE SET version = version + 1""",
+        [(GLOBAL_DATA_SCOPE,)] + [(exam_data_scope(*exam),) for exam in sorted(exams)],
+    )
+
+
+# --- Change listeners ---
+# In-process caches register a callback here. The write paths call it after
+# committing, with one (roll_number, class_year, subject, exam_type) per changed
+# result; None in a field means "any", so a mapping change of a course is
+# (None, None, course_id, exam_type).
+_results_listeners = []
+
+
+def on_results_changed(callback):
+    _results_listeners.append(callback)
+    return callback
+
+
+def notify_results_changed(changes):
+    for callback in _results_listeners:
+        try:
+            callback(changes)
+        except Exception as e:
+            print(f"Error in results change listener: {e}")
+
+
+def result_scope(c, result_id):
+    c.execute(
+        "SELECT roll_number, class_year, subject, exam_type FROM students_results WHERE id = ?",
+        (result_id,),
+    )
+    return c.fetchone()
+
+
+# --- Incremental CO attainment aggregates ---
+CO_ATTAINMENT_UPSERT = """INSERT INTO co_attainment
+    (subject, class_year, exam_type, co, roll_number, obtained, max_marks)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(subject, class_year, exam_type, co, roll_number)
+    DO UPDATE SET obtained = obtained + excluded.obtained,
+                  max_marks = max_marks + excluded.max_marks"""
+# A row whose max_marks fell to zero no longer covers any question
+CO_ATTAINMENT_DELETE_EMPTY = """DELETE FROM co_attainment
+    WHERE subject = ? AND class_year = ? AND exam_type = ? AND co = ?
+    AND roll_number = ? AND max_marks < 0.5"""
+
+
+def co_contributions(
+    subject, class_year, exam_type, roll_number, questions, course_outcomes=None
+):
+    """Per-CO (obtained, max) sums of one result, for its student and class rows."""
+    question_cos = course_outcome_lookup(subject, exam_type, course_outcomes)
+    sums = {}
+    for q_key, parts in questions.items():
+        q_num = int(q_key[1:])
+        co = question_cos[q_num - 1] if q_num in QUESTION_NUMBERS else "N/A"
+        if co == "N/A":
+            continue
+        obtained, max_marks = sums.get(co, (0.0, 0.0))
+        sums[co] = (
+            obtained + sum(parts[p] for p in QUESTION_PARTS),
+            max_marks + len(QUESTION_PARTS) * MAX_MARKS_PER_PART,
+        )
+    rows = []
+    for co, (obtained, max_marks) in sums.items():
+        for roll in (roll_number, CLASS_TOTAL_ROLL):
+            rows.append((subject, class_year, exam_type, co, roll, obtained, max_marks))
+    return rows
+
+
+def apply_co_attainment(c, result_id, sign):
+    """Add (sign=1) or remove (sign=-1) one result's marks from co_attainment.
+
+    Write paths call this with -1 before changing a result's marks and with +1
+    afterwards, inside the same transaction as the change itself.
+    """
+    apply_co_attainment_results(
+        c, fetch_results(c, "WHERE sr.id = ?", (result_id,)), sign
+    )
+
+
+def apply_co_attainment_results(c, results, sign):
+    # apply_co_attainment for already fetched result dicts, in one executemany.
+    # The mapping is read in the write's own transaction, never taken from the
+    # in-process cache, which may predate another worker's mapping change.
+    course_outcomes = read_course_outcomes(c)
+    rows = []
+    for result in results:
+        rows.extend(
+            co_contributions(
+                result["subject"],
+                result["class_year"],
+                result["exam_type"],
+                result["roll_number"],
+                result["questions"],
+                course_outcomes,
+            )
+        )
+    if not rows:
+        return
+    c.executemany(
+        CO_ATTAINMENT_UPSERT,
+        [row[:5] + (sign * row[5], sign * row[6]) for row in rows],
+    )
+    if sign < 0:
+        # Drop the rows just emptied, each found by its primary key
+        c.executemany(CO_ATTAINMENT_DELETE_EMPTY, set(row[:5] for row in rows))
+
+
+def rebuild_co_attainment_rows(c, subject=None, exam_type=None, batch_size=5000):
+    """Recompute aggregates on c, a connect_results() cursor, without committing.
+
+    Covers all of them or those of one subject and/or exam type. The mapping is
+    read on c before the DELETE takes the write lock; any sqlite3.Error is
+    raised so the caller rolls the whole change back.
+    """
+    course_outcomes = read_course_outcomes(c)
+    where, params = results_where(subject=subject, exam_type=exam_type)
+    scope = [
+        (column, value)
+        for column, value in (("subject", subject), ("exam_type", exam_type))
+        if value
+    ]
+    c.execute(
+        "DELETE FROM co_attainment"
+        + (" WHERE " if scope else "")
+        + " AND ".join(f"{column} = ?" for column, _ in scope),
+        [value for _, value in scope],
+    )
+    c.execute("SELECT MAX(id) FROM all_results")
+    max_id = c.fetchone()[0] or 0
+    id_range = "sr.id > ? AND sr.id <= ?"
+    batch_where = f"{where} AND {id_range}" if where else f"WHERE {id_range}"
+    for start in range(0, max_id, batch_size):
+        results = fetch_results(
+            c,
+            batch_where,
+            (*params, start, start + batch_size),
+            fan_out=True,
+        )
+        for result in results:
+            c.executemany(
+                CO_ATTAINMENT_UPSERT,
+                co_contributions(
+                    result["subject"],
+                    result["class_year"],
+                    result["exam_type"],
+                    result["roll_number"],
+                    result["questions"],
+                    course_outcomes,
+                ),
+            )
+    if scope:
+        bump_data_version(c, [(None, None, subject, exam_type)])
+
+
+def has_rows(table):
+    # Asked of the hot database alone, so no term is attached or unpacked for it
+    conn = create_connection()
+    if conn:
+        try:
+            c = conn.cursor()
+            c.execute(f"SELECT EXISTS(SELECT 1 FROM {table})")
+            return bool(c.fetchone()[0])
+        except sqlite3.Error as e:
+            print(f"Error reading {table}: {e}")
+            return False
+        finally:
+            conn.close()
+    return False
+
+
+def rebuild_co_attainment(
+    only_if_empty=False, batch_size=5000, subject=None, exam_type=None
+):
+    # Recompute aggregates from the stored marks (first run or CO mapping change)
+    if only_if_empty and has_rows("co_attainment"):
+        return False
+    conn = connect_results(subject=subject, exam_type=exam_type)
+    if conn:
+        try:
+            c = conn.cursor()
+            rebuild_co_attainment_rows(c, subject, exam_type, batch_size)
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error rebuilding CO attainment: {e}")
+            return False
+        finally:
+            conn.close()
+
+
+# --- Per-exam class ranks ---
+# Cohorts are re-ranked whole with window functions, which is cheap next to
+# the write that triggers it: a cohort is one class sitting one exam. Only
+# hot results are ranked; results moved into a term file keep their last ranks.
+COHORT_COLUMNS = ("subject", "class_year", "exam_type", "year")
+EXAM_RANKS_INSERT = """INSERT INTO exam_ranks
+    (result_id, roll_number, subject, class_year, exam_type, year, total_marks,
+     class_rank, percent_rank, cohort_size)
+    SELECT id, roll_number, subject, class_year, exam_type, year, total_marks,
+        RANK() OVER (cohort ORDER BY total_marks DESC),
+        PERCENT_RANK() OVER (cohort ORDER BY total_marks),
+        COUNT(*) OVER cohort
+    FROM students_results {where}
+    WINDOW cohort AS (PARTITION BY subject, class_year, exam_type, year)"""
+
+
+def result_cohort(c, result_id):
+    c.execute(
+        f"SELECT {', '.join(COHORT_COLUMNS)} FROM students_results WHERE id = ?",
+        (result_id,),
+    )
+    return c.fetchone()
+
+
+def refresh_exam_ranks(c, cohorts=None):
+    """Re-rank the given (subject, class_year, exam_type, year) cohorts.
+
+    With cohorts=None every academic year still in students_results is
+    re-ranked.
+    """
+    if cohorts is None:
+        c.execute(
+            "DELETE FROM exam_ranks WHERE year IN (SELECT DISTINCT year FROM students_results)"
+        )
+        c.execute(EXAM_RANKS_INSERT.format(where=""))
+        return
+    cohort_where = "WHERE " + " AND ".join(f"{col} = ?" for col in COHORT_COLUMNS)
+    cohorts = set(cohorts)
+    # Clear every cohort before re-ranking any, as results moved between two
+    # of them still have their old cohort's rows
+    c.executemany(f"DELETE FROM exam_ranks {cohort_where}", cohorts)
+    c.executemany(EXAM_RANKS_INSERT.format(where=cohort_where), cohorts)
+
+
+def rebuild_exam_ranks(only_if_empty=False):
     conn = create_connection()
     if conn:
         try:
             c = conn.cursor()
+            if only_if_empty:
+                c.execute("SELECT EXISTS(SELECT 1 FROM exam_ranks)")
+                if c.fetchone()[0]:
+                    return False
+            refresh_exam_ranks(c)
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error rebuilding exam ranks: {e}")
+            return False
+        finally:
+            conn.close()
 
-            # Create students table
-            c.execute(
-                """CREATE TABLE IF NOT EXISTS students
-                        (id TEXT PRIMARY KEY,
-                         full_name TEXT NOT NULL,
-                         department TEXT NOT NULL,
-                         password TEXT NOT NULL)"""
-            )
 
-            # Create teachers table
-            c.execute(
-                """CREATE TABLE IF NOT EXISTS teachers
-                        (id TEXT PRIMARY KEY,
-                         full_name TEXT NOT NULL,
-                         department TEXT NOT NULL,
-                         specialization TEXT NOT NULL,
-                         password TEXT NOT NULL)"""
-            )
+# --- Exam facet catalogue ---
+# exam_facets holds (class_year, subject, exam_type) -> number of results. The
+# triggers below keep it in step with every insert, delete and re-tag of a hot
+# result; moving a year to its term file re-adds what the delete took away.
+EXAM_FACETS_UPSERT = """INSERT INTO exam_facets (class_year, subject, exam_type, results)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(class_year, subject, exam_type)
+    DO UPDATE SET results = results + excluded.results"""
+EXAM_FACET_ADD = """INSERT INTO exam_facets (class_year, subject, exam_type, results)
+        VALUES (NEW.class_year, NEW.subject, NEW.exam_type, 1)
+        ON CONFLICT(class_year, subject, exam_type)
+        DO UPDATE SET results = results + 1;"""
+EXAM_FACET_REMOVE = """UPDATE exam_facets SET results = results - 1
+        WHERE class_year = OLD.class_year AND subject = OLD.subject
+            AND exam_type = OLD.exam_type;
+        DELETE FROM exam_facets WHERE results <= 0
+            AND class_year = OLD.class_year AND subject = OLD.subject
+            AND exam_type = OLD.exam_type;"""
+EXAM_FACET_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS exam_facets_insert
+    AFTER INSERT ON students_results
+    BEGIN
+        {EXAM_FACET_ADD}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS exam_facets_delete
+    AFTER DELETE ON students_results
+    BEGIN
+        {EXAM_FACET_REMOVE}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS exam_facets_update
+    AFTER UPDATE OF class_year, subject, exam_type ON students_results
+    WHEN OLD.class_year IS NOT NEW.class_year OR OLD.subject IS NOT NEW.subject
+        OR OLD.exam_type IS NOT NEW.exam_type
+    BEGIN
+        {EXAM_FACET_REMOVE}
+        {EXAM_FACET_ADD}
+    END""",
+]
+# Read once into memory and dropped on every results change in this process;
+# the TTL bounds staleness for writes made by other processes
+EXAM_FACET_CACHE_TTL = 300
+_exam_facet_cache = None
 
-            # Create students_results table (exam results summary)
-            c.execute(
-                """CREATE TABLE IF NOT EXISTS students_results
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         roll_number TEXT NOT NULL,
-                         class_year TEXT NOT NULL,
-                         subject TEXT NOT NULL,
-                         exam_type TEXT NOT NULL,
-                         year INTEGER NOT NULL, -- Academic year (e.g., 2023)
-                         total_marks REAL NOT NULL,
-                         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)"""
-            )
 
-            # Create question_marks table (detailed marks per question part)
+def rebuild_exam_facets(only_if_empty=False):
+    """Recount the catalogue (first run, or after repairs).
+
+    Hot results are counted and closed terms read from term_exams, so only an
+    archived year never catalogued before is unpacked, once.
+    """
+    if only_if_empty and has_rows("exam_facets"):
+        return False
+    catalogue_terms(include_archives=True)
+    conn = create_connection()
+    if conn:
+        try:
+            c = conn.cursor()
+            c.execute("DELETE FROM exam_facets")
             c.execute(
-                """CREATE TABLE IF NOT EXISTS question_marks
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         result_id INTEGER NOT NULL,
-                         question_number INTEGER NOT NULL,
-                         part_a REAL NOT NULL,
-                         part_b REAL NOT NULL,
-                         part_c REAL NOT NULL,
-                         part_d REAL NOT NULL,
-                         FOREIGN KEY(result_id) REFERENCES students_results(id) ON DELETE CASCADE)"""
+                """INSERT INTO exam_facets (class_year, subject, exam_type, results)
+                SELECT class_year, subject, exam_type, SUM(results) FROM (
+                    SELECT class_year, subject, exam_type, COUNT(*) AS results
+                    FROM students_results GROUP BY class_year, subject, exam_type
+                    UNION ALL
+                    SELECT class_year, subject, exam_type, results FROM term_exams
+                )
+                GROUP BY class_year, subject, exam_type"""
             )
+            conn.commit()
+            invalidate_exam_facets()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error rebuilding exam facets: {e}")
+            return False
+        finally:
+            conn.close()
 
-            # --- New Tables for COs ---
-            # Create courses table
-            # Assuming a course is taught by one teacher and has a unique ID and name
+
+def load_exam_facets():
+    global _exam_facet_cache
+    if _exam_facet_cache and _exam_facet_cache[0] > time.monotonic():
+        return _exam_facet_cache[1]
+    facets = []
+    conn = create_connection()
+    if conn:
+        try:
+            c = conn.cursor()
             c.execute(
-                """CREATE TABLE IF NOT EXISTS courses
-                        (course_id TEXT PRIMARY KEY,
-                         course_name TEXT NOT NULL,
-                         teacher_id TEXT, -- Can be NULL initially if course created before teacher assignment
-                         UNIQUE(course_id, teacher_id), -- A course can be taught by one teacher at a time
-                         FOREIGN KEY(teacher_id) REFERENCES teachers(id) ON DELETE SET NULL)"""
+                """SELECT class_year, subject, exam_type, results FROM exam_facets
+                ORDER BY class_year, subject, exam_type"""
             )
-
-            conn.commit()
+            facets = c.fetchall()
+            _exam_facet_cache = (time.monotonic() + EXAM_FACET_CACHE_TTL, facets)
         except sqlite3.Error as e:
-            print(f"Database initialization error: {e}")
+            print(f"Error loading exam facets: {e}")
         finally:
             conn.close()
+    return facets
+
+
+@on_results_changed
+def invalidate_exam_facets(changes=None):
+    global _exam_facet_cache
+    _exam_facet_cache = None
+
+
+# --- Bulk operations ---
+# A bulk write first collects the ids it touches into temp.bulk_results, so each
+# following statement is one set-based pass however many results are involved.
+BULK_RESULT_IDS = "SELECT id FROM temp.bulk_results"
+
+
+def collect_bulk_results(
+    c, result_ids=None, class_year=None, subject=None, exam_type=None, year=None
+):
+    """Fill temp.bulk_results with the hot results matching all the criteria.
+
+    Returns how many were found; at least one criterion must be given.
+    """
+    where, params = results_where(class_year, subject, exam_type, year)
+    if result_ids is not None:
+        where += " AND " if where else "WHERE "
+        where += "sr.id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(list(result_ids)))
+    if not where:
+        return 0
+    c.execute("DROP TABLE IF EXISTS temp.bulk_results")
+    c.execute("CREATE TEMP TABLE bulk_results (id INTEGER PRIMARY KEY)")
+    c.execute(
+        f"INSERT INTO temp.bulk_results SELECT sr.id FROM students_results sr {where}",
+        params,
+    )
+    return c.rowcount
+
+
+def bulk_result_scopes(c):
+    # (changes, cohorts) of the collected results, for notifications and ranks
+    c.execute(
+        f"""SELECT DISTINCT roll_number, class_year, subject, exam_type
+        FROM students_results WHERE id IN ({BULK_RESULT_IDS})"""
+    )
+    changes = c.fetchall()
+    c.execute(
+        f"""SELECT DISTINCT {', '.join(COHORT_COLUMNS)}
+        FROM students_results WHERE id IN ({BULK_RESULT_IDS})"""
+    )
+    return changes, c.fetchall()
+
+
+def apply_co_attainment_bulk(c, sign, batch_size=500):
+    # apply_co_attainment for every collected result, a batch at a time
+    results = iter_results(
+        c.connection.cursor(),
+        f"WHERE sr.id IN ({BULK_RESULT_IDS})",
+        batch_size=batch_size,
+    )
+    while True:
+        batch = list(islice(results, batch_size))
+        if not batch:
+            break
+        apply_co_attainment_results(c, batch, sign)
 
 
 def check_existing_id(user_id):
@@ -106,6 +1684,64 @@ def check_existing_id(user_id):
             conn.close()
 
 
+# Werkzeug method string, cost included, e.g. "pbkdf2:sha256:600000" or
+# "scrypt:32768:8:1". Overridden by the PASSWORD_HASH_METHOD environment variable.
+DEFAULT_PASSWORD_HASH_METHOD = "pbkdf2:sha256:600000"
+
+
+def password_hash_method():
+    return os.getenv("PASSWORD_HASH_METHOD") or DEFAULT_PASSWORD_HASH_METHOD
+
+
+def hash_password(password, method=None):
+    return generate_password_hash(password, method=method or password_hash_method())
+
+
+@lru_cache(maxsize=None)
+def hash_prefix(method):
+    # Werkzeug fills in defaults ("pbkdf2" -> "pbkdf2:sha256:600000"), so the
+    # canonical prefix is taken from a real hash rather than the setting itself
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+def needs_rehash(stored_hash):
+    """True if stored_hash was made with a method or cost other than the current one."""
+    return stored_hash.split("$", 1)[0] != hash_prefix(password_hash_method())
+
+
+def find_existing_ids(c, user_ids):
+    # Set-based duplicate check for many IDs at once (students and teachers)
+    c.execute("CREATE TEMP TABLE candidate_ids (id TEXT PRIMARY KEY)")
+    c.executemany(
+        "INSERT OR IGNORE INTO candidate_ids (id) VALUES (?)",
+        [(user_id,) for user_id in user_ids],
+    )
+    c.execute(
+        """SELECT ci.id FROM candidate_ids ci
+        WHERE ci.id IN (SELECT id FROM students UNION SELECT id FROM teachers)"""
+    )
+    existing = {row[0] for row in c.fetchall()}
+    c.execute("DROP TABLE candidate_ids")
+    return existing
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash many passwords, spread over a process pool.
+
+    PBKDF2 is pure CPU work, so for a whole roster the hashes are computed in
+    parallel worker processes; small batches are not worth the pool start-up.
+    """
+    workers = workers or os.cpu_count() or 1
+    methods = [password_hash_method()] * len(passwords)
+    if workers == 1 or len(passwords) < 4 * workers:
+        return list(map(hash_password, passwords, methods))
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(hash_password, passwords, methods, chunksize=chunksize)
+        )
+
+
 class Database:
     # No need for __init__ as methods create connections as needed
     # This prevents issues with long-lived connections and threading
@@ -118,7 +1754,7 @@ class Database:
                 if check_existing_id(student_id):
                     return False, "Student ID already exists."
 
-                hashed_password = generate_password_hash(password)
+                hashed_password = hash_password(password)
                 c.execute(
                     "INSERT INTO students (id, full_name, department, password) VALUES (?, ?, ?, ?)",
                     (student_id, full_name, department, hashed_password),
@@ -130,6 +1766,57 @@ class Database:
             finally:
                 conn.close()
 
+    def register_students_bulk(self, students, workers=None):
+        """Register a whole roster in one transaction.
+
+        students is a list of dicts with student_id, full_name, department and
+        password. IDs already taken (or repeated within the roster) are skipped.
+        Returns (success, message, summary).
+        """
+        summary = {"created": 0, "skipped_existing": [], "skipped_duplicates": []}
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                seen = set()
+                unique_students = []
+                for student in students:
+                    if student["student_id"] in seen:
+                        summary["skipped_duplicates"].append(student["student_id"])
+                        continue
+                    seen.add(student["student_id"])
+                    unique_students.append(student)
+
+                existing = find_existing_ids(c, seen)
+                summary["skipped_existing"] = sorted(existing)
+                new_students = [
+                    s for s in unique_students if s["student_id"] not in existing
+                ]
+
+                hashed_passwords = hash_passwords(
+                    [s["password"] for s in new_students], workers
+                )
+                c.executemany(
+                    "INSERT INTO students (id, full_name, department, password) VALUES (?, ?, ?, ?)",
+                    [
+                        (s["student_id"], s["full_name"], s["department"], hashed)
+                        for s, hashed in zip(new_students, hashed_passwords)
+                    ],
+                )
+                conn.commit()
+                summary["created"] = len(new_students)
+                return (
+                    True,
+                    f"Registered {len(new_students)} students.",
+                    summary,
+                )
+            except sqlite3.Error as e:
+                conn.rollback()
+                return False, f"Database error: {e}", summary
+            finally:
+                conn.close()
+        return False, "Database connection error.", summary
+
     def register_teacher(
         self, full_name, teacher_id, department, specialization, password
     ):
@@ -140,7 +1827,7 @@ class Database:
                 if check_existing_id(teacher_id):
                     return False, "Teacher ID already exists."
 
-                hashed_password = generate_password_hash(password)
+                hashed_password = hash_password(password)
                 c.execute(
                     "INSERT INTO teachers (id, full_name, department, specialization, password) VALUES (?, ?, ?, ?, ?)",
                     (
@@ -168,6 +1855,12 @@ class Database:
                 if student and check_password_hash(
                     student[3], password
                 ):  # student[3] is the hashed password
+                    if needs_rehash(student[3]):
+                        c.execute(
+                            "UPDATE students SET password = ? WHERE id = ?",
+                            (hash_password(password), student_id),
+                        )
+                        conn.commit()
                     return {
                         "id": student[0],
                         "full_name": student[1],
@@ -188,6 +1881,12 @@ class Database:
                 if teacher and check_password_hash(
                     teacher[4], password
                 ):  # teacher[4] is the hashed password
+                    if needs_rehash(teacher[4]):
+                        c.execute(
+                            "UPDATE teachers SET password = ? WHERE id = ?",
+                            (hash_password(password), teacher_id),
+                        )
+                        conn.commit()
                     return {
                         "id": teacher[0],
                         "full_name": teacher[1],
@@ -251,6 +1950,142 @@ class Database:
             finally:
                 conn.close()
 
+    def get_course_outcome_maps(self, course_ids):
+        # {course_id: {exam_type: CO per question}} of the courses' own mappings
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                placeholders = ", ".join("?" for _ in course_ids)
+                c.execute(
+                    f"""SELECT course_id, exam_type, question_number, co
+                    FROM course_outcome_map WHERE course_id IN ({placeholders})
+                    ORDER BY course_id, exam_type, question_number""",
+                    list(course_ids),
+                )
+                maps = {}
+                for course_id, exam_type, q_num, co in c.fetchall():
+                    maps.setdefault(course_id, {}).setdefault(exam_type, {})[q_num] = co
+                return maps
+            except sqlite3.Error as e:
+                print(f"Error getting course outcome maps: {e}")
+                return {}
+            finally:
+                conn.close()
+
+    def get_course_attainment_settings(self, course_ids):
+        # {course_id: {"exam_weights", "target_percent", "levels"}}, defaults
+        # filled in for courses without settings of their own
+        settings = {
+            course_id: {
+                "exam_weights": {},
+                "target_percent": DEFAULT_CO_TARGET_PERCENT,
+                "levels": list(DEFAULT_ATTAINMENT_LEVELS),
+            }
+            for course_id in course_ids
+        }
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                placeholders = ", ".join("?" for _ in course_ids)
+                c.execute(
+                    f"""SELECT course_id, exam_type, weight FROM course_exam_weights
+                    WHERE course_id IN ({placeholders}) ORDER BY course_id, exam_type""",
+                    list(course_ids),
+                )
+                for course_id, exam_type, weight in c.fetchall():
+                    settings[course_id]["exam_weights"][exam_type] = weight
+                c.execute(
+                    f"""SELECT course_id, target_percent, level_1, level_2, level_3
+                    FROM course_attainment_targets WHERE course_id IN ({placeholders})""",
+                    list(course_ids),
+                )
+                for course_id, target_percent, *levels in c.fetchall():
+                    settings[course_id]["target_percent"] = target_percent
+                    settings[course_id]["levels"] = levels
+            except sqlite3.Error as e:
+                print(f"Error getting course attainment settings: {e}")
+            finally:
+                conn.close()
+        return settings
+
+    def set_course_attainment_settings(
+        self, course_id, exam_weights, target_percent, levels
+    ):
+        """Replace a course's exam weights and attainment targets.
+
+        exam_weights maps exam types to weights (0 leaves an exam out); exam
+        types not in it keep the default weight. levels are the shares of
+        students for attainment levels 1 to 3.
+        """
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                c.execute(
+                    "DELETE FROM course_exam_weights WHERE course_id = ?", (course_id,)
+                )
+                c.executemany(
+                    """INSERT INTO course_exam_weights (course_id, exam_type, weight)
+                    VALUES (?, ?, ?)""",
+                    [
+                        (course_id, exam_type, weight)
+                        for exam_type, weight in exam_weights.items()
+                    ],
+                )
+                c.execute(
+                    """INSERT OR REPLACE INTO course_attainment_targets
+                    (course_id, target_percent, level_1, level_2, level_3)
+                    VALUES (?, ?, ?, ?, ?)""",
+                    (course_id, target_percent, *levels),
+                )
+                conn.commit()
+                return True, "Attainment settings saved."
+            except sqlite3.Error as e:
+                return False, f"Database error: {e}"
+            finally:
+                conn.close()
+        return False, "Database connection error."
+
+    def set_course_outcomes(self, course_id, exam_type, question_cos):
+        """Replace a course's question -> CO mapping for one exam type.
+
+        question_cos maps question numbers to CO labels; an empty mapping removes
+        the course's own mapping, so the defaults apply again. The cached lookup
+        and the course's CO aggregates are refreshed to match.
+        """
+        # The mapping and the aggregates recomputed from it commit together;
+        # the default mapping applies to every course
+        subject = None if course_id == DEFAULT_CO_COURSE else course_id
+        conn = connect_results(subject=subject, exam_type=exam_type)
+        if conn:
+            try:
+                c = conn.cursor()
+                c.execute(
+                    "DELETE FROM course_outcome_map WHERE course_id = ? AND exam_type = ?",
+                    (course_id, exam_type),
+                )
+                c.executemany(
+                    """INSERT INTO course_outcome_map
+                    (course_id, exam_type, question_number, co) VALUES (?, ?, ?, ?)""",
+                    [
+                        (course_id, exam_type, q_num, co)
+                        for q_num, co in question_cos.items()
+                    ],
+                )
+                rebuild_co_attainment_rows(c, subject, exam_type)
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                return False, f"Database error: {e}"
+            finally:
+                conn.close()
+                invalidate_course_outcomes()
+            notify_results_changed([(None, None, subject, exam_type)])
+            return True, "Course outcome mapping saved."
+        return False, "Database connection error."
+
     def get_teacher_courses(self, teacher_id):
         conn = create_connection()
         if conn:
@@ -288,6 +2123,7 @@ class ResultsDatabase:
 
                 if existing_result:
                     result_id = existing_result[0]
+                    apply_co_attainment(c, result_id, -1)
                     # Update total marks in students_results
                     c.execute(
                         """UPDATE students_results SET total_marks = ?, timestamp = CURRENT_TIMESTAMP
@@ -299,6 +2135,7 @@ class ResultsDatabase:
                         """DELETE FROM question_marks WHERE result_id = ?""",
                         (result_id,),
                     )
+                    sync_wide_marks(c, result_id)
                     print(
                         f"Updated existing entry for {roll_number} - {subject} - {exam_type}"
                     )
@@ -306,8 +2143,8 @@ class ResultsDatabase:
                     # Insert new result into students_results
                     c.execute(
                         """INSERT INTO students_results
-                        (roll_number, class_year, subject, exam_type, year, total_marks)
-                        VALUES (?, ?, ?, ?, ?, ?)""",
+                        (roll_number, class_year, subject, exam_type, year, total_marks, wide_marks)
+                        VALUES (?, ?, ?, ?, ?, ?, 1)""",
                         (
                             roll_number,
                             class_year,
@@ -322,152 +2159,284 @@ class ResultsDatabase:
                         f"Inserted new entry for {roll_number} - {subject} - {exam_type}"
                     )
 
+                refresh_exam_ranks(c, [result_cohort(c, result_id)])
+                scope = result_scope(c, result_id)
+                bump_data_version(c, [scope])
                 conn.commit()
+                notify_results_changed([scope])
                 return result_id  # Return the result_id for inserting question marks
             except sqlite3.Error as e:
-                print(f"Error inserting student result: {e}")
-                return None
+                print(f"Error inserting student result: {e}")
+                return None
+            finally:
+                conn.close()
+
+    def insert_question_marks(
+        self, result_id, question_number, part_a, part_b, part_c, part_d
+    ):
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                apply_co_attainment(c, result_id, -1)
+                c.execute(
+                    """INSERT INTO question_marks
+                    (result_id, question_number, part_a, part_b, part_c, part_d)
+                    VALUES (?, ?, ?, ?, ?, ?)""",
+                    (result_id, question_number, part_a, part_b, part_c, part_d),
+                )
+                sync_wide_marks(c, result_id)
+                apply_co_attainment(c, result_id, 1)
+                scope = result_scope(c, result_id)
+                bump_data_version(c, [scope] if scope else [])
+                conn.commit()
+                if scope:
+                    notify_results_changed([scope])
+                return True
+            except sqlite3.Error as e:
+                print(f"Error inserting question marks: {e}")
+                return False
+            finally:
+                conn.close()
+
+    def get_all_results(self):
+        conn = connect_results()
+        if conn:
+            try:
+                c = conn.cursor()
+                return fetch_results(
+                    c, order_by="sr.timestamp DESC, sr.roll_number, sr.id", fan_out=True
+                )
+            except sqlite3.Error as e:
+                print(f"Error fetching all results: {e}")
+                return []
+            finally:
+                conn.close()
+        return []
+
+    def get_filtered_results(self, class_year, subject, exam_type, year=None):
+        conn = connect_results(
+            year, class_year=class_year, subject=subject, exam_type=exam_type
+        )
+        if conn:
+            try:
+                c = conn.cursor()
+                where, params = results_where(class_year, subject, exam_type, year)
+                return fetch_results(
+                    c, where, params, order_by="sr.roll_number, sr.id", fan_out=True
+                )
+            except sqlite3.Error as e:
+                print(f"Error getting filtered results: {e}")
+                return []
+            finally:
+                conn.close()
+        return []
+
+    def get_filtered_results_page(
+        self, class_year, subject, exam_type, after=None, page_size=100, year=None
+    ):
+        # Keyset pagination on (roll_number, id); after is the last row of the
+        # previous page. Returns (results, next_cursor or None).
+        conn = connect_results(
+            year, class_year=class_year, subject=subject, exam_type=exam_type
+        )
+        if conn:
+            try:
+                c = conn.cursor()
+                where, params = results_where(class_year, subject, exam_type, year)
+                if after:
+                    where += " AND (sr.roll_number, sr.id) > (?, ?)"
+                    params.extend(after)
+                results = list(
+                    islice(
+                        iter_results(
+                            c,
+                            where,
+                            params,
+                            order_by="sr.roll_number, sr.id",
+                            batch_size=page_size + 1,
+                            fan_out=True,
+                        ),
+                        page_size + 1,
+                    )
+                )
+                if len(results) > page_size:
+                    results = results[:page_size]
+                    last = results[-1]
+                    return results, (last["roll_number"], last["id"])
+                return results, None
+            except sqlite3.Error as e:
+                print(f"Error getting filtered results page: {e}")
+                return [], None
+            finally:
+                conn.close()
+        return [], None
+
+    def stream_results(self, class_year=None, subject=None, exam_type=None, year=None):
+        # All results (newest first, as get_all_results) narrowed by any of the
+        # view_marks filters that are given; generator, used by the exports
+        conn = connect_results(
+            year, class_year=class_year, subject=subject, exam_type=exam_type
+        )
+        if conn:
+            try:
+                c = conn.cursor()
+                where, params = results_where(class_year, subject, exam_type, year)
+                yield from iter_results(
+                    c,
+                    where,
+                    params,
+                    order_by="sr.timestamp DESC, sr.roll_number, sr.id",
+                    fan_out=True,
+                )
+            except sqlite3.Error as e:
+                print(f"Error streaming results: {e}")
+            finally:
+                conn.close()
+
+    def stream_filtered_results(
+        self, class_year, subject, exam_type, after=None, year=None
+    ):
+        # Generator variant for streamed responses; the connection lives as long
+        # as the consumer keeps iterating. Rows already yielded cannot be taken
+        # back, so a failed read ends with an {"error": message} item instead.
+        conn = connect_results(
+            year, class_year=class_year, subject=subject, exam_type=exam_type
+        )
+        if conn:
+            try:
+                c = conn.cursor()
+                where, params = results_where(class_year, subject, exam_type, year)
+                if after:
+                    where += " AND (sr.roll_number, sr.id) > (?, ?)"
+                    params.extend(after)
+                yield from iter_results(
+                    c, where, params, order_by="sr.roll_number, sr.id", fan_out=True
+                )
+            except sqlite3.Error as e:
+                print(f"Error streaming filtered results: {e}")
+                yield {"error": f"Database error: {e}"}
             finally:
                 conn.close()
+        else:
+            yield {"error": "Database connection error"}
 
-    def insert_question_marks(
-        self, result_id, question_number, part_a, part_b, part_c, part_d
-    ):
-        conn = create_connection()
+    def get_gradebook_page(self, class_year, after=None, page_size=100, year=None):
+        # Students x (subject, exam type) totals of one class year, keyset paged
+        # on roll number. Returns (columns, rows, next_cursor or None).
+        conn = connect_results(year, class_year=class_year)
         if conn:
             try:
                 c = conn.cursor()
-                c.execute(
-                    """INSERT INTO question_marks
-                    (result_id, question_number, part_a, part_b, part_c, part_d)
-                    VALUES (?, ?, ?, ?, ?, ?)""",
-                    (result_id, question_number, part_a, part_b, part_c, part_d),
-                )
-                conn.commit()
-                return True
+                columns = fetch_gradebook_columns(c, class_year, year)
+                if not columns:
+                    return [], [], None
+                rows = execute_gradebook(
+                    c, class_year, columns, year, after, page_size + 1
+                ).fetchall()
+                if len(rows) > page_size:
+                    rows = rows[:page_size]
+                    return columns, rows, rows[-1][0]
+                return columns, rows, None
             except sqlite3.Error as e:
-                print(f"Error inserting question marks: {e}")
-                return False
+                print(f"Error getting gradebook page: {e}")
+                return [], [], None
             finally:
                 conn.close()
+        return [], [], None
 
-    def get_all_results(self):
+    def get_gradebook_columns(self, class_year, year=None):
+        conn = connect_results(year, class_year=class_year)
+        if conn:
+            try:
+                return fetch_gradebook_columns(conn.cursor(), class_year, year)
+            except sqlite3.Error as e:
+                print(f"Error getting gradebook columns: {e}")
+                return []
+            finally:
+                conn.close()
+        return []
+
+    def stream_gradebook(self, class_year, columns, year=None):
+        # Every gradebook row of a class year from one cursor, for the export
+        conn = connect_results(year, class_year=class_year)
+        if conn:
+            try:
+                c = execute_gradebook(conn.cursor(), class_year, columns, year)
+                while True:
+                    rows = c.fetchmany(500)
+                    if not rows:
+                        break
+                    yield from rows
+            except sqlite3.Error as e:
+                print(f"Error streaming gradebook: {e}")
+            finally:
+                conn.close()
+
+    def get_closed_term_result_ids(self, result_ids):
+        # Those of result_ids stored in a closed term's file; the write paths
+        # only change the hot database, so these results are read-only
         conn = create_connection()
+        if not conn:
+            return []
+        try:
+            c = conn.cursor()
+            id_list = ", ".join("?" * len(result_ids))
+            c.execute(
+                f"SELECT id FROM students_results WHERE id IN ({id_list})",
+                result_ids,
+            )
+            hot_ids = {row[0] for row in c.fetchall()}
+        except sqlite3.Error as e:
+            print(f"Error checking result ids: {e}")
+            return []
+        finally:
+            conn.close()
+        other_ids = [result_id for result_id in result_ids if result_id not in hot_ids]
+        if not other_ids:
+            return []
+        conn = connect_results()
         if conn:
             try:
                 c = conn.cursor()
+                id_list = ", ".join("?" * len(other_ids))
                 c.execute(
-                    """SELECT sr.id, sr.roll_number, sr.class_year, sr.subject, sr.exam_type, sr.year, sr.total_marks, sr.timestamp,
-                                qm.question_number, qm.part_a, qm.part_b, qm.part_c, qm.part_d
-                                FROM students_results sr
-                                JOIN question_marks qm ON sr.id = qm.result_id
-                                ORDER BY sr.timestamp DESC, sr.roll_number, qm.question_number"""
+                    f"""SELECT id FROM all_results
+                    WHERE closed_term = 1 AND id IN ({id_list}) ORDER BY id""",
+                    other_ids,
                 )
-                rows = c.fetchall()
-
-                results = {}
-                for row in rows:
-                    (
-                        result_id,
-                        roll_number,
-                        class_year,
-                        subject,
-                        exam_type,
-                        year,
-                        total_marks,
-                        timestamp,
-                        q_num,
-                        part_a,
-                        part_b,
-                        part_c,
-                        part_d,
-                    ) = row
-                    if result_id not in results:  # Group by result_id first
-                        results[result_id] = {
-                            "id": result_id,
-                            "roll_number": roll_number,
-                            "class_year": class_year,
-                            "subject": subject,
-                            "exam_type": exam_type,
-                            "year": year,
-                            "total_marks": total_marks,
-                            "timestamp": timestamp,
-                            "questions": {},
-                        }
-                    results[result_id]["questions"][f"Q{q_num}"] = {
-                        "a": part_a,
-                        "b": part_b,
-                        "c": part_c,
-                        "d": part_d,
-                    }
-                return list(results.values())
+                return [row[0] for row in c.fetchall()]
             except sqlite3.Error as e:
-                print(f"Error fetching all results: {e}")
+                print(f"Error checking closed term results: {e}")
                 return []
             finally:
                 conn.close()
+        return []
 
-    def get_filtered_results(self, class_year, subject, exam_type):
-        conn = create_connection()
+    def has_closed_term_result(self, roll_number, class_year, subject, exam_type):
+        # Whether a closed term holds this student's result of the exam
+        conn = connect_results(
+            roll_number=roll_number,
+            class_year=class_year,
+            subject=subject,
+            exam_type=exam_type,
+        )
         if conn:
             try:
                 c = conn.cursor()
                 c.execute(
-                    """SELECT sr.id, sr.roll_number, sr.class_year, sr.subject, sr.exam_type, sr.year, sr.total_marks, sr.timestamp,
-                    qm.question_number, qm.part_a, qm.part_b, qm.part_c, qm.part_d
-                    FROM students_results sr
-                    JOIN question_marks qm ON sr.id = qm.result_id
-                    WHERE sr.class_year = ? AND sr.subject = ? AND sr.exam_type = ?
-                    ORDER BY sr.roll_number, qm.question_number""",
-                    (class_year, subject, exam_type),
+                    """SELECT EXISTS(SELECT 1 FROM all_results
+                    WHERE closed_term = 1 AND roll_number = ? AND class_year = ?
+                    AND subject = ? AND exam_type = ?)""",
+                    (roll_number, class_year, subject, exam_type),
                 )
-                rows = c.fetchall()
-                results = []
-                current_result = None
-                for row in rows:
-                    (
-                        result_id,
-                        roll_number,
-                        class_year_db,  # Use a different name to avoid conflict
-                        subject_db,
-                        exam_type_db,
-                        year_db,
-                        total_marks,
-                        timestamp,
-                        q_num,
-                        part_a,
-                        part_b,
-                        part_c,
-                        part_d,
-                    ) = row
-                    if not current_result or current_result["id"] != result_id:
-                        if current_result:
-                            results.append(current_result)
-                        current_result = {
-                            "id": result_id,
-                            "roll_number": roll_number,
-                            "class_year": class_year_db,
-                            "subject": subject_db,
-                            "exam_type": exam_type_db,  # Pass this exam_type to determine CO
-                            "year": year_db,
-                            "total_marks": total_marks,
-                            "timestamp": timestamp,
-                            "questions": {},
-                        }
-                    current_result["questions"][f"Q{q_num}"] = {
-                        "a": part_a,
-                        "b": part_b,
-                        "c": part_c,
-                        "d": part_d,
-                    }
-                if current_result:
-                    results.append(current_result)
-                return results
+                return bool(c.fetchone()[0])
             except sqlite3.Error as e:
-                print(f"Error getting filtered results: {e}")
-                return []
+                print(f"Error checking closed term results: {e}")
+                return False
             finally:
                 conn.close()
+        return False
 
     def delete_result(self, roll_number, class_year, subject, exam_type):
         conn = create_connection()
@@ -482,9 +2451,15 @@ class ResultsDatabase:
                 result_row = c.fetchone()
                 if result_row:
                     result_id = result_row[0]
+                    apply_co_attainment(c, result_id, -1)
+                    cohort = result_cohort(c, result_id)
                     # CASCADE DELETE should handle question_marks deletion, just delete from students_results
                     c.execute("DELETE FROM students_results WHERE id = ?", (result_id,))
+                    refresh_exam_ranks(c, [cohort])
+                    change = (roll_number, class_year, subject, exam_type)
+                    bump_data_version(c, [change])
                     conn.commit()
+                    notify_results_changed([change])
                     return True
                 return False
             except sqlite3.Error as e:
@@ -493,11 +2468,111 @@ class ResultsDatabase:
             finally:
                 conn.close()
 
+    def delete_results(
+        self, result_ids=None, class_year=None, subject=None, exam_type=None, year=None
+    ):
+        # Delete every result matching all the given filters and/or ids in one
+        # transaction; their question marks cascade. Returns
+        # {"results": n, "question_marks": n}, or None on error.
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                counts = {"results": 0, "question_marks": 0}
+                if not collect_bulk_results(
+                    c, result_ids, class_year, subject, exam_type, year
+                ):
+                    return counts
+                changes, cohorts = bulk_result_scopes(c)
+                c.execute(
+                    f"""SELECT COUNT(*) FROM question_marks
+                    WHERE result_id IN ({BULK_RESULT_IDS})"""
+                )
+                counts["question_marks"] = c.fetchone()[0]
+                apply_co_attainment_bulk(c, -1)
+                c.execute(
+                    f"DELETE FROM students_results WHERE id IN ({BULK_RESULT_IDS})"
+                )
+                counts["results"] = c.rowcount
+                refresh_exam_ranks(c, cohorts)
+                bump_data_version(c, changes)
+                conn.commit()
+                notify_results_changed(changes)
+                return counts
+            except sqlite3.Error as e:
+                print(f"Error deleting results: {e}")
+                return None
+            finally:
+                conn.close()
+
+    def move_results(
+        self,
+        new_subject=None,
+        new_exam_type=None,
+        result_ids=None,
+        class_year=None,
+        subject=None,
+        exam_type=None,
+        year=None,
+    ):
+        # Re-tag every matching result with a corrected subject and/or exam
+        # type in one transaction, moving its CO sums and ranks along. Nothing
+        # is moved if a student would end up with two results for one exam.
+        # Returns {"results": n, "conflicts": n}, or None on error.
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                counts = {"results": 0, "conflicts": 0}
+                if not collect_bulk_results(
+                    c, result_ids, class_year, subject, exam_type, year
+                ):
+                    return counts
+                old_changes, old_cohorts = bulk_result_scopes(c)
+                apply_co_attainment_bulk(c, -1)
+                c.execute(
+                    f"""UPDATE students_results
+                    SET subject = COALESCE(?, subject),
+                        exam_type = COALESCE(?, exam_type)
+                    WHERE id IN ({BULK_RESULT_IDS})""",
+                    (new_subject, new_exam_type),
+                )
+                moved = c.rowcount
+                c.execute(
+                    f"""SELECT COUNT(DISTINCT sr.id) FROM students_results sr
+                    JOIN students_results other
+                        ON other.roll_number = sr.roll_number
+                        AND other.subject = sr.subject
+                        AND other.exam_type = sr.exam_type
+                        AND other.year = sr.year
+                        AND other.id != sr.id
+                    WHERE sr.id IN ({BULK_RESULT_IDS})"""
+                )
+                counts["conflicts"] = c.fetchone()[0]
+                if counts["conflicts"]:
+                    conn.rollback()
+                    return counts
+                new_changes, new_cohorts = bulk_result_scopes(c)
+                apply_co_attainment_bulk(c, 1)
+                refresh_exam_ranks(c, old_cohorts + new_cohorts)
+                changes = sorted(set(old_changes) | set(new_changes))
+                bump_data_version(c, changes)
+                conn.commit()
+                notify_results_changed(changes)
+                counts["results"] = moved
+                return counts
+            except sqlite3.Error as e:
+                print(f"Error moving results: {e}")
+                return None
+            finally:
+                conn.close()
+
     def update_question_marks(self, result_id, question_data):
         conn = create_connection()
         if conn:
             try:
                 c = conn.cursor()
+                apply_co_attainment(c, result_id, -1)
 
                 for q_key, parts in question_data.items():
                     question_number_int = int(q_key.replace("Q", ""))
@@ -525,7 +2600,16 @@ class ResultsDatabase:
                     """UPDATE students_results SET total_marks = ? WHERE id = ?""",
                     (new_total_marks, result_id),
                 )
+                sync_wide_marks(c, result_id)
+                apply_co_attainment(c, result_id, 1)
+                cohort = result_cohort(c, result_id)
+                if cohort:
+                    refresh_exam_ranks(c, [cohort])
+                scope = result_scope(c, result_id)
+                bump_data_version(c, [scope] if scope else [])
                 conn.commit()
+                if scope:
+                    notify_results_changed([scope])
                 return True
             except sqlite3.Error as e:
                 print(f"Error updating question marks: {e}")
@@ -533,30 +2617,112 @@ class ResultsDatabase:
             finally:
                 conn.close()
 
-    def get_unique_exam_details(self):
+    def update_question_marks_batch(self, updates, teacher_id):
+        # Edits of many results in one transaction; updates is a list of
+        # (result_id, question_data) as for update_question_marks. Only results
+        # of the teacher's own courses are edited, and parts equal to the
+        # stored marks are skipped. Returns (results, rejected_ids): the changed
+        # results as stored afterwards (None on error), and the sorted ids that
+        # are not results of the teacher's courses.
         conn = create_connection()
         if conn:
             try:
                 c = conn.cursor()
-                c.execute(
-                    "SELECT DISTINCT class_year, subject, exam_type FROM students_results"
+                result_ids = list(dict.fromkeys(result_id for result_id, _ in updates))
+                if not result_ids:
+                    return [], []
+                id_list = ", ".join("?" * len(result_ids))
+                before = {
+                    result["id"]: result
+                    for result in fetch_results(
+                        c,
+                        f"""JOIN courses co ON sr.subject = co.course_id
+                        WHERE co.teacher_id = ? AND sr.id IN ({id_list})""",
+                        [teacher_id, *result_ids],
+                    )
+                }
+                rejected_ids = sorted(set(result_ids) - set(before))
+
+                question_rows = []
+                changed_ids = set()
+                for result_id, question_data in updates:
+                    result = before.get(result_id)
+                    if result is None:
+                        continue
+                    for q_key, parts in question_data.items():
+                        stored = result["questions"].get(q_key)
+                        values = tuple(parts[part] for part in QUESTION_PARTS)
+                        # Only existing question rows are updated, as in
+                        # update_question_marks
+                        if stored is None or values == tuple(
+                            stored[part] for part in QUESTION_PARTS
+                        ):
+                            continue
+                        question_rows.append(
+                            values + (result_id, int(q_key[1:]), teacher_id)
+                        )
+                        changed_ids.add(result_id)
+                if not changed_ids:
+                    return [], rejected_ids
+
+                changed_ids = sorted(changed_ids)
+                id_list = ", ".join("?" * len(changed_ids))
+                apply_co_attainment_results(
+                    c, [before[result_id] for result_id in changed_ids], -1
                 )
-                return c.fetchall()
+                c.executemany(
+                    """UPDATE question_marks
+                    SET part_a = ?, part_b = ?, part_c = ?, part_d = ?
+                    WHERE result_id = ? AND question_number = ?
+                        AND result_id IN (
+                            SELECT sr.id FROM students_results sr
+                            JOIN courses co ON sr.subject = co.course_id
+                            WHERE co.teacher_id = ?)""",
+                    question_rows,
+                )
+                c.execute(RESULT_MARKS_REFRESH.format(id_list), changed_ids)
+                results = fetch_results(c, f"WHERE sr.id IN ({id_list})", changed_ids)
+                apply_co_attainment_results(c, results, 1)
+                refresh_exam_ranks(
+                    c,
+                    [
+                        tuple(result[col] for col in COHORT_COLUMNS)
+                        for result in results
+                    ],
+                )
+                changes = sorted(
+                    {
+                        (
+                            result["roll_number"],
+                            result["class_year"],
+                            result["subject"],
+                            result["exam_type"],
+                        )
+                        for result in results
+                    }
+                )
+                bump_data_version(c, changes)
+                conn.commit()
+                notify_results_changed(changes)
+                return results, rejected_ids
             except sqlite3.Error as e:
-                print(f"Error getting unique exam details: {e}")
-                return []
+                print(f"Error updating question marks batch: {e}")
+                return None, []
             finally:
                 conn.close()
 
+    def get_unique_exam_details(self):
+        return [facet[:3] for facet in load_exam_facets()]
+
     def get_student_results_for_dashboard(self, student_id):
         # This method is for basic summary, not used for detailed analytics anymore
-        conn = create_connection()
+        conn = connect_results(roll_number=student_id)
         if conn:
             try:
                 c = conn.cursor()
                 c.execute(
                     """SELECT sr.total_marks, sr.subject, sr.exam_type, sr.year
-                    FROM students_results sr
+                    FROM all_results sr
                     WHERE sr.roll_number = ?
                     ORDER BY sr.year, sr.subject, sr.exam_type""",
                     (student_id,),
@@ -577,15 +2743,18 @@ class ResultsDatabase:
                 return []
             finally:
                 conn.close()
+        return []
 
     def get_class_results_summary(self, class_year, subject, exam_type):
-        conn = create_connection()
+        conn = connect_results(
+            class_year=class_year, subject=subject, exam_type=exam_type
+        )
         if conn:
             try:
                 c = conn.cursor()
                 c.execute(
                     """SELECT sr.roll_number, sr.total_marks
-                    FROM students_results sr
+                    FROM all_results sr
                     WHERE sr.class_year = ? AND sr.subject = ? AND sr.exam_type = ?
                     ORDER BY sr.total_marks DESC""",
                     (class_year, subject, exam_type),
@@ -598,49 +2767,289 @@ class ResultsDatabase:
                 return {}
             finally:
                 conn.close()
+        return []
 
     def get_raw_question_marks_for_co_analysis(
-        self, teacher_id, subject_name, exam_type=None, class_year=None
+        self, teacher_id, subject_name, exam_type=None, class_year=None, year=None
     ):
-        conn = create_connection()
+        conn = connect_results(
+            year, class_year=class_year, subject=subject_name, exam_type=exam_type
+        )
         if conn:
             try:
                 c = conn.cursor()
                 # Select only results related to courses taught by this teacher
                 # Assuming 'subject' column in students_results stores course_id/name
 
-                # Start with base query to get all relevant question marks
-                query = """
-                    SELECT
-                        sr.roll_number,
-                        sr.exam_type,
-                        qm.question_number,
-                        qm.part_a, qm.part_b, qm.part_c, qm.part_d
-                    FROM students_results sr
-                    JOIN question_marks qm ON sr.id = qm.result_id
-                    JOIN courses co ON sr.subject = co.course_id -- Join with courses to filter by teacher_id
-                    WHERE co.teacher_id = ? AND sr.subject = ?
-                """
+                # Start with base query to get all relevant results
+                where = """JOIN courses co ON sr.subject = co.course_id -- Join with courses to filter by teacher_id
+                    WHERE co.teacher_id = ? AND sr.subject = ?"""
                 params = [teacher_id, subject_name]
 
                 if exam_type:
-                    query += " AND sr.exam_type = ?"
+                    where += " AND sr.exam_type = ?"
                     params.append(exam_type)
                 if class_year:
-                    query += " AND sr.class_year = ?"
+                    where += " AND sr.class_year = ?"
                     params.append(class_year)
+                if year:
+                    where += " AND sr.year = ?"
+                    params.append(year)
 
-                query += " ORDER BY sr.roll_number, sr.exam_type, qm.question_number;"
-
-                c.execute(query, params)
-                return (
-                    c.fetchall()
-                )  # Returns list of tuples: (roll_number, exam_type, q_num, pa, pb, pc, pd)
+                results = fetch_results(
+                    c,
+                    where,
+                    params,
+                    order_by="sr.roll_number, sr.exam_type, sr.id",
+                    fan_out=True,
+                )
+                # Unpivot to one tuple per question, as the old question_marks join returned:
+                # (roll_number, exam_type, q_num, pa, pb, pc, pd)
+                raw_rows = []
+                for result in results:
+                    for q_key in sorted(result["questions"], key=lambda q: int(q[1:])):
+                        parts = result["questions"][q_key]
+                        raw_rows.append(
+                            (
+                                result["roll_number"],
+                                result["exam_type"],
+                                int(q_key[1:]),
+                                parts["a"],
+                                parts["b"],
+                                parts["c"],
+                                parts["d"],
+                            )
+                        )
+                return raw_rows
             except sqlite3.Error as e:
                 print(f"Error getting raw question marks for CO analysis: {e}")
                 return []
             finally:
                 conn.close()
+        return []
+
+    def get_marks_rows(
+        self, teacher_id, subject_name, exam_type=None, class_year=None, year=None
+    ):
+        # Same selection as get_raw_question_marks_for_co_analysis, one wide row per result
+        conn = connect_results(
+            year, class_year=class_year, subject=subject_name, exam_type=exam_type
+        )
+        if conn:
+            try:
+                c = conn.cursor()
+                where, params = teacher_results_where(
+                    teacher_id, subject_name, exam_type, class_year, year
+                )
+                return fetch_wide_marks(
+                    c,
+                    where,
+                    params,
+                    order_by="sr.roll_number, sr.exam_type, sr.id",
+                    fan_out=True,
+                )
+            except sqlite3.Error as e:
+                print(f"Error getting marks rows: {e}")
+                return []
+            finally:
+                conn.close()
+        return []
+
+    def get_question_statistics(
+        self, teacher_id, subject_name, exam_type, class_year, year=None
+    ):
+        # Per-question answer counts and part sums, grouped inside SQLite
+        conn = connect_results(
+            year, class_year=class_year, subject=subject_name, exam_type=exam_type
+        )
+        if conn:
+            try:
+                c = conn.cursor()
+                where, params = teacher_results_where(
+                    teacher_id, subject_name, exam_type, class_year, year
+                )
+                return fetch_question_statistics(c, where, params)
+            except sqlite3.Error as e:
+                print(f"Error getting question statistics: {e}")
+                return []
+            finally:
+                conn.close()
+        return []
+
+    def get_result_scores(
+        self, teacher_id, subject_name, exam_type, class_year, year=None
+    ):
+        conn = connect_results(
+            year, class_year=class_year, subject=subject_name, exam_type=exam_type
+        )
+        if conn:
+            try:
+                c = conn.cursor()
+                where, params = teacher_results_where(
+                    teacher_id, subject_name, exam_type, class_year, year
+                )
+                return fetch_result_scores(c, where, params)
+            except sqlite3.Error as e:
+                print(f"Error getting result scores: {e}")
+                return []
+            finally:
+                conn.close()
+        return []
+
+    def get_student_exam_ranks(self, roll_number):
+        # (subject, class_year, exam_type, year, class_rank, percent_rank,
+        # cohort_size) of each of the student's results
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                c.execute(
+                    """SELECT subject, class_year, exam_type, year, class_rank,
+                        percent_rank, cohort_size
+                    FROM exam_ranks WHERE roll_number = ?
+                    ORDER BY year, subject, exam_type""",
+                    (roll_number,),
+                )
+                return c.fetchall()
+            except sqlite3.Error as e:
+                print(f"Error getting student exam ranks: {e}")
+                return []
+            finally:
+                conn.close()
+
+    def get_data_version(self):
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                c.execute(
+                    "SELECT version FROM data_versions WHERE scope = ?",
+                    (GLOBAL_DATA_SCOPE,),
+                )
+                row = c.fetchone()
+                return row[0] if row else 0
+            except sqlite3.Error as e:
+                print(f"Error getting data version: {e}")
+                return None
+            finally:
+                conn.close()
+
+    def get_exam_data_version(self, subject, class_year, exam_type):
+        # Single primary key lookup; 0 for an exam that was never written
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                c.execute(
+                    "SELECT version FROM data_versions WHERE scope = ?",
+                    (exam_data_scope(subject, class_year, exam_type),),
+                )
+                row = c.fetchone()
+                return row[0] if row else 0
+            except sqlite3.Error as e:
+                print(f"Error getting exam data version: {e}")
+                return None
+            finally:
+                conn.close()
+
+    def get_co_attainment(
+        self, teacher_id, subject_name, exam_type, class_year, per_student=False
+    ):
+        # Precomputed CO sums: class totals, or one row per student when per_student
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                query = """
+                    SELECT ca.roll_number, ca.co, ca.obtained, ca.max_marks
+                    FROM co_attainment ca
+                    JOIN courses co ON ca.subject = co.course_id
+                    WHERE co.teacher_id = ? AND ca.subject = ? AND ca.exam_type = ?
+                        AND ca.class_year = ?
+                """
+                query += (
+                    " AND ca.roll_number != ?"
+                    if per_student
+                    else " AND ca.roll_number = ?"
+                )
+                query += " ORDER BY ca.roll_number, ca.co"
+                c.execute(
+                    query,
+                    (teacher_id, subject_name, exam_type, class_year, CLASS_TOTAL_ROLL),
+                )
+                return c.fetchall()  # (roll_number, co, obtained, max_marks)
+            except sqlite3.Error as e:
+                print(f"Error getting CO attainment: {e}")
+                return []
+            finally:
+                conn.close()
+
+    def get_course_co_attainment(
+        self, teacher_id, course_id, target_percent, class_year=None
+    ):
+        """Weighted CO attainment of a course over all of its exams.
+
+        Returns (co_rows, exam_rows). co_rows are (co, class_percent, students,
+        students_attained): the exam-weighted class attainment, and how many
+        students have a weighted attainment of at least target_percent.
+        exam_rows are (exam_type, co, class_percent) for the breakdown.
+        """
+        conn = create_connection()
+        if conn:
+            try:
+                c = conn.cursor()
+                where = """JOIN courses co ON ca.subject = co.course_id
+                    WHERE co.teacher_id = ? AND ca.subject = ? AND ca.max_marks > 0"""
+                params = [teacher_id, course_id]
+                if class_year:
+                    where += " AND ca.class_year = ?"
+                    params.append(class_year)
+
+                # Every CO's weighted percentages, per student and for the
+                # class, and the share at target, in one grouped pass
+                c.execute(
+                    f"""WITH scores AS (
+                        SELECT ca.co, ca.roll_number,
+                            ca.obtained * 100.0 / ca.max_marks AS percent,
+                            COALESCE(w.weight, ?) AS weight
+                        FROM co_attainment ca
+                        LEFT JOIN course_exam_weights w
+                            ON w.course_id = ca.subject AND w.exam_type = ca.exam_type
+                        {where}
+                    ), weighted AS (
+                        SELECT co, roll_number,
+                            SUM(weight * percent) / SUM(weight) AS percent
+                        FROM scores WHERE weight > 0
+                        GROUP BY co, roll_number
+                    )
+                    SELECT co,
+                        MAX(CASE WHEN roll_number = ? THEN percent END),
+                        SUM(roll_number != ?),
+                        SUM(roll_number != ? AND percent >= ?)
+                    FROM weighted GROUP BY co ORDER BY co""",
+                    [
+                        DEFAULT_EXAM_WEIGHT,
+                        *params,
+                        CLASS_TOTAL_ROLL,
+                        CLASS_TOTAL_ROLL,
+                        CLASS_TOTAL_ROLL,
+                        target_percent,
+                    ],
+                )
+                co_rows = c.fetchall()
+                c.execute(
+                    f"""SELECT ca.exam_type, ca.co,
+                        SUM(ca.obtained) * 100.0 / SUM(ca.max_marks)
+                    FROM co_attainment ca {where} AND ca.roll_number = ?
+                    GROUP BY ca.exam_type, ca.co ORDER BY ca.exam_type, ca.co""",
+                    [*params, CLASS_TOTAL_ROLL],
+                )
+                return co_rows, c.fetchall()
+            except sqlite3.Error as e:
+                print(f"Error getting course CO attainment: {e}")
+                return [], []
+            finally:
+                conn.close()
 
     def insert_test_marks(self, roll_number):
         conn = create_connection()
@@ -676,6 +3085,7 @@ class ResultsDatabase:
                 ]  # These should correspond to actual course_ids/names
                 exam_types = ["Mid 1", "Final"]  # Specific exam types for CO mapping
                 current_year = datetime.now().year
+                changes = []
 
                 for subject in subjects:
                     # For test data, assume subject name acts as course_id for now
@@ -737,8 +3147,20 @@ class ResultsDatabase:
                                 """,
                                 (result_id, q_num, part_a, part_b, part_c, part_d),
                             )
+                        sync_wide_marks(c, result_id)
+                        apply_co_attainment(c, result_id, 1)
+                        changes.append((roll_number, "Year 1", subject, exam_type))
 
+                refresh_exam_ranks(
+                    c,
+                    [
+                        (subject, class_year, exam_type, current_year)
+                        for _, class_year, subject, exam_type in changes
+                    ],
+                )
+                bump_data_version(c, changes)
                 conn.commit()
+                notify_results_changed(changes)
                 print(
                     f"Successfully inserted test marks data for student {roll_number}"
                 )
@@ -750,93 +3172,134 @@ class ResultsDatabase:
 
     # --- New method for student detailed results (including question marks) ---
     def get_student_detailed_results(self, roll_number):
-        conn = create_connection()
+        # Cross-year by nature: fans out over every term
+        conn = connect_results(roll_number=roll_number)
         if conn:
             try:
                 c = conn.cursor()
-                c.execute(
-                    """
-                    SELECT
-                        sr.id, sr.roll_number, sr.class_year, sr.subject, sr.exam_type, sr.year, sr.total_marks, sr.timestamp,
-                        qm.question_number, qm.part_a, qm.part_b, qm.part_c, qm.part_d
-                    FROM students_results sr
-                    JOIN question_marks qm ON sr.id = qm.result_id
-                    WHERE sr.roll_number = ?
-                    ORDER BY sr.year ASC, sr.timestamp ASC, sr.subject ASC, sr.exam_type ASC, qm.question_number ASC
-                    """,
+                return fetch_results(
+                    c,
+                    "WHERE sr.roll_number = ?",
                     (roll_number,),
+                    order_by="sr.year ASC, sr.timestamp ASC, sr.subject ASC, sr.exam_type ASC",
+                    fan_out=True,
                 )
-                rows = c.fetchall()
-
-                results = {}
-                for row in rows:
-                    (
-                        result_id,
-                        roll_number_db,
-                        class_year,
-                        subject,
-                        exam_type,
-                        year,
-                        total_marks,
-                        timestamp,
-                        q_num,
-                        part_a,
-                        part_b,
-                        part_c,
-                        part_d,
-                    ) = row
-                    if result_id not in results:
-                        results[result_id] = {
-                            "id": result_id,
-                            "roll_number": roll_number_db,
-                            "class_year": class_year,
-                            "subject": subject,
-                            "exam_type": exam_type,
-                            "year": year,
-                            "total_marks": total_marks,
-                            "timestamp": timestamp,
-                            "questions": {},
-                        }
-                    results[result_id]["questions"][f"Q{q_num}"] = {
-                        "a": part_a,
-                        "b": part_b,
-                        "c": part_c,
-                        "d": part_d,
-                    }
-                return list(results.values())
             except sqlite3.Error as e:
                 print(f"Error getting student detailed results: {e}")
                 return []
             finally:
                 conn.close()
+        return []
 
-    # --- Methods to get all distinct exam types and class years (for CO filter dropdowns) ---
-    def get_all_exam_types(self):
-        conn = create_connection()
+    def get_student_subject_summary(self, roll_number):
+        # (subject, results, sum, min, max) of total_marks, one row per subject
+        conn = connect_results(roll_number=roll_number)
         if conn:
             try:
                 c = conn.cursor()
-                c.execute("SELECT DISTINCT exam_type FROM students_results")
-                return [row[0] for row in c.fetchall()]
+                c.execute(
+                    f"""SELECT sr.subject, COUNT(*), SUM(sr.total_marks),
+                           MIN(sr.total_marks), MAX(sr.total_marks)
+                    FROM all_results sr
+                    WHERE sr.roll_number = ? AND {RESULT_HAS_MARKS}
+                    GROUP BY sr.subject
+                    ORDER BY sr.subject""",
+                    (roll_number,),
+                )
+                return c.fetchall()
             except sqlite3.Error as e:
-                print(f"Error getting all exam types: {e}")
+                print(f"Error getting student subject summary: {e}")
                 return []
             finally:
                 conn.close()
+        return []
 
-    def get_all_class_years(self):
+    def get_student_score_trend(self, roll_number):
+        # (subject, exam_type, year, total_marks) per result, oldest first
+        conn = connect_results(roll_number=roll_number)
+        if conn:
+            try:
+                c = conn.cursor()
+                c.execute(
+                    f"""SELECT sr.subject, sr.exam_type, sr.year, sr.total_marks
+                    FROM all_results sr
+                    WHERE sr.roll_number = ? AND {RESULT_HAS_MARKS}
+                    ORDER BY sr.year ASC, sr.timestamp ASC, sr.subject ASC,
+                        sr.exam_type ASC""",
+                    (roll_number,),
+                )
+                return c.fetchall()
+            except sqlite3.Error as e:
+                print(f"Error getting student score trend: {e}")
+                return []
+            finally:
+                conn.close()
+        return []
+
+    def get_student_co_attainment(self, roll_number):
+        # One student's CO sums rolled up over every subject and exam
         conn = create_connection()
         if conn:
             try:
                 c = conn.cursor()
-                c.execute("SELECT DISTINCT class_year FROM students_results")
-                return [row[0] for row in c.fetchall()]
+                c.execute(
+                    """SELECT co, SUM(obtained), SUM(max_marks) FROM co_attainment
+                    WHERE roll_number = ? GROUP BY co ORDER BY co""",
+                    (roll_number,),
+                )
+                return c.fetchall()  # (co, obtained, max_marks)
             except sqlite3.Error as e:
-                print(f"Error getting all class years: {e}")
+                print(f"Error getting student CO attainment: {e}")
                 return []
             finally:
                 conn.close()
 
+    # --- Methods to get all distinct exam types and class years (for CO filter dropdowns) ---
+    def get_all_exam_types(self):
+        return sorted({exam_type for _, _, exam_type, _ in load_exam_facets()})
+
+    def get_all_class_years(self):
+        return sorted({class_year for class_year, _, _, _ in load_exam_facets()})
+
 
 # Initialize the database when the module is imported
 init_db()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Initialize and maintain the education database."
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    partition_parser = subparsers.add_parser(
+        "partition-term",
+        help="Move a closed academic year into its own read-only term file",
+    )
+    partition_parser.add_argument("year", type=int)
+    archive_parser = subparsers.add_parser(
+        "archive-term",
+        help="Move a closed academic year into the compressed cold archive",
+    )
+    archive_parser.add_argument("year", type=int)
+    subparsers.add_parser("list-terms", help="List partitioned academic years")
+    subparsers.add_parser("vacuum", help="Reclaim space in the hot database")
+    subparsers.add_parser(
+        "rebuild-facets", help="Recount the exam catalogue behind the filters"
+    )
+    args = parser.parse_args()
+
+    if args.command == "partition-term":
+        partition_term(args.year)
+    elif args.command == "archive-term":
+        archive_term(args.year)
+    elif args.command == "list-terms":
+        archived = set(list_archived_terms())
+        for term in list_terms():
+            location = archive_path(term) if term in archived else term_path(term)
+            print(f"{term}\t{location}")
+    elif args.command == "vacuum":
+        vacuum_database()
+    elif args.command == "rebuild-facets":
+        rebuild_exam_facets()
@@ -0,0 +1,211 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+import zlib
+
+import xlsxwriter
+
+from database import QUESTION_NUMBERS, QUESTION_PARTS
+
+# Output formats offered by /download_excel: mimetype and file extension
+EXPORT_FORMATS = {
+    "xlsx": (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "xlsx",
+    ),
+    "csv": ("text/csv", "csv"),
+    "csv.gz": ("application/gzip", "csv.gz"),
+}
+
+QUESTION_PART_COLUMNS = [f"Q{q}{p}" for q in QUESTION_NUMBERS for p in QUESTION_PARTS]
+
+EXPORT_COLUMNS = (
+    [
+        "Roll Number",
+        "Class Year",
+        "Subject",
+        "Exam Type",
+        "Academic Year",
+    ]
+    + QUESTION_PART_COLUMNS
+    + ["Total Marks"]
+)
+
+
+def export_rows(results):
+    """Flatten nested result dicts into spreadsheet rows, one at a time."""
+    for result in results:
+        row = [
+            result["roll_number"],
+            result["class_year"],
+            result["subject"],
+            result["exam_type"],
+            result["year"],
+        ]
+        for q_num in QUESTION_NUMBERS:
+            marks = result["questions"].get(f"Q{q_num}", {})
+            row.extend(marks.get(part, 0.0) for part in QUESTION_PARTS)
+        row.append(result["total_marks"])
+        yield row
+
+
+def gradebook_header(columns):
+    """Header row of the gradebook sheet for its (subject, exam_type) columns."""
+    return ["Roll Number"] + [
+        f"{subject} {exam_type}" for subject, exam_type in columns
+    ]
+
+
+def write_xlsx(rows, path, header=EXPORT_COLUMNS, sheet_name="Results"):
+    """Write rows to an .xlsx file without keeping the sheet in memory.
+
+    xlsxwriter's constant_memory mode flushes each row to disk as soon as the
+    next one starts, so memory stays flat however many results are exported.
+    """
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        worksheet = workbook.add_worksheet(sheet_name)
+        header_format = workbook.add_format({"bold": True})
+        worksheet.write_row(0, 0, header, header_format)
+        for row_index, row in enumerate(rows, start=1):
+            worksheet.write_row(row_index, 0, row)
+    finally:
+        workbook.close()
+
+
+def iter_csv(rows, chunk_size=64 * 1024):
+    """Yield the CSV export as encoded chunks of roughly chunk_size bytes."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_gzip(chunks):
+    """Gzip a stream of byte chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_cache_key(filters, data_version, export_format):
+    """Stable key for one export: its filters, format and the data version."""
+    payload = json.dumps(
+        {"filters": filters, "version": data_version, "format": export_format},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class ExportCache:
+    """Finished export files on disk, keyed by export_cache_key.
+
+    Files are always written to a unique temporary name and renamed into place
+    once complete, so concurrent requests never see each other's partial output.
+    Old files are evicted by age and, oldest first, once the folder is too big.
+    """
+
+    def __init__(self, folder, max_bytes=512 * 1024 * 1024, max_age_seconds=86400):
+        # send_file resolves relative paths against the app root, not the cwd
+        self.folder = os.path.abspath(folder)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(folder, exist_ok=True)
+
+    def path_for(self, key, extension):
+        return os.path.join(self.folder, f"{key}.{extension}")
+
+    def get(self, key, extension):
+        path = self.path_for(key, extension)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                return None
+            os.utime(path)  # Recently served files are evicted last
+            return path
+        except OSError:
+            return None
+
+    def _temp_file(self, extension):
+        fd, temp_path = tempfile.mkstemp(suffix=f".{extension}.part", dir=self.folder)
+        return fd, temp_path
+
+    def build_file(self, key, extension, write):
+        """Create the export with write(temp_path) and publish it atomically."""
+        fd, temp_path = self._temp_file(extension)
+        os.close(fd)
+        try:
+            write(temp_path)
+            path = self.path_for(key, extension)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        self.evict()
+        return path
+
+    def stream_and_store(self, key, extension, chunks):
+        """Pass chunks through to the client while saving them for next time.
+
+        The copy is only published if the stream runs to completion; an aborted
+        download leaves nothing behind.
+        """
+        fd, temp_path = self._temp_file(extension)
+        completed = False
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                for chunk in chunks:
+                    temp_file.write(chunk)
+                    yield chunk
+            os.replace(temp_path, self.path_for(key, extension))
+            completed = True
+        finally:
+            if not completed:
+                self._remove(temp_path)
+        self.evict()
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if name.endswith(".part"):
+                # Leftovers of crashed builds; in-progress ones are recent
+                if now - stat.st_mtime > self.max_age_seconds:
+                    self._remove(path)
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            self._remove(path)
+            total_size -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,322 @@
+"""Fill the database with synthetic teachers, courses, students and exam results.
+
+Meant for load testing and profiling: every run with the same arguments and
+seed produces the same data. Marks are generated with NumPy a batch of students
+at a time and written with executemany, one transaction per batch. Example:
+
+    python generate_data.py --students 50000 --courses 40 --years 2024 2025
+
+writes 50,000 students x 10 courses each x 3 exams x 2 years = 3 million
+results, i.e. 18 million question_marks rows.
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+from database import (
+    CLASS_TOTAL_ROLL,
+    DEFAULT_CO_COURSE,
+    MAX_MARKS_PER_PART,
+    QUESTION_NUMBERS,
+    QUESTION_PARTS,
+    WIDE_MARK_COLUMNS,
+    bump_data_version,
+    course_outcome_lookup,
+    create_connection,
+    hash_password,
+    refresh_exam_ranks,
+)
+
+DEFAULT_EXAM_TYPES = ["Mid 1", "Mid 2", "Final"]
+DEPARTMENTS = [
+    "Computer Science",
+    "Electronics",
+    "Mechanical",
+    "Civil",
+    "Electrical",
+    "Information Technology",
+]
+
+RESULT_INSERT = (
+    "INSERT INTO students_results (id, roll_number, class_year, subject, exam_type, "
+    "year, total_marks, wide_marks, "
+    + ", ".join(WIDE_MARK_COLUMNS)
+    + ") VALUES ("
+    + ", ".join(["?"] * (8 + len(WIDE_MARK_COLUMNS)))
+    + ")"
+)
+QUESTION_INSERT = """INSERT INTO question_marks
+    (result_id, question_number, part_a, part_b, part_c, part_d)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+
+
+def generate_marks(rng, ability, difficulty):
+    """Marks of shape students x questions x parts, in half-mark steps.
+
+    Each part's expected score follows a logistic curve of the student's ability
+    against the question's difficulty, so strong students do well throughout,
+    hard questions pull every score down, and totals come out roughly bell
+    shaped. A small share of parts is left unattempted.
+    """
+    n_students = len(ability)
+    noise = rng.normal(0.0, 0.6, (n_students, len(QUESTION_NUMBERS), 4))
+    logits = 1.3 * (ability[:, None, None] - difficulty[None, :, :]) + 0.6 + noise
+    marks = MAX_MARKS_PER_PART / (1.0 + np.exp(-logits))
+    marks = np.round(marks * 2) / 2
+    unattempted = rng.random(marks.shape) < 0.03
+    marks[unattempted] = 0.0
+    return marks
+
+
+def co_rollup_statements(exam_types):
+    """INSERT ... SELECT statements adding a range of results to co_attainment.
+
+    The CO sums are computed inside SQLite from the wide mark columns, one
+    statement per (exam type, CO), instead of per result in Python. Generated
+    courses have no mapping of their own, so the default mapping applies.
+    """
+    statements = []
+    for exam_type in exam_types:
+        cos = {}
+        question_cos = course_outcome_lookup(DEFAULT_CO_COURSE, exam_type)
+        for q_num, co in zip(QUESTION_NUMBERS, question_cos):
+            if co == "N/A":
+                continue
+            cos.setdefault(co, []).extend(f"q{q_num}{p}" for p in QUESTION_PARTS)
+        for co, columns in cos.items():
+            obtained = " + ".join(columns)
+            max_marks = len(columns) * MAX_MARKS_PER_PART
+            for roll_column, group_by in (
+                ("roll_number", ", roll_number"),
+                ("?", ""),
+            ):
+                statements.append(
+                    (
+                        f"""INSERT INTO co_attainment
+                        (subject, class_year, exam_type, co, roll_number, obtained, max_marks)
+                        SELECT subject, class_year, exam_type, ?, {roll_column},
+                               SUM({obtained}), COUNT(*) * {max_marks}
+                        FROM students_results
+                        WHERE id BETWEEN ? AND ? AND exam_type = ?
+                        GROUP BY subject, class_year{group_by}
+                        ON CONFLICT(subject, class_year, exam_type, co, roll_number)
+                        DO UPDATE SET obtained = obtained + excluded.obtained,
+                                      max_marks = max_marks + excluded.max_marks""",
+                        co,
+                        roll_column == "?",
+                        exam_type,
+                    )
+                )
+    return statements
+
+
+def generate(
+    teachers,
+    courses,
+    students,
+    class_years,
+    exam_types,
+    years,
+    seed,
+    prefix,
+    password,
+    batch_size,
+):
+    rng = np.random.default_rng(seed)
+    conn = create_connection()
+    if not conn:
+        return False
+    try:
+        c = conn.cursor()
+        c.execute("PRAGMA synchronous = OFF")
+        c.execute("SELECT 1 FROM students WHERE id = ?", (f"{prefix}S0000001",))
+        if c.fetchone():
+            print(f"Synthetic data with prefix '{prefix}' already exists.")
+            return False
+
+        # Everyone shares one password hash; hashing per user would dominate
+        hashed_password = hash_password(password)
+        teacher_ids = [f"{prefix}T{i:04d}" for i in range(1, teachers + 1)]
+        c.executemany(
+            "INSERT INTO teachers (id, full_name, department, specialization, password) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    teacher_id,
+                    f"Teacher {teacher_id}",
+                    DEPARTMENTS[i % len(DEPARTMENTS)],
+                    "General",
+                    hashed_password,
+                )
+                for i, teacher_id in enumerate(teacher_ids)
+            ],
+        )
+
+        # Courses are spread over class years and taught round-robin
+        class_year_names = [f"Year {i}" for i in range(1, class_years + 1)]
+        courses_by_class_year = {name: [] for name in class_year_names}
+        course_rows = []
+        for i in range(courses):
+            course_id = f"{prefix}C{i + 1:03d}"
+            courses_by_class_year[class_year_names[i % class_years]].append(course_id)
+            course_rows.append(
+                (course_id, f"Course {course_id}", teacher_ids[i % teachers])
+            )
+        c.executemany(
+            "INSERT INTO courses (course_id, course_name, teacher_id) VALUES (?, ?, ?)",
+            course_rows,
+        )
+        conn.commit()
+
+        # Question difficulty is fixed per (course, exam type) so every student
+        # in a cohort sits the same paper
+        difficulty = {
+            (course_id, exam_type): rng.normal(
+                0.0, 0.7, (len(QUESTION_NUMBERS), len(QUESTION_PARTS))
+            )
+            for course_id, _, _ in course_rows
+            for exam_type in exam_types
+        }
+
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM students_results")
+        first_result_id = next_result_id = c.fetchone()[0] + 1
+        co_rollups = co_rollup_statements(exam_types)
+        question_rows_written = 0
+        changes = set()
+        started = time.perf_counter()
+
+        for start in range(0, students, batch_size):
+            stop = min(start + batch_size, students)
+            roll_numbers = [f"{prefix}S{i + 1:07d}" for i in range(start, stop)]
+            c.executemany(
+                "INSERT INTO students (id, full_name, department, password) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        roll,
+                        f"Student {roll}",
+                        DEPARTMENTS[i % len(DEPARTMENTS)],
+                        hashed_password,
+                    )
+                    for i, roll in enumerate(roll_numbers, start=start)
+                ],
+            )
+            class_year_of = np.arange(start, stop) % class_years
+            batch_first_id = next_result_id
+
+            for year_index, class_year in enumerate(class_year_names):
+                members = class_year_of == year_index
+                cohort = [r for r, m in zip(roll_numbers, members) if m]
+                if not cohort:
+                    continue
+                for course_id in courses_by_class_year[class_year]:
+                    changes.update(
+                        (None, class_year, course_id, exam_type)
+                        for exam_type in exam_types
+                    )
+                    ability = rng.normal(0.0, 1.0, len(cohort))
+                    for year in years:
+                        for exam_type in exam_types:
+                            marks = generate_marks(
+                                rng, ability, difficulty[(course_id, exam_type)]
+                            )
+                            totals = marks.sum(axis=(1, 2)).tolist()
+                            flat_marks = marks.reshape(len(cohort), -1).tolist()
+                            result_ids = range(
+                                next_result_id, next_result_id + len(cohort)
+                            )
+                            next_result_id += len(cohort)
+                            c.executemany(
+                                RESULT_INSERT,
+                                [
+                                    (
+                                        result_id,
+                                        roll,
+                                        class_year,
+                                        course_id,
+                                        exam_type,
+                                        year,
+                                        total,
+                                        1,
+                                        *parts,
+                                    )
+                                    for result_id, roll, total, parts in zip(
+                                        result_ids, cohort, totals, flat_marks
+                                    )
+                                ],
+                            )
+                            c.executemany(
+                                QUESTION_INSERT,
+                                [
+                                    (result_id, q_num, *parts[offset : offset + 4])
+                                    for result_id, parts in zip(result_ids, flat_marks)
+                                    for q_num, offset in zip(
+                                        QUESTION_NUMBERS, range(0, len(parts), 4)
+                                    )
+                                ],
+                            )
+                            question_rows_written += len(cohort) * len(QUESTION_NUMBERS)
+
+            for sql, co, class_row, exam_type in co_rollups:
+                params = (co,) + ((CLASS_TOTAL_ROLL,) if class_row else ())
+                c.execute(sql, params + (batch_first_id, next_result_id - 1, exam_type))
+            conn.commit()
+            elapsed = time.perf_counter() - started
+            print(
+                f"{stop}/{students} students, {question_rows_written} question rows "
+                f"({question_rows_written / elapsed:,.0f} rows/s)"
+            )
+
+        refresh_exam_ranks(c)
+        bump_data_version(c, changes)
+        conn.commit()
+        print(
+            f"Generated {next_result_id - first_result_id} results "
+            f"for {students} students in {time.perf_counter() - started:.1f}s."
+        )
+        return True
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--teachers", type=int, default=20)
+    parser.add_argument("--courses", type=int, default=40)
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--class-years", type=int, default=4)
+    parser.add_argument("--exam-types", nargs="+", default=DEFAULT_EXAM_TYPES)
+    parser.add_argument("--years", nargs="+", type=int, default=[datetime.now().year])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default="SYN", help="Prefix of every generated ID")
+    parser.add_argument(
+        "--password",
+        default="password123",
+        help="Password of every generated teacher and student",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=2000,
+        help="Students written per transaction",
+    )
+    args = parser.parse_args()
+
+    ok = generate(
+        args.teachers,
+        args.courses,
+        args.students,
+        args.class_years,
+        args.exam_types,
+        args.years,
+        args.seed,
+        args.prefix,
+        args.password,
+        args.batch_size,
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """In-memory LRU cache of rendered responses, with a TTL and tags.
+
+    Every entry is stored with a set of tags naming the data it was built from,
+    e.g. ("exam", subject, class_year, exam_type); invalidate(tag) drops exactly
+    the entries carrying that tag. The TTL bounds staleness for changes made
+    outside this process (another worker, a CLI script).
+
+    A response computed while an invalidation ran may already be stale, so
+    set() takes the generation read before computing it and skips storing if
+    anything was invalidated since.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._keys_by_tag = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.generation = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, tags=(), generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, tags)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tag):
+        """Drop every entry carrying tag; returns how many were dropped."""
+        with self._lock:
+            keys = self._keys_by_tag.get(tag, ())
+            count = len(keys)
+            self.generation += 1
+            for key in list(keys):
+                self._remove(key)
+            self.invalidations += count
+            return count
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self.generation += 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys_by_tag[tag]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_tag[tag]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,125 @@
+import argparse
+import csv
+import io
+import re
+
+import openpyxl
+
+ROSTER_EXTENSIONS = {"csv", "xlsx"}
+
+# Accepted spellings of each roster column, after normalize_header
+ROSTER_HEADERS = {
+    "studentid": "student_id",
+    "rollnumber": "student_id",
+    "rollno": "student_id",
+    "id": "student_id",
+    "fullname": "full_name",
+    "name": "full_name",
+    "studentname": "full_name",
+    "department": "department",
+    "dept": "department",
+    "password": "password",
+}
+ROSTER_FIELDS = ("student_id", "full_name", "department", "password")
+
+
+def normalize_header(header):
+    return re.sub(r"[^a-z0-9]", "", str(header or "").lower())
+
+
+def cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel stores roll numbers like 101 as 101.0
+    return str(value).strip()
+
+
+def read_rows(data, filename):
+    """Yield the raw rows of a CSV or XLSX roster, header row first."""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension == "csv":
+        text = data.decode("utf-8-sig")
+        yield from csv.reader(io.StringIO(text))
+    elif extension == "xlsx":
+        workbook = openpyxl.load_workbook(
+            io.BytesIO(data), read_only=True, data_only=True
+        )
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError("Roster must be a .csv or .xlsx file.")
+
+
+def read_roster(data, filename):
+    """Parse a roster file into student dicts.
+
+    Returns (students, errors); rows with missing fields are reported in errors
+    by their line number and left out of students.
+    """
+    rows = read_rows(data, filename)
+    header = next(rows, None)
+    if header is None:
+        return [], ["Roster file is empty."]
+
+    columns = {}
+    for index, name in enumerate(header):
+        field = ROSTER_HEADERS.get(normalize_header(name))
+        if field and field not in columns:
+            columns[field] = index
+    missing = [field for field in ROSTER_FIELDS if field not in columns]
+    if missing:
+        return [], [f"Missing columns: {', '.join(missing)}"]
+
+    students = []
+    errors = []
+    for line_number, row in enumerate(rows, start=2):
+        values = {
+            field: cell_text(row[index]) if index < len(row) else ""
+            for field, index in columns.items()
+        }
+        if not any(values.values()):
+            continue  # Blank line
+        empty = [field for field in ROSTER_FIELDS if not values[field]]
+        if empty:
+            errors.append(f"Row {line_number}: missing {', '.join(empty)}")
+            continue
+        students.append(values)
+    return students, errors
+
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(
+        description="Register every student in a CSV or XLSX roster."
+    )
+    parser.add_argument("roster", help="Path to the roster file")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes used for password hashing (default: all cores)",
+    )
+    args = parser.parse_args()
+
+    with open(args.roster, "rb") as roster_file:
+        students, errors = read_roster(roster_file.read(), args.roster)
+    for error in errors:
+        print(error)
+
+    success, message, summary = Database().register_students_bulk(
+        students, workers=args.workers
+    )
+    print(message)
+    if summary["skipped_existing"]:
+        print(f"Already registered: {', '.join(summary['skipped_existing'])}")
+    if summary["skipped_duplicates"]:
+        print(f"Repeated in roster: {', '.join(summary['skipped_duplicates'])}")
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
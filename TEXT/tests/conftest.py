@@ -0,0 +1,145 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# database.py and app.py use paths relative to the working directory and set
+# the database up on import, so they are imported from a scratch directory
+# and never touch database/education.db.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="education-tests-"))
+os.makedirs("database", exist_ok=True)
+# The tests log in through the session, so cheap hashes are enough
+os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+
+import app as app_module  # noqa: E402
+import database  # noqa: E402
+from exports import ExportCache  # noqa: E402
+
+TEACHER_ID = "T1"
+COURSE_ID = "Math"
+CLASS_YEAR = "Year 1"
+EXAM_TYPES = ("Mid 1", "Mid 2", "Final")
+ACADEMIC_YEAR = 2025
+STUDENTS = [f"S{i:02d}" for i in range(10)]
+
+
+def reset_database():
+    # An empty database and empty in-process caches
+    shutil.rmtree("database", ignore_errors=True)
+    os.makedirs("database")
+    database.init_db()
+    database.invalidate_course_outcomes()
+    database.invalidate_exam_facets()
+    app_module.response_cache.clear()
+    app_module.export_cache = ExportCache(app_module.EXPORT_CACHE_FOLDER)
+
+
+def add_result(roll_number, subject, exam_type, year=ACADEMIC_YEAR):
+    """Store one result with all six questions; returns its id.
+
+    Part marks differ per student and exam, so totals and ranks are not all tied.
+    """
+    results_db = database.ResultsDatabase()
+    result_id = results_db.insert_student_result(
+        roll_number, CLASS_YEAR, subject, exam_type, year, 0
+    )
+    seed = int(roll_number[1:]) + len(exam_type)
+    for q_num in database.QUESTION_NUMBERS:
+        parts = [(seed * q_num + part) % 5 for part in range(4)]
+        results_db.insert_question_marks(result_id, q_num, *parts)
+    results_db.update_question_marks(result_id, {})
+    return result_id
+
+
+def seed_course():
+    # The teacher's course with a result of every student in every exam
+    db = database.Database()
+    db.register_teacher("Teacher", TEACHER_ID, "CS", "Maths", "password")
+    db.add_course(COURSE_ID, COURSE_ID, TEACHER_ID)
+    for roll_number in STUDENTS:
+        db.register_student("Student", roll_number, "CS", "password")
+        for exam_type in EXAM_TYPES:
+            add_result(roll_number, COURSE_ID, exam_type)
+
+
+def snapshot():
+    """Results, CO sums and ranks as stored, for comparing two write paths."""
+    conn = database.create_connection()
+    try:
+        c = conn.cursor()
+        c.execute("SELECT * FROM students_results ORDER BY id")
+        columns = [column[0] for column in c.description]
+        results = [
+            tuple(value for column, value in zip(columns, row) if column != "timestamp")
+            for row in c.fetchall()
+        ]
+        c.execute(
+            """SELECT subject, class_year, exam_type, co, roll_number,
+                ROUND(obtained, 6), ROUND(max_marks, 6)
+            FROM co_attainment WHERE max_marks > 0.5 ORDER BY 1, 2, 3, 4, 5"""
+        )
+        co_attainment = c.fetchall()
+        c.execute("SELECT * FROM exam_ranks ORDER BY result_id")
+        return results, co_attainment, c.fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    reset_database()
+    yield tmp_path
+
+
+@pytest.fixture
+def seeded():
+    seed_course()
+
+
+def exam_query(path, exam_type, course_param="subject"):
+    return (
+        f"{path}?class_year={CLASS_YEAR}&{course_param}={COURSE_ID}"
+        f"&exam_type={exam_type}"
+    )
+
+
+def analysis_url(exam_type):
+    return exam_query("/get_analysis", exam_type)
+
+
+def result_id(roll_number, exam_type):
+    return next(
+        result["id"]
+        for result in database.ResultsDatabase().get_filtered_results(
+            CLASS_YEAR, COURSE_ID, exam_type
+        )
+        if result["roll_number"] == roll_number
+    )
+
+
+def zero_first_question(client, roll_number, exam_type):
+    response = client.post(
+        "/api/update-marks",
+        json={
+            "result_id": result_id(roll_number, exam_type),
+            "question_data": {"Q1": {"a": 0, "b": 0, "c": 0, "d": 0}},
+        },
+    )
+    assert response.status_code == 200
+
+
+def login(user_type="teacher", user_id=TEACHER_ID):
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+        session["user_type"] = user_type
+    return client
+
+
+@pytest.fixture
+def teacher():
+    return login()
@@ -0,0 +1,226 @@
+import io
+import zipfile
+
+import pytest
+
+import database
+from conftest import ACADEMIC_YEAR, TEACHER_ID, login
+
+# A class of ten in pairs: every part mark of P0 and P1 is 0, of P2 and P3 is
+# 1 and so on, so the totals are 0, 0, 24, 24, ..., 96, 96
+CLASS = "Year 2"
+SUBJECT = "Phys"
+ROLL_NUMBERS = [f"P{position}" for position in range(10)]
+
+
+def add_uniform_result(roll_number, exam_type, part_mark):
+    """Store a result whose every part scores part_mark; returns its id."""
+    results_db = database.ResultsDatabase()
+    result_id = results_db.insert_student_result(
+        roll_number, CLASS, SUBJECT, exam_type, ACADEMIC_YEAR, 0
+    )
+    for q_num in database.QUESTION_NUMBERS:
+        results_db.insert_question_marks(result_id, q_num, *[part_mark] * 4)
+    results_db.update_question_marks(result_id, {})
+    return result_id
+
+
+@pytest.fixture
+def ranked_class(seeded):
+    database.Database().add_course(SUBJECT, SUBJECT, TEACHER_ID)
+    return {
+        roll_number: add_uniform_result(roll_number, "Mid 1", position // 2)
+        for position, roll_number in enumerate(ROLL_NUMBERS)
+    }
+
+
+def exam_query(path, exam_type="Mid 1"):
+    return f"{path}?class_year={CLASS}&subject={SUBJECT}&exam_type={exam_type}"
+
+
+@pytest.mark.usefixtures("ranked_class")
+def test_analysis_has_distribution_percentiles_and_top_k(teacher):
+    data = teacher.get(exam_query("/get_analysis")).get_json()["data"]
+    distribution = data["score_distribution"]
+    assert distribution["max_score"] == 120
+    assert distribution["bin_edges"][:3] == [0, 12, 24]
+    # Two totals in every other bin of 12 marks
+    assert distribution["counts"] == [2, 0, 2, 0, 2, 0, 2, 0, 2, 0]
+    percentiles = distribution["percentiles"]
+    assert (percentiles["min"], percentiles["max"]) == (0, 96)
+    assert (percentiles["p25"], percentiles["p50"], percentiles["p75"]) == (24, 48, 72)
+    assert percentiles["mean"] == 48
+
+    # Marks of the top and bottom lists are percentages of the maximum; ties
+    # keep roll number order, and nobody is on both lists
+    assert data["top_performers"][0] == {"roll_number": "P8", "marks": 80.0}
+    assert data["needs_improvement"][0] == {"roll_number": "P0", "marks": 0.0}
+    assert [row["roll_number"] for row in data["top_performers"]] == [
+        "P8",
+        "P9",
+        "P6",
+        "P7",
+        "P4",
+    ]
+    assert [row["roll_number"] for row in data["needs_improvement"]] == [
+        "P0",
+        "P1",
+        "P2",
+        "P3",
+        "P5",
+    ]
+
+
+def exam_rank(roll_number, exam_type="Mid 1"):
+    client = login("student", roll_number)
+    data = client.get(f"/api/student-analytics/{roll_number}").get_json()
+    (rank,) = [row for row in data["exam_ranks"] if row["exam_type"] == exam_type]
+    return rank["rank"], rank["cohort_size"], rank["percentile"]
+
+
+def test_exam_ranks_follow_the_cohort_totals(ranked_class):
+    # Ties share a rank; the percentile is the share of the cohort below
+    assert exam_rank("P8") == (1, 10, 88.9)
+    assert exam_rank("P9") == (1, 10, 88.9)
+    assert exam_rank("P6") == (3, 10, 66.7)
+    assert exam_rank("P0") == (9, 10, 0.0)
+
+    full_marks = {
+        f"Q{q_num}": dict.fromkeys("abcd", 5) for q_num in database.QUESTION_NUMBERS
+    }
+    database.ResultsDatabase().update_question_marks(ranked_class["P0"], full_marks)
+    assert exam_rank("P0") == (1, 10, 100.0)
+    assert exam_rank("P8") == (2, 10, 77.8)
+    assert exam_rank("P1") == (10, 10, 0.0)
+
+
+@pytest.mark.usefixtures("ranked_class")
+def test_item_analysis_of_a_consistent_class(teacher):
+    data = teacher.get(exam_query("/get_item_analysis")).get_json()["data"]
+    assert data["results"] == len(ROLL_NUMBERS)
+    assert len(data["items"]) == len(database.QUESTION_NUMBERS) * 4
+    # The top and bottom 27% are three results each: part marks 4, 4, 3
+    # against 0, 0, 1
+    assert data["group_size"] == 3
+    # Every item ranks the class the same way, so the test is fully reliable
+    assert data["cronbach_alpha"] == 1.0
+    for item in data["items"]:
+        assert item["facility"] == 0.4
+        assert item["discrimination"] == 0.667
+        assert item["point_biserial"] == 1.0
+
+
+def test_item_analysis_of_a_single_result_has_no_statistics(seeded, teacher):
+    database.Database().add_course(SUBJECT, SUBJECT, TEACHER_ID)
+    add_uniform_result("P0", "Mid 1", 3)
+    data = teacher.get(exam_query("/get_item_analysis")).get_json()["data"]
+    assert (data["results"], data["group_size"]) == (1, 0)
+    assert data["cronbach_alpha"] is None
+    assert data["items"][0] == {
+        "item": "Q1a",
+        "facility": 0.6,
+        "discrimination": None,
+        "point_biserial": None,
+        "alpha_if_deleted": None,
+    }
+
+
+def test_course_co_attainment_weighs_the_exams(ranked_class, teacher):
+    for roll_number in ROLL_NUMBERS:
+        add_uniform_result(roll_number, "Mid 2", 5)
+    database.Database().set_course_attainment_settings(
+        SUBJECT, {"Mid 1": 3, "Mid 2": 1}, 60, (30, 50, 70)
+    )
+    response = teacher.get(
+        f"/api/teacher/course-co-attainment?course_id={SUBJECT}&class_year={CLASS}"
+    )
+    report = {row["co"]: row for row in response.get_json()["co_attainment"]}
+    assert sorted(report) == ["CO1", "CO2", "CO3", "CO4", "CO5"]
+
+    # CO3 is asked in both exams: (3 x 40% + 1 x 100%) / 4 for the class, and
+    # (3 x 80% + 100%) / 4 = 85% down to 25% for the students
+    assert report["CO3"]["attainment"] == 55
+    assert report["CO3"]["by_exam"] == {"Mid 1": 40, "Mid 2": 100}
+    assert (report["CO3"]["students"], report["CO3"]["students_attained"]) == (10, 4)
+    assert (report["CO3"]["attained_percent"], report["CO3"]["level"]) == (40, 1)
+
+    # Mid 1 alone: 60% and 80% reach the target
+    assert (report["CO1"]["attainment"], report["CO1"]["students_attained"]) == (40, 4)
+    # Mid 2 alone: everyone has full marks
+    assert report["CO4"]["students_attained"] == 10
+    assert report["CO4"]["level"] == 3
+
+
+def test_course_co_attainment_of_another_teachers_course(ranked_class):
+    response = login("teacher", "T2").get(
+        f"/api/teacher/course-co-attainment?course_id={SUBJECT}"
+    )
+    assert response.status_code == 404
+
+
+def test_class_analytics_summarises_every_student(ranked_class, teacher):
+    for roll_number in ROLL_NUMBERS:
+        add_uniform_result(roll_number, "Mid 2", 5)
+    data = teacher.get(
+        f"/api/teacher/class-analytics?subject={SUBJECT}&class_year={CLASS}"
+    ).get_json()
+    assert data["exam_types"] == ["Mid 1", "Mid 2"]
+    assert data["co_labels"] == ["CO1", "CO2", "CO3", "CO4", "CO5"]
+    # Mid 1 averages 48 and Mid 2 is full marks for everyone
+    assert data["class_average"] == 84
+    assert [student["roll_number"] for student in data["students"]] == ROLL_NUMBERS
+
+    top = data["students"][8]
+    assert top["results"] == 2
+    assert (top["average"], top["highest"], top["lowest"]) == (108, 120, 96)
+    assert top["exam_totals"] == {"Mid 1": 96, "Mid 2": 120}
+    # CO3 is 32 of 40 marks in Mid 1 and 40 of 40 in Mid 2
+    assert top["co_performance"] == {
+        "CO1": 80,
+        "CO2": 80,
+        "CO3": 90,
+        "CO4": 100,
+        "CO5": 100,
+    }
+
+
+def test_class_analytics_needs_a_subject(teacher):
+    response = teacher.get(f"/api/teacher/class-analytics?class_year={CLASS}")
+    assert response.status_code == 400
+
+
+def gradebook_pages(client, page_size):
+    url = f"/api/gradebook?class_year={CLASS}&page_size={page_size}"
+    pages = [client.get(url).get_json()]
+    while pages[-1]["next_cursor"]:
+        pages.append(client.get(f"{url}&after={pages[-1]['next_cursor']}").get_json())
+    return pages
+
+
+def test_gradebook_pages_through_the_class(ranked_class, teacher):
+    for roll_number in ROLL_NUMBERS[:3]:
+        add_uniform_result(roll_number, "Mid 2", 5)
+    pages = gradebook_pages(teacher, 4)
+    assert [len(page["students"]) for page in pages] == [4, 4, 2]
+    assert pages[0]["columns"] == [
+        {"subject": SUBJECT, "exam_type": "Mid 1"},
+        {"subject": SUBJECT, "exam_type": "Mid 2"},
+    ]
+    students = [student for page in pages for student in page["students"]]
+    assert [student["roll_number"] for student in students] == ROLL_NUMBERS
+    assert students[2]["marks"] == [24, 120]
+    # No Mid 2 result yet
+    assert students[9]["marks"] == [96, None]
+
+
+@pytest.mark.usefixtures("ranked_class")
+def test_gradebook_download_is_a_workbook(teacher):
+    response = teacher.get(f"/download_gradebook?class_year={CLASS}")
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert sheet.count("<row ") == 1 + len(ROLL_NUMBERS)
+
+
+def test_gradebook_of_an_empty_class(seeded, teacher):
+    assert teacher.get(f"/api/gradebook?class_year={CLASS}").status_code == 404
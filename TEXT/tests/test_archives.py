@@ -0,0 +1,74 @@
+import os
+import shutil
+
+import pytest
+
+import database
+from conftest import ACADEMIC_YEAR, COURSE_ID, EXAM_TYPES, add_result
+
+# 2014 holds Phys results, 2015 Math ones
+ARCHIVE_YEARS = {2014: "Phys", 2015: COURSE_ID}
+
+
+@pytest.fixture
+def closed_years(seeded, monkeypatch):
+    monkeypatch.setattr(database, "current_academic_year", lambda: ACADEMIC_YEAR + 1)
+    database.Database().add_course("Phys", "Phys", "T1")
+    for year, subject in ARCHIVE_YEARS.items():
+        add_result("S00", subject, "Mid 1", year=year)
+
+
+def archive_cache():
+    if not os.path.isdir(database.ARCHIVE_CACHE_FOLDER):
+        return []
+    return sorted(os.listdir(database.ARCHIVE_CACHE_FOLDER))
+
+
+def archive_contents(year):
+    return sorted(os.listdir(database.ARCHIVE_FOLDER)), os.path.getsize(
+        database.archive_path(year)
+    )
+
+
+@pytest.mark.usefixtures("closed_years")
+def test_archives_are_unpacked_only_when_a_read_needs_them():
+    assert all(database.archive_term(year) for year in ARCHIVE_YEARS)
+    assert database.list_terms() == sorted(ARCHIVE_YEARS)
+    shutil.rmtree(database.ARCHIVE_CACHE_FOLDER, ignore_errors=True)
+
+    database.init_db()
+    database.rebuild_exam_facets()
+    assert archive_cache() == []
+
+    results_db = database.ResultsDatabase()
+    years = {
+        result["year"] for result in results_db.get_filtered_results(None, "Phys", None)
+    }
+    assert years == {2014}
+    assert archive_cache() == ["results_2014.db"]
+
+    assert len(results_db.get_student_detailed_results("S00")) == len(EXAM_TYPES) + 2
+    assert archive_cache() == ["results_2014.db", "results_2015.db"]
+
+
+@pytest.mark.usefixtures("closed_years")
+def test_later_results_are_folded_into_the_archive():
+    assert database.archive_term(2015)
+    add_result("S01", COURSE_ID, "Mid 1", year=2015)
+    assert database.archive_term(2015)
+    assert not os.path.exists(database.term_path(2015))
+    results = database.ResultsDatabase().get_filtered_results(None, None, None, 2015)
+    assert sorted(result["roll_number"] for result in results) == ["S00", "S01"]
+
+
+@pytest.mark.usefixtures("closed_years")
+def test_years_without_results_are_not_archived():
+    assert database.archive_term(1998) is False
+    assert not os.path.exists(database.archive_path(1998))
+    assert not os.path.exists(database.term_path(1998))
+
+    # Nothing new since the last archive of 2014 leaves it as it is
+    assert database.archive_term(2014)
+    before = archive_contents(2014)
+    assert database.archive_term(2014) is False
+    assert archive_contents(2014) == before
@@ -0,0 +1,164 @@
+import pytest
+
+import database
+from conftest import (
+    CLASS_YEAR,
+    COURSE_ID,
+    STUDENTS,
+    add_result,
+    login,
+    snapshot,
+)
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+
+def result_counts():
+    conn = database.create_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            """SELECT subject, exam_type, COUNT(*) FROM students_results
+            GROUP BY subject, exam_type"""
+        )
+        return {(subject, exam_type): count for subject, exam_type, count in c}
+    finally:
+        conn.close()
+
+
+def assert_aggregates_in_step():
+    stored = snapshot()
+    database.rebuild_co_attainment()
+    database.rebuild_exam_ranks()
+    assert snapshot() == stored
+
+
+@pytest.fixture
+def physics(seeded):
+    database.Database().add_course("Phys", "Phys", "T1")
+
+
+def test_delete_by_filter_reports_counts(teacher):
+    response = teacher.post(
+        "/api/delete-marks-bulk",
+        json={"class_year": CLASS_YEAR, "subject": COURSE_ID, "exam_type": "Mid 2"},
+    )
+    assert response.status_code == 200
+    # Every result has a question_marks row per question
+    assert response.get_json()["deleted"] == {
+        "results": len(STUDENTS),
+        "question_marks": len(STUDENTS) * len(database.QUESTION_NUMBERS),
+    }
+    assert (COURSE_ID, "Mid 2") not in result_counts()
+    assert_aggregates_in_step()
+
+
+def test_delete_by_ids_skips_unknown_ids(teacher):
+    ids = [
+        result["id"]
+        for result in database.ResultsDatabase().get_filtered_results(
+            CLASS_YEAR, COURSE_ID, "Mid 1"
+        )[:3]
+    ]
+    response = teacher.post(
+        "/api/delete-marks-bulk",
+        json={"subject": COURSE_ID, "result_ids": ids + [99999]},
+    )
+    assert response.get_json()["deleted"]["results"] == 3
+    assert result_counts()[(COURSE_ID, "Mid 1")] == len(STUDENTS) - 3
+    assert_aggregates_in_step()
+
+
+@pytest.mark.usefixtures("physics")
+def test_move_exam_to_another_course(teacher):
+    response = teacher.post(
+        "/api/regrade-marks",
+        json={
+            "class_year": CLASS_YEAR,
+            "subject": COURSE_ID,
+            "exam_type": "Mid 2",
+            "new_subject": "Phys",
+        },
+    )
+    assert response.status_code == 200
+    assert response.get_json()["moved"] == len(STUDENTS)
+    counts = result_counts()
+    assert counts[("Phys", "Mid 2")] == len(STUDENTS)
+    assert (COURSE_ID, "Mid 2") not in counts
+    assert_aggregates_in_step()
+
+
+def test_move_onto_existing_results_is_refused(teacher):
+    before = snapshot()
+    response = teacher.post(
+        "/api/regrade-marks",
+        json={"subject": COURSE_ID, "exam_type": "Mid 1", "new_exam_type": "Final"},
+    )
+    assert response.status_code == 409
+    assert response.get_json()["conflicts"] == len(STUDENTS)
+    assert snapshot() == before
+
+
+def test_move_reports_only_the_conflicting_results(teacher):
+    # Only S00 already has a Mid 2 result once the other ones are gone
+    teacher.post(
+        "/api/delete-marks-bulk",
+        json={
+            "subject": COURSE_ID,
+            "exam_type": "Mid 2",
+            "result_ids": [
+                result["id"]
+                for result in database.ResultsDatabase().get_filtered_results(
+                    CLASS_YEAR, COURSE_ID, "Mid 2"
+                )
+                if result["roll_number"] != "S00"
+            ],
+        },
+    )
+    response = teacher.post(
+        "/api/regrade-marks",
+        json={"subject": COURSE_ID, "exam_type": "Mid 1", "new_exam_type": "Mid 2"},
+    )
+    assert response.status_code == 409
+    assert response.get_json()["conflicts"] == 1
+    assert result_counts()[(COURSE_ID, "Mid 1")] == len(STUDENTS)
+
+
+def test_bulk_changes_need_one_of_the_teachers_courses(teacher):
+    db = database.Database()
+    db.register_teacher("Other", "T2", "CS", "Chemistry", "password")
+    db.add_course("Chem", "Chem", "T2")
+    chem_id = add_result("S00", "Chem", "Mid 1")
+    before = snapshot()
+
+    for url, body in [
+        ("/api/delete-marks-bulk", {"subject": "Chem"}),
+        ("/api/regrade-marks", {"subject": "Chem", "new_subject": COURSE_ID}),
+        ("/api/delete-marks-bulk", {"result_ids": [chem_id]}),
+        ("/api/regrade-marks", {"exam_type": "Mid 1", "new_exam_type": "Quiz"}),
+    ]:
+        response = teacher.post(url, json=body)
+        assert response.status_code in (400, 403)
+    # Ids of another course are outside the teacher's subject filter
+    response = teacher.post(
+        "/api/delete-marks-bulk", json={"subject": COURSE_ID, "result_ids": [chem_id]}
+    )
+    assert response.get_json()["deleted"]["results"] == 0
+    # Nor can results be moved into another teacher's course
+    response = login().post(
+        "/api/regrade-marks",
+        json={"subject": COURSE_ID, "exam_type": "Mid 1", "new_subject": "Chem"},
+    )
+    assert response.status_code == 400
+    assert snapshot() == before
+
+
+def test_moved_exam_drops_cached_responses(teacher):
+    url = f"/get_analysis?class_year={CLASS_YEAR}&subject={COURSE_ID}&exam_type=Mid 1"
+    teacher.get(url)
+    assert teacher.get(url).headers["X-Cache"] == "HIT"
+    teacher.post(
+        "/api/regrade-marks",
+        json={"subject": COURSE_ID, "exam_type": "Mid 1", "new_exam_type": "Quiz"},
+    )
+    assert teacher.get(url).status_code == 404
@@ -0,0 +1,72 @@
+import pytest
+
+import database
+from conftest import CLASS_YEAR, COURSE_ID, STUDENTS, add_result, snapshot
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+
+def co_rows():
+    return snapshot()[1]
+
+
+def stored_co_rows():
+    # Every row, including any left with nothing to cover
+    conn = database.create_connection()
+    try:
+        c = conn.cursor()
+        c.execute("SELECT subject, exam_type, roll_number FROM co_attainment")
+        return set(c.fetchall())
+    finally:
+        conn.close()
+
+
+def assert_matches_rebuild():
+    stored = co_rows()
+    assert stored
+    database.rebuild_co_attainment()
+    assert co_rows() == stored
+
+
+def test_writes_keep_the_sums_equal_to_a_rebuild():
+    results_db = database.ResultsDatabase()
+    add_result("S50", COURSE_ID, "Mid 1")
+    assert_matches_rebuild()
+
+    result_id = add_result("S00", COURSE_ID, "Mid 2")
+    results_db.update_question_marks(
+        result_id, {"Q1": {"a": 5, "b": 5, "c": 5, "d": 5}}
+    )
+    assert_matches_rebuild()
+
+    results_db.delete_result("S01", CLASS_YEAR, COURSE_ID, "Final")
+    assert_matches_rebuild()
+
+
+def test_deleting_results_drops_their_emptied_rows():
+    results_db = database.ResultsDatabase()
+    results_db.delete_result("S00", CLASS_YEAR, COURSE_ID, "Mid 1")
+    rows = stored_co_rows()
+    assert (COURSE_ID, "Mid 1", "S00") not in rows
+    assert (COURSE_ID, "Mid 2", "S00") in rows
+    assert (COURSE_ID, "Mid 1", database.CLASS_TOTAL_ROLL) in rows
+
+    for roll_number in STUDENTS[1:]:
+        results_db.delete_result(roll_number, CLASS_YEAR, COURSE_ID, "Mid 1")
+    assert not any(exam_type == "Mid 1" for _, exam_type, _ in stored_co_rows())
+
+
+def test_emptied_rows_are_deleted_by_key(monkeypatch):
+    statements = []
+    connect = database.create_connection
+
+    def traced_connection():
+        conn = connect()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(database, "create_connection", traced_connection)
+    database.ResultsDatabase().delete_result("S00", CLASS_YEAR, COURSE_ID, "Mid 1")
+    deletes = [sql for sql in statements if "DELETE FROM co_attainment" in sql]
+    assert deletes
+    assert all("roll_number = " in sql for sql in deletes)
@@ -0,0 +1,113 @@
+import sqlite3
+
+import pytest
+
+import database
+from conftest import CLASS_YEAR, COURSE_ID, STUDENTS, snapshot
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+
+def co_rows():
+    return snapshot()[1]
+
+
+def course_outcome_map():
+    conn = database.create_connection()
+    try:
+        c = conn.cursor()
+        c.execute("SELECT * FROM course_outcome_map ORDER BY 1, 2, 3")
+        return c.fetchall()
+    finally:
+        conn.close()
+
+
+def test_saving_the_default_mapping_again_keeps_the_aggregates():
+    before = co_rows()
+    assert before
+    saved, _ = database.Database().set_course_outcomes(
+        database.DEFAULT_CO_COURSE, "Mid 1", database.CO_MAP["Mid 1"]
+    )
+    assert saved
+    assert co_rows() == before
+
+
+def test_course_mapping_recomputes_that_course():
+    saved, _ = database.Database().set_course_outcomes(COURSE_ID, "Mid 2", {1: "CO9"})
+    assert saved
+    stored = co_rows()
+    assert any(row[2] == "Mid 2" and row[3] == "CO9" for row in stored)
+    database.rebuild_co_attainment()
+    assert co_rows() == stored
+
+
+def test_rebuild_reads_the_mapping_on_its_own_connection(monkeypatch):
+    # A second connection can find the database locked by the rebuild's DELETE
+    def second_connection():
+        raise AssertionError("mapping read on another connection")
+
+    database.invalidate_course_outcomes()
+    monkeypatch.setattr(database, "load_course_outcomes", second_connection)
+    saved, _ = database.Database().set_course_outcomes(COURSE_ID, "Mid 1", {2: "CO7"})
+    assert saved
+
+
+# Failing before and after the rebuild has deleted the old aggregates
+@pytest.mark.parametrize("step", ["read_course_outcomes", "co_contributions"])
+def test_failed_rebuild_changes_nothing(monkeypatch, step):
+    before = co_rows()
+    mapping = course_outcome_map()
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(database, step, locked)
+    saved, message = database.Database().set_course_outcomes(
+        COURSE_ID, "Mid 1", {1: "CO9"}
+    )
+    assert not saved
+    assert "locked" in message
+    assert database.rebuild_co_attainment() is False
+    assert co_rows() == before
+    assert course_outcome_map() == mapping
+
+    # Nothing empty was cached in place of the mapping
+    monkeypatch.undo()
+    assert database.course_outcome_lookup(COURSE_ID, "Mid 1") == tuple(
+        database.CO_MAP["Mid 1"][q_num] for q_num in database.QUESTION_NUMBERS
+    )
+
+
+def another_worker_maps(exam_type, question_cos):
+    # The change is made elsewhere, so this process keeps its cached mapping
+    database.load_course_outcomes()
+    cached = database._course_outcome_cache
+    saved, _ = database.Database().set_course_outcomes(
+        COURSE_ID, exam_type, question_cos
+    )
+    assert saved
+    database._course_outcome_cache = cached
+
+
+def test_writes_use_the_stored_mapping_not_a_stale_cache():
+    another_worker_maps("Mid 1", {1: "CO9"})
+    results_db = database.ResultsDatabase()
+    result = results_db.get_filtered_results(CLASS_YEAR, COURSE_ID, "Mid 1")[0]
+    results_db.update_question_marks(
+        result["id"], {"Q1": {"a": 5, "b": 5, "c": 5, "d": 5}}
+    )
+    # A second write path
+    results_db.delete_result(STUDENTS[-1], CLASS_YEAR, COURSE_ID, "Mid 1")
+
+    stored = co_rows()
+    database.rebuild_co_attainment()
+    assert co_rows() == stored
+
+
+def test_cached_mapping_expires():
+    before = database.course_outcome_lookup(COURSE_ID, "Mid 2")
+    another_worker_maps("Mid 2", {1: "CO9"})
+    # Reads may show the old mapping until the cache expires
+    assert database.course_outcome_lookup(COURSE_ID, "Mid 2") == before
+    database._course_outcome_cache = (0, database._course_outcome_cache[1])
+    assert database.course_outcome_lookup(COURSE_ID, "Mid 2")[0] == "CO9"
@@ -0,0 +1,50 @@
+import pytest
+
+import database
+from conftest import COURSE_ID, analysis_url, exam_query, zero_first_question
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        exam_query("/api/get_marks", "Mid 1"),
+        exam_query("/get_analysis", "Mid 1"),
+        exam_query("/api/teacher/co-performance-data", "Mid 1", "course_id"),
+    ],
+)
+def test_matching_etag_gets_304(teacher, url):
+    first = teacher.get(url)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+
+    again = teacher.get(url, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_write_changes_only_that_exams_etag(teacher):
+    mid_1 = teacher.get(analysis_url("Mid 1")).headers["ETag"]
+    mid_2 = teacher.get(analysis_url("Mid 2")).headers["ETag"]
+
+    zero_first_question(teacher, "S00", "Mid 1")
+
+    assert (
+        teacher.get(analysis_url("Mid 1"), headers={"If-None-Match": mid_1}).status_code
+        == 200
+    )
+    assert (
+        teacher.get(analysis_url("Mid 2"), headers={"If-None-Match": mid_2}).status_code
+        == 304
+    )
+
+
+def test_course_outcome_change_changes_etag(teacher):
+    etag = teacher.get(analysis_url("Mid 2")).headers["ETag"]
+    database.Database().set_course_outcomes(COURSE_ID, "Mid 2", {1: "CO9"})
+    assert (
+        teacher.get(analysis_url("Mid 2"), headers={"If-None-Match": etag}).status_code
+        == 200
+    )
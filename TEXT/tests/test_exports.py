@@ -0,0 +1,88 @@
+import csv
+import gzip
+import io
+import zipfile
+
+import pytest
+
+import app
+import database
+from conftest import CLASS_YEAR, COURSE_ID, EXAM_TYPES, STUDENTS
+from exports import EXPORT_COLUMNS
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+
+def export_url(export_format, **filters):
+    query = "&".join(f"{key}={value}" for key, value in filters.items())
+    return f"/download_excel?format={export_format}&{query}"
+
+
+def csv_rows(data):
+    return list(csv.reader(io.StringIO(data.decode("utf-8"))))
+
+
+def test_csv_export_streams_every_result(teacher):
+    response = teacher.get(export_url("csv"))
+    assert response.status_code == 200
+    assert response.is_streamed
+    rows = csv_rows(response.data)
+    assert rows[0] == EXPORT_COLUMNS
+    assert len(rows) == 1 + len(STUDENTS) * len(EXAM_TYPES)
+
+
+def test_export_applies_the_view_filters(teacher):
+    rows = csv_rows(
+        teacher.get(
+            export_url(
+                "csv", class_year=CLASS_YEAR, subject=COURSE_ID, exam_type="Final"
+            )
+        ).data
+    )[1:]
+    assert len(rows) == len(STUDENTS)
+    assert {row[3] for row in rows} == {"Final"}
+    # Total marks are the sum of the part marks
+    for row in rows:
+        parts = [float(value) for value in row[5:-1]]
+        assert sum(parts) == pytest.approx(float(row[-1]))
+
+
+def test_gzip_export_holds_the_same_csv(teacher):
+    plain = teacher.get(export_url("csv", exam_type="Mid 1")).data
+    compressed = teacher.get(export_url("csv.gz", exam_type="Mid 1"))
+    assert compressed.mimetype == "application/gzip"
+    assert gzip.decompress(compressed.data) == plain
+
+
+def test_export_without_results_redirects(teacher):
+    response = teacher.get(export_url("csv", subject="Phys"))
+    assert response.status_code == 302
+
+
+def test_xlsx_export_is_built_in_the_cache_folder(teacher):
+    workbook = teacher.get(export_url("xlsx", exam_type="Mid 1"))
+    assert workbook.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(workbook.data)) as archive:
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert sheet.count("<row ") == 1 + len(STUDENTS)
+
+
+@pytest.mark.parametrize("export_format", ["csv", "xlsx"])
+def test_repeated_export_is_served_from_the_cache(teacher, monkeypatch, export_format):
+    url = export_url(export_format, exam_type="Mid 2")
+    first = teacher.get(url).data
+
+    def no_reads(*args, **kwargs):
+        raise AssertionError("export rebuilt from the database")
+
+    monkeypatch.setattr(app.db_results, "stream_results", no_reads)
+    assert teacher.get(url).data == first
+
+
+def test_write_makes_a_new_export(teacher):
+    url = export_url("csv", exam_type="Mid 1")
+    before = csv_rows(teacher.get(url).data)
+    database.ResultsDatabase().delete_result("S00", CLASS_YEAR, COURSE_ID, "Mid 1")
+    after = csv_rows(teacher.get(url).data)
+    assert len(after) == len(before) - 1
+    assert "S00" not in {row[0] for row in after}
@@ -0,0 +1,90 @@
+import sqlite3
+
+import pytest
+
+import database
+from conftest import CLASS_YEAR, COURSE_ID, add_result
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+
+def counted_exams():
+    # What the catalogue should hold, counted from the results of every term
+    conn = database.connect_results()
+    try:
+        c = conn.cursor()
+        c.execute(
+            """SELECT class_year, subject, exam_type, COUNT(*) FROM all_results
+            GROUP BY class_year, subject, exam_type
+            ORDER BY class_year, subject, exam_type"""
+        )
+        return c.fetchall()
+    finally:
+        conn.close()
+
+
+def assert_facets_in_step():
+    # Read through the in-memory copy, which every change must have dropped
+    assert database.load_exam_facets() == counted_exams()
+    database.rebuild_exam_facets()
+    assert database.load_exam_facets() == counted_exams()
+
+
+def test_writes_keep_facets_in_step(teacher):
+    results_db = database.ResultsDatabase()
+    database.Database().add_course("Phys", "Phys", "T1")
+    assert_facets_in_step()
+
+    for roll_number in ("S00", "S01", "S02"):
+        add_result(roll_number, "Phys", "Mid 1", year=2023)
+    assert_facets_in_step()
+
+    # Storing the same exam again replaces the result
+    add_result("S00", "Phys", "Mid 1", year=2023)
+    assert_facets_in_step()
+
+    teacher.post(
+        "/api/regrade-marks",
+        json={"subject": COURSE_ID, "exam_type": "Mid 2", "new_subject": "Phys"},
+    )
+    assert_facets_in_step()
+
+    teacher.post(
+        "/api/delete-marks-bulk",
+        json={"subject": "Phys", "exam_type": "Mid 2", "class_year": CLASS_YEAR},
+    )
+    assert_facets_in_step()
+
+    results_db.delete_result("S01", CLASS_YEAR, "Phys", "Mid 1")
+    assert_facets_in_step()
+
+
+def test_partitioned_terms_stay_in_the_catalogue(monkeypatch):
+    monkeypatch.setattr(database, "current_academic_year", lambda: 2030)
+    add_result("S00", COURSE_ID, "Quiz", year=2023)
+    before = database.load_exam_facets()
+
+    assert database.partition_term(2023) == 1
+    assert database.partition_term(2025) > 0
+    assert database.load_exam_facets() == before
+    assert_facets_in_step()
+
+
+def test_rebuild_only_if_empty_recounts_a_cleared_catalogue():
+    before = database.load_exam_facets()
+    assert database.rebuild_exam_facets(only_if_empty=True) is False
+
+    conn = sqlite3.connect("database/education.db")
+    conn.execute("DELETE FROM exam_facets")
+    conn.commit()
+    conn.close()
+    assert database.rebuild_exam_facets(only_if_empty=True) is True
+    assert database.load_exam_facets() == before
+
+
+def test_filter_dropdowns_read_the_catalogue():
+    add_result("S00", "Phys", "Quiz")
+    results_db = database.ResultsDatabase()
+    assert results_db.get_all_exam_types() == ["Final", "Mid 1", "Mid 2", "Quiz"]
+    assert results_db.get_all_class_years() == [CLASS_YEAR]
+    assert (CLASS_YEAR, "Phys", "Quiz") in results_db.get_unique_exam_details()
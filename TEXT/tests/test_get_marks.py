@@ -0,0 +1,66 @@
+import json
+import sqlite3
+
+import pytest
+
+import database
+from conftest import CLASS_YEAR, COURSE_ID, STUDENTS
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+MARKS_URL = (
+    f"/api/get_marks?class_year={CLASS_YEAR}&subject={COURSE_ID}&exam_type=Mid 1"
+)
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.data.decode().splitlines()]
+
+
+def test_pages_cover_every_result_once(teacher):
+    everything = teacher.get(MARKS_URL).get_json()["results"]
+    seen = []
+    cursor = None
+    while True:
+        url = MARKS_URL + "&page_size=3"
+        if cursor:
+            url += f"&after_roll_number={cursor['roll_number']}&after_id={cursor['id']}"
+        page = teacher.get(url).get_json()
+        assert len(page["results"]) <= 3
+        seen.extend(page["results"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert [result["roll_number"] for result in seen] == STUDENTS
+    assert sorted(seen, key=lambda result: result["id"]) == sorted(
+        everything, key=lambda result: result["id"]
+    )
+
+
+def test_stream_sends_one_result_per_line(teacher):
+    everything = teacher.get(MARKS_URL).get_json()["results"]
+    response = teacher.get(MARKS_URL + "&stream=1")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    streamed = ndjson(response)
+    assert [result["roll_number"] for result in streamed] == STUDENTS
+    assert streamed[0]["questions"]["Q1"]["co"] == "CO1"
+    assert sorted(streamed, key=lambda result: result["id"]) == sorted(
+        everything, key=lambda result: result["id"]
+    )
+    # A truncated body must never be revalidated into a 304
+    assert "ETag" not in response.headers
+
+
+def test_failed_stream_ends_with_an_error_line(teacher, monkeypatch):
+    iter_results = database.iter_results
+
+    def failing_iter_results(*args, **kwargs):
+        yield next(iter_results(*args, **kwargs))
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(database, "iter_results", failing_iter_results)
+    lines = ndjson(teacher.get(MARKS_URL + "&stream=1"))
+    assert lines[0]["roll_number"] == STUDENTS[0]
+    assert lines[-1] == {"error": "Database error: disk I/O error"}
+    assert len(lines) == 2
@@ -0,0 +1,138 @@
+import sqlite3
+
+import pytest
+
+import database
+from conftest import (
+    CLASS_YEAR,
+    COURSE_ID,
+    add_result,
+    login,
+    reset_database,
+    seed_course,
+    snapshot,
+)
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+
+def planned_edits():
+    """(result_id, question_data) edits of a third of two exams' results."""
+    results_db = database.ResultsDatabase()
+    results = results_db.get_filtered_results(
+        CLASS_YEAR, COURSE_ID, "Mid 1"
+    ) + results_db.get_filtered_results(CLASS_YEAR, COURSE_ID, "Final")
+    edits = []
+    for index, result in enumerate(results[::3]):
+        question_data = {
+            q_key: dict(parts) for q_key, parts in result["questions"].items()
+        }
+        question_data["Q2"] = {"a": 5.0, "b": index % 5, "c": 0.5, "d": 2.0}
+        edits.append((result["id"], question_data))
+    # Unchanged marks are accepted and skipped
+    unchanged = results[1]
+    edits.append(
+        (
+            unchanged["id"],
+            {q_key: dict(parts) for q_key, parts in unchanged["questions"].items()},
+        )
+    )
+    return edits
+
+
+def batch_body(edits):
+    return {
+        "updates": [
+            {"result_id": result_id, "question_data": question_data}
+            for result_id, question_data in edits
+        ]
+    }
+
+
+def test_batch_matches_one_update_per_result(teacher):
+    edits = planned_edits()
+    response = teacher.post("/api/update-marks-batch", json=batch_body(edits))
+    assert response.status_code == 200
+    # Only the results whose marks changed come back
+    assert len(response.get_json()["results"]) == len(edits) - 1
+    batched = snapshot()
+
+    reset_database()
+    seed_course()
+    for result_id, question_data in planned_edits():
+        response = teacher.post(
+            "/api/update-marks",
+            json={"result_id": result_id, "question_data": question_data},
+        )
+        assert response.get_json()["success"]
+    assert snapshot() == batched
+
+
+def test_batch_keeps_aggregates_in_step(teacher):
+    teacher.post("/api/update-marks-batch", json=batch_body(planned_edits()))
+    stored = snapshot()
+    database.rebuild_co_attainment()
+    database.rebuild_exam_ranks()
+    assert snapshot() == stored
+
+
+def test_failed_batch_changes_nothing(teacher, monkeypatch):
+    before = snapshot()
+
+    def fail(*args, **kwargs):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    # Fails after every mark of the batch has been written
+    monkeypatch.setattr(database, "refresh_exam_ranks", fail)
+    response = teacher.post("/api/update-marks-batch", json=batch_body(planned_edits()))
+    assert response.status_code == 500
+    assert snapshot() == before
+
+
+def test_batch_skips_other_teachers_results(teacher):
+    db = database.Database()
+    db.register_teacher("Other", "T2", "CS", "Chemistry", "password")
+    db.add_course("Chem", "Chem", "T2")
+    chem_id = add_result("S00", "Chem", "Mid 1")
+    chem_before = database.ResultsDatabase().get_filtered_results(
+        CLASS_YEAR, "Chem", "Mid 1"
+    )
+    (own_id, own_edit), *_ = planned_edits()
+    chem_edit = {"Q1": {"a": 0, "b": 0, "c": 0, "d": 0}}
+
+    response = teacher.post(
+        "/api/update-marks-batch",
+        json=batch_body([(own_id, own_edit), (chem_id, chem_edit), (10**6, {})]),
+    )
+    data = response.get_json()
+    assert response.status_code == 200
+    assert [result["id"] for result in data["results"]] == [own_id]
+    assert data["rejected_ids"] == [chem_id, 10**6]
+    assert (
+        database.ResultsDatabase().get_filtered_results(CLASS_YEAR, "Chem", "Mid 1")
+        == chem_before
+    )
+
+    # The course's own teacher can edit it
+    data = (
+        login("teacher", "T2")
+        .post("/api/update-marks-batch", json=batch_body([(chem_id, chem_edit)]))
+        .get_json()
+    )
+    assert [result["id"] for result in data["results"]] == [chem_id]
+    assert data["rejected_ids"] == []
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {},
+        {"updates": []},
+        {"updates": [{"result_id": 1, "question_data": {"X1": {}}}]},
+        {"updates": [{"result_id": 1, "question_data": {"Q1": {"a": "x"}}}]},
+    ],
+)
+def test_malformed_batch_is_rejected(teacher, body):
+    before = snapshot()
+    assert teacher.post("/api/update-marks-batch", json=body).status_code == 400
+    assert snapshot() == before
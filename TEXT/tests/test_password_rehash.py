@@ -0,0 +1,62 @@
+import pytest
+
+import app
+import database
+from conftest import TEACHER_ID
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+OLD_METHOD = "pbkdf2:sha256:1000"
+NEW_METHOD = "pbkdf2:sha256:2000"
+
+
+def stored_hash(table, user_id):
+    conn = database.create_connection()
+    try:
+        c = conn.cursor()
+        c.execute(f"SELECT password FROM {table} WHERE id = ?", (user_id,))
+        return c.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def student_login(password):
+    client = app.app.test_client()
+    return client.post(
+        "/student/login", json={"studentId": "S00", "password": password}
+    )
+
+
+def test_login_rehashes_with_a_changed_method(monkeypatch):
+    monkeypatch.setenv("PASSWORD_HASH_METHOD", OLD_METHOD)
+    database.Database().register_student("New", "S90", "CS", "password")
+    old_hash = stored_hash("students", "S90")
+    assert old_hash.startswith(OLD_METHOD + "$")
+
+    # Same method: the stored hash is left alone
+    assert database.Database().verify_student("S90", "password")[0]
+    assert stored_hash("students", "S90") == old_hash
+
+    monkeypatch.setenv("PASSWORD_HASH_METHOD", NEW_METHOD)
+    assert database.needs_rehash(old_hash)
+    assert database.Database().verify_student("S90", "password")[0]
+    new_hash = stored_hash("students", "S90")
+    assert new_hash.startswith(NEW_METHOD + "$")
+    # The new hash still checks out, and is kept from then on
+    assert database.Database().verify_student("S90", "password")[0]
+    assert stored_hash("students", "S90") == new_hash
+
+
+def test_failed_login_keeps_the_old_hash(monkeypatch):
+    monkeypatch.setenv("PASSWORD_HASH_METHOD", NEW_METHOD)
+    old_hash = stored_hash("students", "S00")
+    assert student_login("wrong").get_json()["success"] is False
+    assert stored_hash("students", "S00") == old_hash
+    assert student_login("password").get_json()["success"] is True
+    assert stored_hash("students", "S00").startswith(NEW_METHOD + "$")
+
+
+def test_teacher_login_rehashes_too(monkeypatch):
+    monkeypatch.setenv("PASSWORD_HASH_METHOD", NEW_METHOD)
+    assert database.Database().verify_teacher(TEACHER_ID, "password")[0]
+    assert stored_hash("teachers", TEACHER_ID).startswith(NEW_METHOD + "$")
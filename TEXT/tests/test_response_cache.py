@@ -0,0 +1,44 @@
+import pytest
+
+import database
+from conftest import COURSE_ID, add_result, analysis_url, login, zero_first_question
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+
+def test_repeated_request_is_a_hit(teacher):
+    first = teacher.get(analysis_url("Mid 1"))
+    second = teacher.get(analysis_url("Mid 1"))
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert first.data == second.data
+
+
+def test_mark_update_invalidates_only_affected_responses(teacher):
+    add_result("S50", "Phys", "Mid 1")
+    requests = [
+        (teacher, analysis_url("Mid 1")),
+        (teacher, analysis_url("Mid 2")),
+        (login("student", "S00"), "/api/student-analytics/S00"),
+        # A classmate's class rank depends on S00's total
+        (login("student", "S01"), "/api/student-analytics/S01"),
+        (login("student", "S50"), "/api/student-analytics/S50"),
+    ]
+    for client, url in requests:
+        client.get(url)
+    before = teacher.get(analysis_url("Mid 1")).get_json()
+
+    zero_first_question(teacher, "S00", "Mid 1")
+
+    states = [client.get(url).headers["X-Cache"] for client, url in requests]
+    assert states == ["MISS", "HIT", "MISS", "MISS", "HIT"]
+    assert teacher.get(analysis_url("Mid 1")).get_json() != before
+
+
+def test_course_outcome_change_invalidates_the_course(teacher):
+    teacher.get(analysis_url("Mid 2"))
+    database.Database().set_course_outcomes(COURSE_ID, "Mid 2", {1: "CO9"})
+
+    response = teacher.get(analysis_url("Mid 2"))
+    assert response.headers["X-Cache"] == "MISS"
+    assert "CO9" in response.get_json()["data"]["co_performance"]
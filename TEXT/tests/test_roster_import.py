@@ -0,0 +1,83 @@
+import io
+
+import pytest
+
+import database
+from roster_import import read_roster
+
+ROSTER = (
+    "Roll No,Name,Dept,Password\n"
+    "R001,Asha Rao,CS,secret1\n"
+    "R002,Ben Ode,EE,secret2\n"
+    "R001,Asha Again,CS,secret3\n"
+    "R003,,ME,secret4\n"
+    "S00,Existing Student,CS,secret5\n"
+)
+
+
+def upload(client, data, filename="roster.csv"):
+    return client.post(
+        "/teacher/import_students",
+        data={"roster": (io.BytesIO(data), filename)},
+        content_type="multipart/form-data",
+    )
+
+
+def test_roster_rows_are_read_by_header_name():
+    students, errors = read_roster(ROSTER.encode(), "roster.csv")
+    assert [student["student_id"] for student in students] == [
+        "R001",
+        "R002",
+        "R001",
+        "S00",
+    ]
+    assert students[0] == {
+        "student_id": "R001",
+        "full_name": "Asha Rao",
+        "department": "CS",
+        "password": "secret1",
+    }
+    # R003 has no name and is reported by its line number
+    assert len(errors) == 1 and "5" in errors[0]
+
+
+@pytest.mark.usefixtures("seeded")
+def test_import_registers_new_students_and_skips_the_rest(teacher):
+    response = upload(teacher, ROSTER.encode())
+    assert response.status_code == 201
+    summary = response.get_json()
+    assert summary["created"] == 2
+    assert summary["skipped_duplicates"] == ["R001"]
+    assert summary["skipped_existing"] == ["S00"]
+    assert len(summary["errors"]) == 1
+
+    db = database.Database()
+    assert db.verify_student("R001", "secret1")[0]
+    assert db.verify_student("R002", "secret2")[0]
+    assert not db.verify_student("R001", "secret3")[0]
+    # The existing account keeps its password
+    assert db.verify_student("S00", "password")[0]
+
+
+@pytest.mark.usefixtures("seeded")
+def test_bulk_registration_hashes_in_worker_processes():
+    students = [
+        {
+            "student_id": f"P{index:03d}",
+            "full_name": f"Student {index}",
+            "department": "CS",
+            "password": f"pass{index}",
+        }
+        for index in range(16)
+    ]
+    success, _, summary = database.Database().register_students_bulk(
+        students, workers=2
+    )
+    assert success and summary["created"] == len(students)
+    assert database.Database().verify_student("P007", "pass7")[0]
+
+
+@pytest.mark.usefixtures("seeded")
+def test_bad_rosters_are_rejected(teacher):
+    assert upload(teacher, b"id,name\n1,x\n").status_code == 400
+    assert upload(teacher, ROSTER.encode(), "roster.txt").status_code == 400
@@ -0,0 +1,160 @@
+import os
+
+import pytest
+
+import database
+from conftest import (
+    ACADEMIC_YEAR,
+    CLASS_YEAR,
+    COURSE_ID,
+    EXAM_TYPES,
+    STUDENTS,
+    add_result,
+    login,
+    snapshot,
+)
+
+# One more closed year than SQLite attaches to a connection by default
+TERM_YEARS = list(range(2014, 2014 + database.MAX_ATTACHED_TERMS + 1))
+TERM_STUDENTS = STUDENTS[:3]
+
+
+def term_subject(year):
+    return COURSE_ID if year % 2 else "Phys"
+
+
+@pytest.fixture
+def terms(seeded, monkeypatch):
+    monkeypatch.setattr(database, "current_academic_year", lambda: ACADEMIC_YEAR + 1)
+    database.Database().add_course("Phys", "Phys", "T1")
+    for year in TERM_YEARS:
+        for roll_number in TERM_STUDENTS:
+            add_result(roll_number, term_subject(year), "Mid 1", year=year)
+        assert database.partition_term(year) == len(TERM_STUDENTS)
+
+
+def attached_terms(**filters):
+    conn = database.connect_results(**filters)
+    try:
+        c = conn.cursor()
+        c.execute("PRAGMA database_list")
+        return [row[1] for row in c.fetchall() if row[1] not in ("main", "temp")]
+    finally:
+        conn.close()
+
+
+@pytest.mark.usefixtures("terms")
+def test_reads_across_more_terms_than_can_be_attached():
+    results_db = database.ResultsDatabase()
+    hot = len(STUDENTS) * len(EXAM_TYPES)
+    term_results = len(TERM_YEARS) * len(TERM_STUDENTS)
+
+    assert len(results_db.get_all_results()) == hot + term_results
+    detailed = results_db.get_student_detailed_results("S00")
+    assert len(detailed) == len(EXAM_TYPES) + len(TERM_YEARS)
+    assert [result["year"] for result in detailed][: len(TERM_YEARS)] == TERM_YEARS
+    assert len(results_db.get_student_score_trend("S01")) == len(detailed)
+    assert len(results_db.get_filtered_results(None, "Phys", None)) == len(
+        TERM_STUDENTS
+    ) * sum(1 for year in TERM_YEARS if term_subject(year) == "Phys")
+    assert len(results_db.get_filtered_results(None, None, None, year=2015)) == len(
+        TERM_STUDENTS
+    )
+
+
+@pytest.mark.usefixtures("terms")
+def test_student_pages_read_every_term():
+    response = login("student", "S00").get("/api/student-analytics/S00")
+    assert response.status_code == 200
+
+
+@pytest.mark.usefixtures("terms")
+def test_reads_attach_only_the_terms_they_can_match():
+    assert attached_terms(subject="Phys") == [
+        f"term_{year}_0" for year in TERM_YEARS if term_subject(year) == "Phys"
+    ]
+    assert attached_terms(roll_number="S09") == []
+    assert attached_terms(year=2016) == ["term_2016_0"]
+    # Past the limit the terms are copied, so nothing stays attached
+    assert attached_terms(roll_number="S00") == []
+
+
+@pytest.mark.usefixtures("terms")
+def test_rebuilds_cover_every_term():
+    stored = database.ResultsDatabase().get_student_detailed_results("S02")
+    co_rows = database.ResultsDatabase().get_student_co_attainment("S02")
+    assert database.rebuild_co_attainment() is True
+    assert database.ResultsDatabase().get_student_co_attainment("S02") == co_rows
+    assert database.ResultsDatabase().get_student_detailed_results("S02") == stored
+
+    facets = database.load_exam_facets()
+    assert database.rebuild_exam_facets() is True
+    assert database.load_exam_facets() == facets
+
+
+@pytest.mark.usefixtures("terms")
+def test_partitioning_a_year_without_results_creates_no_term():
+    attached = attached_terms(subject=COURSE_ID)
+    assert database.partition_term(1999) == 0
+    assert not os.path.exists(database.term_path(1999))
+    assert 1999 not in database.list_terms()
+    assert attached_terms(subject=COURSE_ID) == attached
+
+
+@pytest.mark.usefixtures("terms")
+def test_term_results_are_shown_read_only(teacher):
+    results = teacher.get(
+        f"/api/get_marks?class_year={CLASS_YEAR}&subject={COURSE_ID}&exam_type=Mid 1"
+    ).get_json()["results"]
+    assert {result["year"] for result in results if result["closed_term"]} == {
+        year for year in TERM_YEARS if term_subject(year) == COURSE_ID
+    }
+    assert {result["year"] for result in results if not result["closed_term"]} == {
+        ACADEMIC_YEAR
+    }
+
+
+@pytest.mark.usefixtures("terms")
+def test_term_results_cannot_be_changed(teacher):
+    term_ids = [
+        result["id"]
+        for result in database.ResultsDatabase().get_filtered_results(
+            CLASS_YEAR, "Phys", "Mid 1"
+        )
+    ]
+    hot_id = database.ResultsDatabase().get_filtered_results(
+        CLASS_YEAR, COURSE_ID, "Mid 1", year=ACADEMIC_YEAR
+    )[0]["id"]
+    before = snapshot()
+    question_data = {"Q1": {"a": 0, "b": 0, "c": 0, "d": 0}}
+
+    response = teacher.post(
+        "/api/update-marks-batch",
+        json={
+            "updates": [
+                {"result_id": result_id, "question_data": question_data}
+                for result_id in [hot_id] + term_ids[:2]
+            ]
+        },
+    )
+    assert response.status_code == 409
+    assert response.get_json()["closed_term_ids"] == sorted(term_ids[:2])
+
+    response = teacher.post(
+        "/api/update-marks",
+        json={"result_id": term_ids[0], "question_data": question_data},
+    )
+    assert response.status_code == 409
+
+    response = teacher.post(
+        "/api/delete-marks",
+        json={
+            "roll_number": "S00",
+            "class_year": CLASS_YEAR,
+            "subject": "Phys",
+            "exam_type": "Mid 1",
+        },
+    )
+    assert response.status_code == 409
+    assert "read-only" in response.get_json()["message"]
+    assert snapshot() == before
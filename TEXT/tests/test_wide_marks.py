@@ -0,0 +1,118 @@
+import os
+import shutil
+import sqlite3
+
+import database
+from conftest import CLASS_YEAR, COURSE_ID, seed_course, snapshot
+
+# students_results and question_marks as created before the wide layout
+BASELINE_SCHEMA = """
+CREATE TABLE students_results
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     roll_number TEXT NOT NULL,
+     class_year TEXT NOT NULL,
+     subject TEXT NOT NULL,
+     exam_type TEXT NOT NULL,
+     year INTEGER NOT NULL,
+     total_marks REAL NOT NULL,
+     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE question_marks
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     result_id INTEGER NOT NULL,
+     question_number INTEGER NOT NULL,
+     part_a REAL NOT NULL,
+     part_b REAL NOT NULL,
+     part_c REAL NOT NULL,
+     part_d REAL NOT NULL,
+     FOREIGN KEY(result_id) REFERENCES students_results(id) ON DELETE CASCADE);
+"""
+BASELINE_RESULT_COLUMNS = (
+    "id",
+    "roll_number",
+    "class_year",
+    "subject",
+    "exam_type",
+    "year",
+    "total_marks",
+    "timestamp",
+)
+
+
+def stored_results():
+    return database.ResultsDatabase().get_filtered_results(CLASS_YEAR, COURSE_ID, None)
+
+
+def raw_execute(sql, params=()):
+    conn = sqlite3.connect(database.DATABASE_PATH)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def test_baseline_database_is_migrated_on_start_up():
+    seed_course()
+    expected = stored_results()
+    aggregates = snapshot()[1:]
+
+    # The same results in a database of the old layout
+    shutil.rmtree("database")
+    os.makedirs("database")
+    conn = sqlite3.connect(database.DATABASE_PATH)
+    conn.executescript(BASELINE_SCHEMA)
+    for result in expected:
+        cursor = conn.execute(
+            """INSERT INTO students_results
+            (id, roll_number, class_year, subject, exam_type, year, total_marks, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [result[key] for key in BASELINE_RESULT_COLUMNS],
+        )
+        conn.executemany(
+            """INSERT INTO question_marks
+            (result_id, question_number, part_a, part_b, part_c, part_d)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            [
+                (cursor.lastrowid, int(q_key[1:]), *parts.values())
+                for q_key, parts in result["questions"].items()
+            ],
+        )
+    conn.commit()
+    conn.close()
+
+    database.init_db()
+    database.invalidate_exam_facets()
+    assert raw_execute(
+        "SELECT COUNT(*) FROM students_results WHERE wide_marks = 0"
+    ) == [(0,)]
+    assert stored_results() == expected
+    # The aggregates are built from the migrated rows
+    assert snapshot()[1:] == aggregates
+
+
+def test_legacy_rows_are_read_from_question_marks(seeded):
+    expected = stored_results()
+    # Rows the migration could not widen keep their marks only in question_marks
+    raw_execute(
+        "UPDATE students_results SET wide_marks = 0, "
+        + ", ".join(f"{col} = NULL" for col in database.WIDE_MARK_COLUMNS)
+        + " WHERE id % 2 = 0"
+    )
+    assert stored_results() == expected
+
+    legacy_ids = [result["id"] for result in expected if result["id"] % 2 == 0]
+    legacy_id = legacy_ids[0]
+    raw_execute(
+        """INSERT INTO question_marks
+        (result_id, question_number, part_a, part_b, part_c, part_d)
+        VALUES (?, 7, 1, 1, 1, 1)""",
+        (legacy_id,),
+    )
+    # A seventh question has no wide columns, so that result stays legacy
+    assert database.migrate_to_wide_marks() == len(legacy_ids) - 1
+    results = {result["id"]: result for result in stored_results()}
+    assert results[legacy_id]["questions"]["Q7"] == {"a": 1, "b": 1, "c": 1, "d": 1}
+    assert raw_execute("SELECT id FROM students_results WHERE wide_marks = 0") == [
+        (legacy_id,)
+    ]